@@ -1,10 +1,60 @@
 import requests
 import json
 import base64
+import hashlib
 import time
-from PIL import Image
-from io import BytesIO
 import os
+import sys
+import argparse
+import mimetypes
+
+# 引入仓库根目录下的公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils.concurrency import bounded_map
+from apiyi_utils.http import get_session
+from apiyi_utils.jsonbody import Base64File, JsonBody
+from apiyi_utils.jsoncodec import ChatCompletion, decode
+from apiyi_utils.multipart import MultipartEncoder
+from apiyi_utils.image_prep import guess_mime_type, preprocess_image, resolution_limit
+from apiyi_utils.result_cache import ResultCache, default_cache_path, make_key
+from apiyi_utils.sse import iter_chat_deltas
+from apiyi_utils.tracing import traced
+
+API_URL = "https://vip.apiyi.com/v1/chat/completions"
+FILES_URL = "https://vip.apiyi.com/v1/files"
+
+# 请求超时：(连接超时, 读取超时) 秒
+DEFAULT_TIMEOUT = (10, 300)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp')
+
+# 默认分析提示词
+DEFAULT_PROMPT = """
+    请详细分析这张图片，包括：
+    1. 图片中的主要对象或动物
+    2. 对象的外观特征、颜色、姿态
+    3. 背景环境描述
+    4. 图片的整体风格和色调
+    5. 图片给人的情感感受
+    
+    请用中文详细描述你看到的内容。
+    """
+
+# 预处理时重新编码的质量（同时是缓存键的一部分）
+IMAGE_QUALITY = 85
+
+# 打包模式：单个请求中图片 base64 的总大小上限（字节）
+DEFAULT_PACK_MAX_BYTES = 15 * 1024 * 1024
+
+# 打包模式的提示词：要求模型按图片编号逐张回答，便于把结果对应回每张图片
+PACKED_PROMPT = """下面依次给出 {count} 张图片，每张图片前标有编号（图片 1 到图片 {count}）。
+请对每张图片分别独立完成以下任务，不要在回答中混淆不同的图片：
+
+{prompt}
+
+只输出一个 JSON 对象，不要输出其他内容，格式为：
+{{"results": [{{"index": 图片编号, "result": "对该图片的完整回答"}}]}}
+results 中必须包含全部 {count} 张图片，每张一个元素。"""
 
 def load_image_to_base64(image_path):
     """将本地图片转换为base64编码"""
@@ -19,49 +69,353 @@ def load_image_to_base64(image_path):
         print(f"图片加载失败: {e}")
         return None
 
-def api_inference(prompt, base64_image, model_id="gemini-2.5-pro", api_key="sk-"):
-    """调用API进行图像视觉理解"""
-    url = "https://vip.apiyi.com/v1/chat/completions"
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+def open_image_base64(image_path):
+    """
+    以流式方式准备本地图片的 base64，返回 Base64File 占位对象（不是字符串）
 
+    放进请求（image_data_url / JsonBody）后，发送时才从文件分块编码写入请求体，
+    不会在内存中生成完整的 base64 字符串。需要 base64 字符串时请用 load_image_to_base64。
+    """
+    try:
+        return Base64File(image_path)
+    except Exception as e:
+        print(f"图片加载失败: {e}")
+        return None
+
+def image_data_url(base64_image, mime_type):
+    """图片的 data URL；base64_image 为 Base64File 时仍保持流式编码"""
+    if isinstance(base64_image, Base64File):
+        return Base64File(base64_image.path, prefix=f"data:{mime_type};base64,")
+    return f"data:{mime_type};base64,{base64_image}"
+
+def request_inference(prompt, base64_image, model_id="gemini-2.5-pro", api_key="sk-",
+                      session=None, timeout=DEFAULT_TIMEOUT, mime_type="image/jpeg", cache=None, cache_key=None):
+    """
+    发送视觉理解请求并返回AI回复，失败时抛出异常
+
+    传入 cache（ResultCache）和 cache_key 时，请求成功后写入缓存。缓存查询由调用方在编码图片之前
+    完成（见 lookup_cache），命中时无需预处理图片。
+    """
     content = [
         {"type": "text", "text": prompt},
         {"type": "image_url", "image_url": {
-            "url": f"data:image/jpeg;base64,{base64_image}"
+            "url": image_data_url(base64_image, mime_type)
         }}
     ]
+    ai_response = _post_chat(content, model_id, api_key, session, timeout)
+    if cache is not None and cache_key is not None and ai_response:
+        cache.set(cache_key, ai_response, model_id)
+    return ai_response
+
+def _post_chat(content, model_id, api_key, session=None, timeout=DEFAULT_TIMEOUT):
+    """发送单轮 chat.completions 请求并返回回复文本，失败时抛出异常"""
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
     payload = {"model": model_id, "messages": [{"role": "user", "content": content}]}
-    
+
+    http = session or get_session()
+    with JsonBody(payload) as body:
+        response = http.post(API_URL, headers=headers, data=body, timeout=timeout, idempotent=True)
+    response.raise_for_status()
+    result = decode(response.content, ChatCompletion)
+
+    # 提取AI的回复
+    if result.choices:
+        return result.choices[0].message.content
+    raise ValueError("API响应格式异常")
+
+def image_fingerprint(image_path, model_id="gemini-2.5-pro", raw=False):
+    """
+    图片在缓存键中的标识：原始文件的 SHA256 + 预处理参数
+
+    只需读一遍原始文件，不做预处理，因此可以在编码图片之前查询缓存。
+    预处理参数（模型的分辨率上限、质量，或 raw 时按扩展名推断的 MIME 类型）变化时键也随之变化。
+    """
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    if raw:
+        params = f"raw;{guess_mime_type(image_path)}"
+    else:
+        max_long, max_short = resolution_limit(model_id)
+        params = f"{max_long}x{max_short};q{IMAGE_QUALITY}"
+    return f"{digest.hexdigest()};{params}"
+
+def _image_cache_key(model_id, prompt, fingerprint):
+    return make_key(model_id, prompt, fingerprint)
+
+def lookup_cache(cache, model_id, prompt, image_path, raw=False):
+    """按 (模型, 提示词, 图片标识) 查询缓存，返回 (缓存键, 缓存结果或 None)；cache 为 None 时返回 (None, None)"""
+    if cache is None:
+        return None, None
+    cache_key = _image_cache_key(model_id, prompt, image_fingerprint(image_path, model_id, raw))
+    return cache_key, cache.get(cache_key)
+
+def _parse_packed_answer(text, count):
+    """解析打包请求的回答，返回按图片顺序排列的结果列表；编号缺失或重复时抛出异常"""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("打包回答中没有 JSON 对象")
+    entries = json.loads(text[start:end + 1]).get("results")
+    if not isinstance(entries, list):
+        raise ValueError("打包回答缺少 results 数组")
+
+    results = [None] * count
+    for entry in entries:
+        index = entry.get("index") if isinstance(entry, dict) else None
+        if not isinstance(index, int) or not 1 <= index <= count or results[index - 1] is not None:
+            raise ValueError(f"打包回答中的图片编号无效: {index}")
+        result = entry.get("result")
+        if not isinstance(result, str):
+            result = json.dumps(result, ensure_ascii=False)
+        if not result.strip():
+            raise ValueError(f"图片 {index} 的回答为空")
+        results[index - 1] = result
+    missing = [str(i + 1) for i, result in enumerate(results) if result is None]
+    if missing:
+        raise ValueError(f"打包回答缺少图片 {', '.join(missing)}")
+    return results
+
+def request_packed_inference(prompt, images, model_id="gemini-2.5-pro", api_key="sk-",
+                             session=None, timeout=DEFAULT_TIMEOUT):
+    """
+    把多张图片放进同一个请求，返回与 images 顺序一致的结果列表，失败时抛出异常
+
+    images 为 [(base64, MIME 类型), ...]。每张图片前加编号标签，要求模型输出
+    {"results": [{"index": 编号, "result": 回答}]}，回答不完整同样视为失败。
+    """
+    content = [{"type": "text", "text": PACKED_PROMPT.format(count=len(images), prompt=prompt.strip())}]
+    for index, (base64_image, mime_type) in enumerate(images, 1):
+        content.append({"type": "text", "text": f"图片 {index}:"})
+        content.append({"type": "image_url", "image_url": {"url": image_data_url(base64_image, mime_type)}})
+    return _parse_packed_answer(_post_chat(content, model_id, api_key, session, timeout) or "", len(images))
+
+def pack_images(images, max_images=8, max_bytes=DEFAULT_PACK_MAX_BYTES):
+    """按图片数和 base64 总大小贪心分组，返回下标分组列表（单张超限的图片单独成组）"""
+    groups, group, size = [], [], 0
+    for index, (base64_image, _) in enumerate(images):
+        if group and (len(group) >= max_images or size + len(base64_image) > max_bytes):
+            groups.append(group)
+            group, size = [], 0
+        group.append(index)
+        size += len(base64_image)
+    if group:
+        groups.append(group)
+    return groups
+
+def packed_inference(prompt, images, model_id="gemini-2.5-pro", api_key="sk-", session=None,
+                     timeout=DEFAULT_TIMEOUT, cache=None, max_images=8, max_bytes=DEFAULT_PACK_MAX_BYTES,
+                     cache_keys=None):
+    """
+    打包视觉理解：返回与 images 顺序一致的 [(结果, 错误), ...]
+
+    图片按预算分组打包请求。打包请求失败或回答不完整时对半拆分重试，拆到单张时退回普通请求，
+    因此一张图片的问题不会拖累整组。传入 cache 和与 images 对应的 cache_keys 时，成功的结果写入缓存
+    （已缓存的图片应由调用方在编码前剔除）。
+    """
+    outcomes = [None] * len(images)
+    keys = cache_keys if cache is not None and cache_keys is not None else [None] * len(images)
+    pending = list(range(len(images)))
+
+    def run(indices):
+        if len(indices) == 1:
+            base64_image, mime_type = images[indices[0]]
+            try:
+                outcomes[indices[0]] = (request_inference(prompt, base64_image, model_id, api_key, session,
+                                                          timeout, mime_type, cache, keys[indices[0]]), None)
+            except Exception as e:
+                outcomes[indices[0]] = (None, e)
+            return
+        try:
+            results = request_packed_inference(prompt, [images[i] for i in indices], model_id, api_key,
+                                               session, timeout)
+        except Exception as e:
+            print(f"⚠️ {len(indices)} 张图片的打包请求失败，拆分重试: {e}")
+            middle = len(indices) // 2
+            run(indices[:middle])
+            run(indices[middle:])
+            return
+        for index, result in zip(indices, results):
+            outcomes[index] = (result, None)
+            if cache is not None and keys[index] is not None:
+                cache.set(keys[index], result, model_id)
+
+    for group in pack_images([images[i] for i in pending], max_images, max_bytes):
+        run([pending[i] for i in group])
+    return outcomes
+
+def upload_image(image_path, model_id="gemini-2.5-pro", api_key="sk-", session=None, raw=False,
+                 timeout=DEFAULT_TIMEOUT):
+    """
+    上传图片到 /v1/files（purpose="vision"），返回 file_id
+
+    默认上传按模型分辨率预处理后的图片；raw=True 时以流式 multipart 上传原始文件。
+    """
+    headers = {"Authorization": f"Bearer {api_key}"}
+    http = session or get_session()
+    if raw:
+        encoder = MultipartEncoder(
+            fields={"purpose": "vision"},
+            files={"file": (os.path.basename(image_path), image_path, guess_mime_type(image_path))},
+        )
+        with encoder:
+            headers["Content-Type"] = encoder.content_type
+            response = http.post(FILES_URL, headers=headers, data=encoder, timeout=timeout)
+    else:
+        prepared = preprocess_image(image_path, model_id)
+        extension = mimetypes.guess_extension(prepared.mime_type) or ".img"
+        filename = os.path.splitext(os.path.basename(image_path))[0] + extension
+        files = {"file": (filename, base64.b64decode(prepared.base64), prepared.mime_type)}
+        response = http.post(FILES_URL, headers=headers, data={"purpose": "vision"}, files=files, timeout=timeout)
+    response.raise_for_status()
+    return response.json()["id"]
+
+def delete_file(file_id, api_key="sk-", session=None, timeout=DEFAULT_TIMEOUT):
+    """删除已上传的文件，失败时只打印警告"""
+    try:
+        http = session or get_session()
+        http.delete(f"{FILES_URL}/{file_id}", headers={"Authorization": f"Bearer {api_key}"},
+                    timeout=timeout).raise_for_status()
+    except Exception as e:
+        print(f"⚠️ 删除已上传文件 {file_id} 失败: {e}")
+
+def ask_many(image_path, questions, model_id="gemini-2.5-pro", api_key="sk-", workers=8, share="auto",
+             raw=False, cache=None):
+    """
+    对同一张图片并发提出多个问题，按问题顺序返回 [(问题, 结果, 错误), ...]
+
+    share 决定图片如何在多个问题之间共享：
+    - "file"：图片只上传一次（/v1/files），每个问题只引用 file_id，请求体只有几百字节
+    - "prefix"：每个请求都内嵌图片，但图片放在消息最前面、问题放在最后，
+      所有请求共享相同的前缀，可以命中服务端的前缀缓存
+    - "auto"：优先使用 "file"，上传失败或接口不支持文件引用时退回 "prefix"
+    图片只编码一次，且只在有未缓存的问题时才编码；结果缓存与单张模式共用同一个键，
+    两种方式得到的结果可以互相命中。
+    """
+    outcomes = [None] * len(questions)
+    keys = [None] * len(questions)
+    pending = []
+    fingerprint = image_fingerprint(image_path, model_id, raw) if cache is not None else None
+    for index, question in enumerate(questions):
+        if cache is not None:
+            keys[index] = _image_cache_key(model_id, question, fingerprint)
+            cached = cache.get(keys[index])
+            if cached is not None:
+                outcomes[index] = (question, cached, None)
+                continue
+        pending.append(index)
+    if not pending:
+        return outcomes
+
+    base64_image, mime_type = encode_image(image_path, model_id, raw)
+    if not base64_image:
+        raise ValueError("图片加载失败")
+
+    session = get_session(pool_size=workers)
+    file_id = None
+    try:
+        if share in ("auto", "file"):
+            try:
+                file_id = upload_image(image_path, model_id, api_key, session, raw)
+                print(f"📤 图片已上传一次，file_id: {file_id}")
+            except Exception as e:
+                if share == "file":
+                    raise
+                print(f"⚠️ 图片上传失败，改为共享前缀方式: {e}")
+
+        prefix_part = {"type": "image_url", "image_url": {"url": image_data_url(base64_image, mime_type)}}
+        image_part = {"type": "file", "file": {"file_id": file_id}} if file_id else prefix_part
+
+        def ask(index):
+            answer = _post_chat([image_part, {"type": "text", "text": questions[index]}],
+                                model_id, api_key, session)
+            if cache is not None and answer:
+                cache.set(keys[index], answer, model_id)
+            return answer
+
+        if file_id and share == "auto":
+            # 先用一个问题确认接口支持文件引用，不支持时整体退回共享前缀
+            first = pending[0]
+            try:
+                outcomes[first] = (questions[first], ask(first), None)
+                pending = pending[1:]
+            except requests.HTTPError as e:
+                if e.response is None or not 400 <= e.response.status_code < 500:
+                    raise
+                print(f"⚠️ 接口不支持文件引用（{e.response.status_code}），改为共享前缀方式")
+                image_part = prefix_part
+
+        for index, answer, error in bounded_map(ask, pending, max_workers=workers):
+            outcomes[index] = (questions[index], answer, error)
+    finally:
+        if file_id:
+            delete_file(file_id, api_key, session)
+    return outcomes
+
+def save_qa_results(outcomes, image_path, model_name="Gemini 2.5 Pro"):
+    """把多问题的回答保存到一个结果文件"""
+    try:
+        f, result_file = open_result_file("qa_result")
+        with f:
+            _write_result_header(f, image_path, model_name)
+            for index, (question, answer, error) in enumerate(outcomes, 1):
+                f.write(f"\n[问题 {index}] {question}\n")
+                f.write(f"{answer}\n" if error is None else f"❌ 请求失败: {error}\n")
+        print(f"📄 问答结果已保存到: {result_file}")
+        return result_file
+    except Exception as e:
+        print(f"❌ 保存结果失败: {e}")
+        return None
+
+def load_questions(args):
+    """从 --question 和 --questions 文件（每行一个问题）收集问题"""
+    questions = list(args.question or [])
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            questions.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return questions
+
+@traced("vision.api_inference")
+def api_inference(prompt, base64_image, model_id="gemini-2.5-pro", api_key="sk-",
+                  session=None, timeout=DEFAULT_TIMEOUT, mime_type="image/jpeg", cache=None, cache_key=None):
+    """调用API进行图像视觉理解（传入 cache 和 cache_key 时把结果写入本地缓存）"""
     try:
         print("🤖 正在调用Gemini 2.5 Pro进行图像视觉理解...")
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        result = response.json()
-        
-        # 提取AI的回复
-        if "choices" in result and result["choices"]:
-            ai_response = result["choices"][0]["message"]["content"]
-            return ai_response
-        else:
-            print("❌ API响应格式异常")
-            return None
-            
+        return request_inference(prompt, base64_image, model_id, api_key, session, timeout, mime_type,
+                                 cache, cache_key)
     except Exception as e:
         print(f"❌ 请求失败: {e}")
         return None
 
+def open_result_file(prefix="analysis_result"):
+    """
+    以独占方式创建结果文件，返回 (文件对象, 文件名)
+
+    文件名包含秒级时间戳和进程号，同名文件已存在时追加序号，
+    同一秒内结束的多次运行不会互相覆盖。
+    """
+    stem = f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+    for attempt in range(1000):
+        result_file = f"{stem}.txt" if attempt == 0 else f"{stem}_{attempt}.txt"
+        try:
+            return open(result_file, "x", encoding="utf-8"), result_file
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"无法创建结果文件: {stem}.txt")
+
+def _write_result_header(f, image_path, model_name="Gemini 2.5 Pro"):
+    f.write(f"图片路径: {image_path}\n")
+    f.write(f"分析时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+    f.write(f"模型: {model_name}\n")
+    f.write("-" * 50 + "\n")
+    f.write("AI视觉理解结果:\n")
+
 def save_analysis_result(result, image_path):
     """保存分析结果到文件"""
-    timestamp = int(time.time())
-    result_file = f"analysis_result_{timestamp}.txt"
-    
     try:
-        with open(result_file, "w", encoding="utf-8") as f:
-            f.write(f"图片路径: {image_path}\n")
-            f.write(f"分析时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))}\n")
-            f.write(f"模型: Gemini 2.5 Pro\n")
-            f.write("-" * 50 + "\n")
-            f.write("AI视觉理解结果:\n")
+        f, result_file = open_result_file()
+        with f:
+            _write_result_header(f, image_path)
             f.write(result)
         
         print(f"📄 分析结果已保存到: {result_file}")
@@ -70,13 +424,309 @@ def save_analysis_result(result, image_path):
         print(f"❌ 保存结果失败: {e}")
         return None
 
+def stream_inference(prompt, base64_image, model_id="gemini-2.5-pro", api_key="sk-", session=None,
+                     timeout=DEFAULT_TIMEOUT, mime_type="image/jpeg"):
+    """
+    以流式方式发送视觉理解请求，逐段产出增量文本
+
+    连接中断或服务端在流中返回错误时抛出异常，已产出的内容由调用方自行保留。
+    """
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json",
+               "Accept": "text/event-stream"}
+    content = [
+        {"type": "text", "text": prompt},
+        {"type": "image_url", "image_url": {"url": image_data_url(base64_image, mime_type)}}
+    ]
+    payload = {"model": model_id, "messages": [{"role": "user", "content": content}], "stream": True}
+
+    http = session or get_session()
+    with JsonBody(payload) as body, http.post(API_URL, headers=headers, data=body, timeout=timeout, stream=True,
+                                              idempotent=True) as response:
+        response.raise_for_status()
+        yield from iter_chat_deltas(response.iter_lines())
+
+@traced("vision.api_inference_stream")
+def api_inference_stream(prompt, base64_image, image_path, model_id="gemini-2.5-pro", api_key="sk-",
+                         session=None, timeout=DEFAULT_TIMEOUT, mime_type="image/jpeg", cache=None,
+                         cache_key=None):
+    """
+    流式视觉理解：收到的文本立即打印并追加写入结果文件
+
+    返回 (完整结果或 None, 结果文件名)。连接中断时保留已收到的部分内容，
+    并在结果文件末尾注明结果不完整；传入 cache 和 cache_key 时只有完整结果才会写入缓存。
+    """
+    print("🤖 正在调用Gemini 2.5 Pro进行图像视觉理解（流式输出）...")
+    f, result_file = open_result_file()
+    parts = []
+    start = time.time()
+    first_token = None
+    with f:
+        _write_result_header(f, image_path, model_id)
+        f.flush()
+        try:
+            for delta in stream_inference(prompt, base64_image, model_id, api_key, session, timeout, mime_type):
+                if first_token is None:
+                    first_token = time.time() - start
+                    print(f"⚡ 首个 token 用时 {first_token:.2f} 秒")
+                    print("-" * 30)
+                parts.append(delta)
+                print(delta, end="", flush=True)
+                f.write(delta)
+                f.flush()
+        except Exception as e:
+            f.write(f"\n\n[连接中断，以上为部分结果: {e}]\n")
+            print(f"\n❌ 流式请求中断: {e}")
+            if parts:
+                print(f"📄 已收到的 {len(''.join(parts))} 个字符保存在: {result_file}")
+            return None, result_file
+
+    print()
+    print("-" * 30)
+    result = "".join(parts)
+    print(f"⏱️ 总用时 {time.time() - start:.2f} 秒")
+    print(f"📄 分析结果已保存到: {result_file}")
+    if cache is not None and cache_key is not None and result:
+        cache.set(cache_key, result, model_id)
+    return result, result_file
+
+@traced("vision.encode_image")
+def encode_image(image_path, model_id="gemini-2.5-pro", raw=False):
+    """
+    准备请求用的图片，返回 (base64, MIME 类型)
+
+    默认按模型实际使用的分辨率缩放并重新编码（结果按内容哈希缓存）；
+    raw=True 时直接发送原始文件，只按扩展名标注 MIME 类型；此时 base64 为 Base64File 占位对象，
+    请求体发送时才从文件分块编码。
+    """
+    if raw:
+        return open_image_base64(image_path), guess_mime_type(image_path)
+    prepared = preprocess_image(image_path, model_id, IMAGE_QUALITY)
+    return prepared.base64, prepared.mime_type
+
+def iter_images_from_dirs(directories):
+    """递归遍历目录，按需产出图片路径"""
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield {"image": os.path.join(root, name)}
+
+def iter_images_from_manifest(manifest_path):
+    """读取清单：每行一个图片路径，或 JSON 对象 {"image": ..., "prompt": ...}"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item = json.loads(line) if line.startswith("{") else {"image": line}
+            if not os.path.isabs(item["image"]):
+                item["image"] = os.path.join(base_dir, item["image"])
+            yield item
+
+def load_checkpoint(output_path):
+    """读取已有的结果文件，返回已成功处理的图片路径集合（用于断点续跑）"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # 上次中断时写了一半的行
+            if record.get("result") is not None:
+                done.add(record["image"])
+    return done
+
+def iter_packs(items, pack_size):
+    """把待处理图片按提示词分组，每组最多 pack_size 张（提示词不同的图片不能放进同一个请求）"""
+    group, group_prompt = [], None
+    for item in items:
+        item_prompt = item.get("prompt")
+        if group and (len(group) >= pack_size or item_prompt != group_prompt):
+            yield group
+            group = []
+        group_prompt = item_prompt
+        group.append(item)
+    if group:
+        yield group
+
+def run_batch(items, output_path, prompt, model_id="gemini-2.5-pro", api_key="sk-", workers=8, raw=False,
+              cache=None, pack_size=1, pack_max_bytes=DEFAULT_PACK_MAX_BYTES, dedup_threshold=None,
+              dedup_method="dhash"):
+    """
+    批量视觉理解：并发调用API，每完成一张立即追加一行结果到 JSONL 文件
+
+    结果文件同时作为断点：重新运行时跳过已成功的图片，失败的图片会重试。
+    pack_size > 1 时启用打包模式：每个请求携带最多 pack_size 张图片（且 base64 总大小不超过
+    pack_max_bytes），打包请求失败时自动拆分重试。
+    dedup_threshold 不为 None 时先按感知哈希对待处理图片分组，每组只请求代表图片，
+    其余图片复用代表的结果（记录中带 duplicate_of 字段）。
+    """
+    done = load_checkpoint(output_path)
+    if done:
+        print(f"♻️ 断点续跑：已完成 {len(done)} 张，将跳过")
+
+    stats = {"success": 0, "failed": 0, "skipped": 0, "duplicates": 0}
+
+    def pending_items():
+        for item in items:
+            if item["image"] in done:
+                stats["skipped"] += 1
+                continue
+            yield item
+
+    # 近似重复去重：需要先拿到全部待处理图片才能分组
+    duplicates = {}
+    queue = pending_items()
+    if dedup_threshold is not None:
+        from apiyi_utils.dedup import group_duplicates
+
+        pending = list(queue)
+        representatives = group_duplicates([item["image"] for item in pending], dedup_threshold, dedup_method,
+                                           keys=[item.get("prompt") for item in pending])
+        for position, representative in enumerate(representatives):
+            if representative != position:
+                duplicates.setdefault(id(pending[representative]), []).append(pending[position])
+        queue = [item for position, item in enumerate(pending) if representatives[position] == position]
+        print(f"🧬 近似重复去重：{len(pending)} 张图片分为 {len(queue)} 组，减少 {len(pending) - len(queue)} 次请求")
+
+    session = get_session(pool_size=workers)
+
+    def process(item):
+        start = time.time()
+        item_prompt = item.get("prompt") or prompt
+        cache_key, cached = lookup_cache(cache, model_id, item_prompt, item["image"], raw)
+        if cached is not None:
+            return [(item, cached, None, time.time() - start)]
+        base64_image, mime_type = encode_image(item["image"], model_id, raw)
+        if not base64_image:
+            raise ValueError("图片加载失败")
+        result = request_inference(item_prompt, base64_image, model_id, api_key, session,
+                                   mime_type=mime_type, cache=cache, cache_key=cache_key)
+        return [(item, result, None, time.time() - start)]
+
+    def process_pack(group):
+        start = time.time()
+        group_prompt = group[0].get("prompt") or prompt
+        outcomes, encoded, images, keys = [], [], [], []
+        for item in group:
+            try:
+                cache_key, cached = lookup_cache(cache, model_id, group_prompt, item["image"], raw)
+                if cached is not None:
+                    outcomes.append((item, cached, None, time.time() - start))
+                    continue
+                base64_image, mime_type = encode_image(item["image"], model_id, raw)
+                if not base64_image:
+                    raise ValueError("图片加载失败")
+            except Exception as e:
+                outcomes.append((item, None, e, None))
+                continue
+            encoded.append(item)
+            images.append((base64_image, mime_type))
+            keys.append(cache_key)
+        if images:
+            results = packed_inference(group_prompt, images, model_id, api_key, session, cache=cache,
+                                       max_images=pack_size, max_bytes=pack_max_bytes, cache_keys=keys)
+            elapsed = time.time() - start
+            for item, (result, error) in zip(encoded, results):
+                outcomes.append((item, result, error, elapsed))
+        return outcomes
+
+    if pack_size > 1:
+        func, tasks = process_pack, iter_packs(queue, pack_size)
+    else:
+        func, tasks = process, queue
+
+    def write_record(out, item, result, error, elapsed, duplicate_of=None):
+        record = {"image": item["image"], "model": model_id,
+                  "finished_at": time.strftime('%Y-%m-%d %H:%M:%S')}
+        if duplicate_of is not None:
+            record["duplicate_of"] = duplicate_of
+        if error is None:
+            record["result"] = result
+            if elapsed is not None:
+                record["elapsed"] = round(elapsed, 3)
+            stats["success"] += 1
+            print(f"✅ {item['image']}" + (f"（复用 {duplicate_of} 的结果）" if duplicate_of else ""))
+        else:
+            record["result"], record["error"] = None, str(error)
+            stats["failed"] += 1
+            print(f"❌ {item['image']}: {error}")
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        for task, value, error in bounded_map(func, tasks, max_workers=workers):
+            if error is not None:
+                group = task if isinstance(task, list) else [task]
+                value = [(item, None, error, None) for item in group]
+            for item, result, item_error, elapsed in value:
+                write_record(out, item, result, item_error, elapsed)
+                for duplicate in duplicates.get(id(item), ()):
+                    stats["duplicates"] += 1
+                    write_record(out, duplicate, result, item_error, None, item["image"])
+            out.flush()
+    return stats
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Gemini 2.5 Pro 图片视觉理解")
+    parser.add_argument("--image", default="otter.png", help="单张模式：图片路径")
+    parser.add_argument("--batch-dir", nargs="+", help="批量模式：递归遍历的图片目录（可多个）")
+    parser.add_argument("--manifest", help="批量模式：清单文件（每行一个路径或 JSON 对象）")
+    parser.add_argument("--output", default="analysis_results.jsonl", help="批量模式：结果 JSONL 文件（同时作为断点）")
+    parser.add_argument("--workers", type=int, default=8, help="批量/多问题模式：并发请求数")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT, help="分析提示词")
+    parser.add_argument("--model", default="gemini-2.5-pro", help="模型名称")
+    parser.add_argument("--raw", action="store_true", help="不做预处理，直接发送原始图片文件")
+    parser.add_argument("--stream", action="store_true", help="单张模式：流式输出，边接收边显示并写入结果文件")
+    parser.add_argument("--question", action="append", help="多问题模式：对同一张图片提出的问题（可重复）")
+    parser.add_argument("--questions", help="多问题模式：问题文件，每行一个问题")
+    parser.add_argument("--share", choices=["auto", "file", "prefix"], default="auto",
+                        help="多问题模式：图片共享方式（file=上传一次按 file_id 引用，prefix=共享消息前缀）")
+    parser.add_argument("--pack", type=int, default=1, help="批量模式：每个请求打包的最大图片数（大于 1 时启用打包）")
+    parser.add_argument("--pack-max-mb", type=float, default=DEFAULT_PACK_MAX_BYTES / 1024 / 1024,
+                        help="打包模式：单个请求的图片总大小上限（MB，按 base64 计）")
+    parser.add_argument("--dedup", action="store_true", help="批量模式：按感知哈希合并近似重复的图片，每组只请求一次")
+    parser.add_argument("--dedup-threshold", type=int, default=6, help="去重：64 位哈希的汉明距离阈值")
+    parser.add_argument("--dedup-method", choices=["dhash", "phash"], default="dhash", help="去重：感知哈希算法")
+    parser.add_argument("--cache", default=default_cache_path("vision_results.sqlite3"), help="结果缓存文件（SQLite）")
+    parser.add_argument("--no-cache", action="store_true", help="不使用结果缓存，每次都请求API")
+    parser.add_argument("--cache-ttl", type=float, default=7 * 24 * 3600, help="缓存有效期（秒），默认 7 天")
+    parser.add_argument("--cache-max-entries", type=int, default=100000, help="缓存最大条目数，超出时淘汰最久未用的条目")
+    parser.add_argument("--api-key", default=os.getenv("APIYI_API_KEY", "sk-"), help="API Key（默认读取 APIYI_API_KEY 环境变量）")
+    return parser.parse_args()
+
 def main():
     """主函数"""
+    args = parse_arguments()
+
     print("🔍 Gemini 2.5 Pro 图片视觉理解系统")
     print("=" * 50)
+
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache, ttl=args.cache_ttl, max_entries=args.cache_max_entries)
+
+    # 批量模式
+    if args.batch_dir or args.manifest:
+        items = iter_images_from_manifest(args.manifest) if args.manifest else iter_images_from_dirs(args.batch_dir)
+        print(f"📂 批量模式：并发数 {args.workers}，结果写入 {args.output}")
+        if args.pack > 1:
+            print(f"📦 打包模式：每个请求最多 {args.pack} 张图片，总大小不超过 {args.pack_max_mb:g} MB")
+        stats = run_batch(items, args.output, args.prompt, args.model, args.api_key, args.workers, args.raw, cache,
+                          args.pack, int(args.pack_max_mb * 1024 * 1024),
+                          args.dedup_threshold if args.dedup else None, args.dedup_method)
+        print(f"\n📊 批量分析完成: 成功 {stats['success']}，失败 {stats['failed']}，跳过 {stats['skipped']}")
+        if stats["duplicates"]:
+            print(f"🧬 {stats['duplicates']} 张近似重复图片复用了代表图片的结果")
+        if cache is not None:
+            print(f"💾 缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+        return
     
     # 检查图片是否存在
-    image_path = "otter.png"
+    image_path = args.image
     if not os.path.exists(image_path):
         print(f"❌ 找不到图片文件: {image_path}")
         print("请确保在当前目录下有 otter.png 文件")
@@ -84,28 +734,60 @@ def main():
     
     print(f"📸 发现图片: {image_path}")
     
-    # 加载图片并转换为base64
-    base64_image = load_image_to_base64(image_path)
+    # 多问题模式：图片只上传/编码一次，问题并发发送
+    questions = load_questions(args)
+    if questions:
+        print(f"❓ 多问题模式：{len(questions)} 个问题，并发数 {args.workers}，共享方式 {args.share}")
+        try:
+            outcomes = ask_many(image_path, questions, args.model, args.api_key, args.workers, args.share,
+                                args.raw, cache)
+        except Exception as e:
+            print(f"❌ 多问题请求失败: {e}")
+            return
+        for index, (question, answer, error) in enumerate(outcomes, 1):
+            print(f"\n[问题 {index}] {question}")
+            print("-" * 30)
+            print(answer if error is None else f"❌ 请求失败: {error}")
+        save_qa_results(outcomes, image_path, args.model)
+        return
+
+    # 先按原始文件哈希查询缓存，命中时不需要预处理图片
+    cache_key, cached = lookup_cache(cache, args.model, args.prompt, image_path, args.raw)
+    if cached is not None:
+        print("💾 命中本地缓存，未发起网络请求")
+        print("\n🎯 AI视觉理解结果:")
+        print("-" * 30)
+        print(cached)
+        print("-" * 30)
+        save_analysis_result(cached, image_path)
+        print("\n✅ 图片视觉理解完成!")
+        return
+
+    # 加载图片并转换为base64（默认按模型分辨率缩放并压缩）
+    try:
+        base64_image, mime_type = encode_image(image_path, args.model, args.raw)
+    except Exception as e:
+        print(f"图片预处理失败: {e}")
+        base64_image = None
     if not base64_image:
         print("❌ 图片加载失败")
         return
+
+    print(f"✅ 图片已成功转换为base64格式（{mime_type}，{len(base64_image) // 1024} KB，原始文件 {os.path.getsize(image_path) // 1024} KB）")
     
-    print("✅ 图片已成功转换为base64格式")
-    
-    # 定义分析提示词
-    prompt = """
-    请详细分析这张图片，包括：
-    1. 图片中的主要对象或动物
-    2. 对象的外观特征、颜色、姿态
-    3. 背景环境描述
-    4. 图片的整体风格和色调
-    5. 图片给人的情感感受
-    
-    请用中文详细描述你看到的内容。
-    """
-    
+    # 流式模式：边接收边显示并写入结果文件
+    if args.stream:
+        result, _ = api_inference_stream(args.prompt, base64_image, image_path, args.model, args.api_key,
+                                         mime_type=mime_type, cache=cache, cache_key=cache_key)
+        if result:
+            print("\n✅ 图片视觉理解完成!")
+        else:
+            print("❌ 视觉理解失败，请检查API配置或网络连接")
+        return
+
     # 调用API进行视觉理解
-    result = api_inference(prompt, base64_image)
+    result = api_inference(args.prompt, base64_image, args.model, args.api_key, mime_type=mime_type, cache=cache,
+                           cache_key=cache_key)
     
     if result:
         print("\n🎯 AI视觉理解结果:")
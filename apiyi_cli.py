@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API易 示例脚本的统一命令行入口
+
+    python apiyi_cli.py <子命令> [参数]
+
+子命令：
+    sora        Sora 2 视频生成（传 --image 为图生视频，否则为文生视频）
+    veo3        Veo3 视频生成
+    flux        Flux 文生图（flux generate）/ 图像编辑（flux edit）
+    gpt-image   gpt-image-1 图像编辑（参数同 openai-gpt-image-1-edits-and-mask-demo.py）
+    vision      视觉理解（参数同 Vision-API-OpenAI/vision-test.py）
+    extract     Responses API 结构化抽取（参数同 responses_extraction.py）
+
+启动速度：本文件只导入标准库，解析完参数后才导入对应子命令的脚本，
+openai、pydantic、PIL、python-dotenv 只在用到它们的子命令（flux generate、extract）或代码路径中导入。
+适合在 cron、shell 循环中频繁调用。查看某个子命令的启动开销和导入的重量级依赖：
+
+    python apiyi_cli.py --startup-check sora
+    python benchmarks/cli_startup.py          # 所有子命令的冷启动时间与预算对比
+
+API Key 默认读取环境变量 APIYI_API_KEY（sora、veo3、flux），未设置时使用各脚本中配置的值。
+"""
+
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SCRIPTS = {
+    "sora": "sora-2-api-asynchronous/image-or-text-to-video/sora-2-async.py",
+    "veo3": "veo3-video-generate-demo.py",
+    "flux-generate": "flux-Image-API/flux-image-generate-demo.py",
+    "flux-edit": "flux-Image-API/flux-image-edit-demo.py",
+    "gpt-image": "openai-gpt-image-1-edits-and-mask-demo.py",
+    "vision": "Vision-API-OpenAI/vision-test.py",
+    "extract": "responses_extraction.py",
+}
+
+# 参数原样交给脚本自己的 argparse 处理的子命令
+FORWARDED = {"gpt-image", "vision", "extract"}
+
+# --startup-check 报告的重量级依赖
+HEAVY_MODULES = ("openai", "pydantic", "PIL", "dotenv", "httpx", "requests", "numpy")
+
+
+def load_script(key: str):
+    """按路径导入子命令对应的脚本（文件名含连字符，不能直接 import）"""
+    path = os.path.join(ROOT, SCRIPTS[key])
+    name = "apiyi_cli_" + key.replace("-", "_")
+    if name in sys.modules:
+        return sys.modules[name]
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def script_key(args) -> str:
+    return f"flux-{args.action}" if args.command == "flux" else args.command
+
+
+def run_sora(module, args):
+    module.IMAGE_PATH = args.image
+    for option, name in (("prompt", "PROMPT"), ("model", "MODEL"), ("size", "SIZE"), ("seconds", "SECONDS"),
+                         ("api_key", "API_KEY")):
+        value = getattr(args, option)
+        if value:
+            setattr(module, name, value)
+    module.main()
+
+
+def run_veo3(module, args):
+    module.main(args.api_key or module.API_KEY, args.prompt or module.DEFAULT_PROMPT)
+
+
+def run_flux(module, args):
+    from apiyi_utils import postprocess
+
+    if args.postprocess:
+        postprocess.enable()
+    try:
+        if args.action == "generate":
+            if args.api_key:
+                module.client.api_key = args.api_key
+            if args.prompt:
+                module.prompt = args.prompt
+            module.aspect_ratio = args.aspect_ratio
+            module.main()
+            return
+        if args.api_key:
+            module.API_KEY = args.api_key
+        image_path = module.get_image_file(args.image)
+        if not image_path:
+            raise SystemExit(f"❌ 无法获取原始图片: {args.image}")
+        mask_path = module.get_image_file(args.mask) if args.mask else None
+        print(f"正在编辑图片...（宽高比 {args.aspect_ratio}，模型 {args.model}）")
+        result = module.edit_image_streaming(image_path, args.prompt or "Only remove the two adults in the picture",
+                                             aspect_ratio=args.aspect_ratio, mask_path=mask_path, model=args.model)
+        filename = module.save_image_from_response(result, "edited")
+        if not filename:
+            raise SystemExit(1)
+        print(f"✅ 图片编辑完成！保存为: {filename}")
+    finally:
+        postprocess.shutdown()
+
+
+def run_forwarded(module, args, rest):
+    sys.argv = [SCRIPTS[args.command]] + rest
+    module.main()
+
+
+def startup_report(key: str):
+    elapsed = (time.perf_counter() - _STARTED) * 1000
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"⏱️ {key}: 启动到可以发送请求用时 {elapsed:.0f} ms（不含解释器启动）")
+    print(f"📦 已导入的重量级依赖: {', '.join(loaded) or '无'}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="apiyi_cli.py", description="API易 示例脚本的统一命令行入口")
+    parser.add_argument("--startup-check", action="store_true",
+                        help="只导入子命令需要的模块并报告启动开销，不发送请求")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="子命令")
+
+    api_key_help = "API Key（默认读取 APIYI_API_KEY 环境变量，未设置时使用脚本中的配置）"
+    default_key = os.getenv("APIYI_API_KEY")
+
+    sora = commands.add_parser("sora", help="Sora 2 视频生成")
+    sora.add_argument("--image", help="参考图片路径（图生视频），不传时为文生视频")
+    sora.add_argument("--prompt", help="视频提示词")
+    sora.add_argument("--model", help="模型名称，默认 sora-2")
+    sora.add_argument("--size", help="视频尺寸，1280x720 或 720x1280")
+    sora.add_argument("--seconds", help="视频时长（秒），10 或 15")
+    sora.add_argument("--api-key", default=default_key, help=api_key_help)
+
+    veo3 = commands.add_parser("veo3", help="Veo3 视频生成")
+    veo3.add_argument("--prompt", help="视频提示词")
+    veo3.add_argument("--api-key", default=default_key, help=api_key_help)
+
+    flux = commands.add_parser("flux", help="Flux 文生图 / 图像编辑")
+    flux.add_argument("action", choices=["generate", "edit"], help="generate 文生图，edit 图像编辑")
+    flux.add_argument("--prompt", help="提示词（文生图）或编辑指令（图像编辑）")
+    flux.add_argument("--aspect-ratio", default="1:1", help="宽高比，3:7 ~ 7:3，默认 1:1")
+    flux.add_argument("--image", default="otter.png", help="图像编辑：原图路径或 URL")
+    flux.add_argument("--mask", help="图像编辑：蒙版路径或 URL（可选）")
+    flux.add_argument("--model", default="flux-kontext-max", help="图像编辑：模型名称")
+    flux.add_argument("--api-key", default=default_key, help=api_key_help)
+    flux.add_argument("--postprocess", action="store_true", help="为保存的图片生成缩略图和元数据（也可设置 APIYI_POSTPROCESS=1）")
+
+    for name, help_text in (("gpt-image", "gpt-image-1 图像编辑"), ("vision", "视觉理解"),
+                            ("extract", "Responses API 结构化抽取")):
+        commands.add_parser(name, help=f"{help_text}（其余参数交给脚本处理，-h 查看）", add_help=False)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if rest and args.command not in FORWARDED:
+        parser.error(f"无法识别的参数: {' '.join(rest)}")
+
+    key = script_key(args)
+    module = load_script(key)
+    if args.startup_check:
+        return startup_report(key)
+    if args.command == "sora":
+        run_sora(module, args)
+    elif args.command == "veo3":
+        run_veo3(module, args)
+    elif args.command == "flux":
+        run_flux(module, args)
+    else:
+        run_forwarded(module, args, rest)
+
+
+if __name__ == "__main__":
+    main()
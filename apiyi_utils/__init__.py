@@ -0,0 +1,9 @@
+"""
+API易 示例代码公共模块
+
+各示例脚本共用的辅助功能放在这里，按功能拆分为独立的子模块，
+使用时按需导入（例如 from apiyi_utils import postprocess），
+本文件不主动导入任何子模块，避免拖慢脚本启动。
+
+子目录中的脚本需要先把仓库根目录加入 sys.path 再导入。
+"""
@@ -0,0 +1,248 @@
+"""
+b64_json 响应流式解码
+
+图像接口返回的 JSON 中 "b64_json" 字段往往有数 MB。B64JsonStreamDecoder 按块接收响应体，
+遇到 b64_json 字段时把其中的 base64 文本边读边解码写入文件，其余 JSON 内容保留为一个很小的
+"骨架"字符串（b64_json 的值被替换为占位说明），可直接用于日志预览和 json.loads。
+
+整个过程中内存里只保留当前数据块和不足 4 个字符的 base64 余量，不会同时存在
+响应文本、解析后的字典、base64 字符串和解码后图像等多份完整副本。
+
+用法：
+    decoder = B64JsonStreamDecoder(lambda index: f"output_{index}.png")
+    for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+        decoder.feed(chunk)
+    decoder.close()
+    print(decoder.preview(500))
+    data = decoder.skeleton_json()
+"""
+
+import binascii
+import json
+import os
+from typing import Any, Callable, List, Optional
+
+# 读取响应体的块大小
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 骨架中字符串内容超过该长度时不再记录（键名都很短）
+_MAX_KEY_LENGTH = 64
+
+_WHITESPACE = b" \t\r\n"
+
+_HEX_DIGITS = b"0123456789abcdefABCDEF"
+
+
+class B64JsonStreamDecoder:
+    """增量解析 JSON，把指定字段的 base64 值分块解码写入文件"""
+
+    def __init__(self, output_path: Callable[[int], str], field: str = "b64_json"):
+        """
+        Args:
+            output_path: 根据字段出现的序号（从 0 开始）返回输出文件路径
+            field: 需要流式解码的字段名
+        """
+        self._output_path = output_path
+        self._field = field.encode("utf-8")
+        self._skeleton = bytearray()
+
+        # JSON 字符串扫描状态
+        self._in_string = False
+        self._escape = False
+        self._string = bytearray()
+        self._string_long = False
+        self._last_string: Optional[bytes] = None
+        self._after_key = 0  # 0: 无, 1: 已读到目标键名, 2: 已读到冒号
+
+        # base64 解码状态
+        self._in_b64 = False
+        self._b64_pending = b""  # 跨数据块的不完整转义序列（如 \u00）
+        self._b64_buffer = bytearray()
+        self._b64_bytes = 0
+        self._file = None
+        self._part_path = None
+
+        self.paths: List[str] = []
+        self.decoded_bytes = 0
+
+    def feed(self, chunk: bytes):
+        """输入一块响应数据"""
+        pos = 0
+        size = len(chunk)
+        while pos < size:
+            if self._in_b64:
+                pos = self._feed_b64(chunk, pos)
+                continue
+
+            byte = chunk[pos:pos + 1]
+            pos += 1
+            self._skeleton += byte
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._append_string(byte)
+                elif byte == b"\\":
+                    self._escape = True
+                elif byte == b'"':
+                    self._in_string = False
+                    self._last_string = None if self._string_long else bytes(self._string)
+                    self._after_key = 1 if self._last_string == self._field else 0
+                else:
+                    self._append_string(byte)
+                continue
+
+            if byte in _WHITESPACE:
+                continue
+            if byte == b'"':
+                if self._after_key == 2:
+                    self._start_b64()
+                else:
+                    self._in_string = True
+                    self._string = bytearray()
+                    self._string_long = False
+                continue
+            if byte == b":" and self._after_key == 1:
+                self._after_key = 2
+                continue
+            self._after_key = 0
+
+    def _append_string(self, byte: bytes):
+        if self._string_long:
+            return
+        if len(self._string) >= _MAX_KEY_LENGTH:
+            self._string_long = True
+            return
+        self._string += byte
+
+    def _start_b64(self):
+        """进入 base64 字段：打开输出文件（先写 .part 临时文件）"""
+        self._after_key = 0
+        self._in_b64 = True
+        self._b64_pending = b""
+        self._b64_buffer = bytearray()
+        self._b64_bytes = 0
+        path = self._output_path(len(self.paths))
+        self.paths.append(path)
+        self._part_path = f"{path}.part"
+        self._file = open(self._part_path, "wb")
+
+    def _feed_b64(self, chunk: bytes, pos: int) -> int:
+        """处理 base64 字段内容，返回新的读取位置"""
+        end = chunk.find(b'"', pos)
+        segment = chunk[pos:] if end < 0 else chunk[pos:end]
+        self._write_b64(self._unescape(segment))
+
+        if end < 0:
+            return len(chunk)
+
+        # 字段结束：写出剩余数据并把临时文件改名为正式文件
+        self._finish_b64()
+        return end + 1
+
+    def _unescape(self, segment: bytes) -> bytes:
+        """
+        去掉 JSON 转义：\\/ 和 \\uXXXX（如 \\u002F）还原为原字符，\\n 等空白转义直接丢弃；
+        数据块末尾不完整的转义留到下一块再处理。转义结果不是 base64 字符时抛出 ValueError。
+        """
+        data = self._b64_pending + segment if self._b64_pending else segment
+        self._b64_pending = b""
+        if b"\\" not in data:
+            return data
+
+        result = bytearray()
+        pos = 0
+        while True:
+            slash = data.find(b"\\", pos)
+            if slash < 0:
+                result += data[pos:]
+                break
+            result += data[pos:slash]
+            kind = data[slash + 1:slash + 2]
+            if kind == b"u":
+                digits = data[slash + 2:slash + 6]
+                if len(digits) < 4:
+                    self._b64_pending = data[slash:]
+                    break
+                if not all(digit in _HEX_DIGITS for digit in digits):
+                    raise ValueError(f"{self._field.decode()} 中有无效的 JSON 转义: {data[slash:slash + 6]!r}")
+                code = int(digits, 16)
+                if code >= 0x80:
+                    raise ValueError(f"{self._field.decode()} 中有非 base64 字符: \\u{digits.decode()}")
+                result.append(code)
+                pos = slash + 6
+            elif kind == b"/":
+                result += kind
+                pos = slash + 2
+            elif kind and kind in b"bfnrt":
+                pos = slash + 2  # 换行等空白，base64 解码时本来就会忽略
+            elif not kind:
+                self._b64_pending = data[slash:]
+                break
+            else:
+                raise ValueError(f"{self._field.decode()} 中有非 base64 字符: {data[slash:slash + 2]!r}")
+        return bytes(result)
+
+    def _write_b64(self, data: bytes):
+        if not data:
+            return
+        self._b64_bytes += len(data)
+        self._b64_buffer += data
+        usable = len(self._b64_buffer) // 4 * 4
+        if usable:
+            decoded = binascii.a2b_base64(bytes(self._b64_buffer[:usable]))
+            del self._b64_buffer[:usable]
+            self._file.write(decoded)
+            self.decoded_bytes += len(decoded)
+
+    def _finish_b64(self):
+        if self._b64_pending:
+            raise ValueError(f"{self._field.decode()} 以不完整的转义结束: {self._b64_pending!r}")
+        if self._b64_buffer:
+            decoded = binascii.a2b_base64(bytes(self._b64_buffer))
+            self._file.write(decoded)
+            self.decoded_bytes += len(decoded)
+            self._b64_buffer = bytearray()
+        self._file.close()
+        self._file = None
+        os.replace(self._part_path, self.paths[-1])
+        self._in_b64 = False
+
+        # 骨架中用占位说明代替 base64 内容
+        placeholder = f"<{self._field.decode()} {self._b64_bytes} 字符已解码写入 {self.paths[-1]}>"
+        self._skeleton += json.dumps(placeholder, ensure_ascii=False)[1:].encode("utf-8")
+
+    def close(self):
+        """响应读取结束；若 base64 字段未完整接收则删除临时文件"""
+        if self._file is not None:
+            self.abort()
+            raise ValueError("响应在 base64 数据中途结束，图像不完整")
+
+    def abort(self):
+        """放弃当前 base64 字段（读取中断或数据有误时调用）：关闭并删除 .part 临时文件，可重复调用"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        try:
+            os.remove(self._part_path)
+        except FileNotFoundError:
+            pass
+        self.paths.pop()
+        self._in_b64 = False
+        self._b64_pending = b""
+        self._b64_buffer = bytearray()
+
+    @property
+    def skeleton(self) -> str:
+        """去掉 base64 内容后的 JSON 文本"""
+        return self._skeleton.decode("utf-8", errors="replace")
+
+    def skeleton_json(self) -> Any:
+        """解析骨架 JSON（体积很小），格式错误时抛出 ValueError"""
+        return json.loads(self.skeleton)
+
+    def preview(self, limit: int = 500) -> str:
+        """日志预览，直接截取骨架文本，无需重新序列化"""
+        text = self.skeleton
+        return text[:limit] + "..." if len(text) > limit else text
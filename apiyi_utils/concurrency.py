@@ -0,0 +1,53 @@
+"""
+并发执行辅助函数
+
+bounded_map 从（可能很大的）输入迭代器中按需取任务，保证同时排队和执行的任务数有上限，
+适合处理成千上万个文件的批量模式：不会一次性把所有任务塞进线程池，内存占用恒定。
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+
+def bounded_map(func: Callable[[Any], Any], items: Iterable[Any], max_workers: int = 8,
+                max_pending: Optional[int] = None) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+    """
+    用线程池并发执行 func(item)，按完成顺序产出结果
+
+    Args:
+        func: 处理单个任务的函数
+        items: 任务迭代器，按需读取
+        max_workers: 线程数，即同时执行的任务数
+        max_pending: 已提交但未完成的任务上限（默认 max_workers * 2）
+
+    Yields:
+        (item, result, error)，成功时 error 为 None，失败时 result 为 None
+    """
+    max_pending = max(max_pending or max_workers * 2, max_workers)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}
+    iterator = iter(items)
+    exhausted = False
+
+    try:
+        while True:
+            # 补充任务直到达到上限
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(func, item)] = item
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                error = future.exception()
+                yield item, (None if error else future.result()), error
+    finally:
+        # 提前退出（如 Ctrl+C）时取消尚未开始的任务
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,226 @@
+"""
+感知哈希（dHash / pHash）近似重复图片去重
+
+图片库中常有大量近似重复的图片：缩放后的副本、重新压缩的 JPEG、连拍照片。
+它们分别发送给视觉理解或图像编辑接口，得到的结果几乎相同，却要付出同样的请求费用。
+
+group_duplicates 在发送请求前完成分组：
+1. 在进程池中解码图片并缩成灰度小图（JPEG 使用 draft 模式，解码时直接缩小）
+2. 每批小图堆叠成一个数组，用 NumPy 向量化计算 64 位哈希：
+   - dHash：9x8 灰度图中相邻像素的明暗比较
+   - pHash：32x32 灰度图做二维 DCT，取左上角 8x8 低频系数与中位数比较
+3. 用 HashIndex 查找汉明距离不超过阈值的已有代表图片：把 64 位哈希分成 (阈值 + 1) 段，
+   距离不超过阈值的两个哈希至少有一段完全相同（抽屉原理），因此只需在各段的桶中查找候选，
+   再用异或 + popcount 向量化验证，不必与所有图片两两比较
+
+每组只发送代表图片（组内第一张），结果再映射回组内其他图片。
+需要 numpy（pip install numpy）。
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Any, Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+HASH_BITS = 64
+
+# 默认汉明距离阈值：64 位哈希中不超过 6 位不同视为近似重复
+DEFAULT_THRESHOLD = 6
+
+# 每个工作进程一次处理的图片数
+CHUNK_SIZE = 64
+
+# 各哈希算法使用的灰度小图尺寸 (宽, 高)
+_HASH_SIZES = {"dhash": (9, 8), "phash": (32, 32)}
+
+_dct_cache: Dict[int, Any] = {}
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("近似重复去重需要 numpy，请先运行: pip install numpy")
+    return numpy
+
+
+def load_gray(path: Union[str, IO[bytes]], size: Tuple[int, int]):
+    """解码图片（路径或二进制文件对象）并缩放为 size 的灰度数组（float32，形状为 (高, 宽)）"""
+    from PIL import Image
+    np = _numpy()
+
+    with Image.open(path) as image:
+        # JPEG 可在解码时按 1/2、1/4、1/8 缩小，大图只需解码很少的像素
+        image.draft("L", (size[0] * 4, size[1] * 4))
+        if getattr(image, "is_animated", False):
+            image.seek(0)
+        gray = image.convert("L").resize(size, Image.BILINEAR)
+        return np.asarray(gray, dtype=np.float32)
+
+
+def _pack_bits(bits):
+    """把 (N, 64) 的布尔数组打包为 (N,) 的 uint64 哈希"""
+    np = _numpy()
+    return np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def _dct_matrix(n: int):
+    """n 点 DCT-II 变换矩阵（正交归一化）"""
+    np = _numpy()
+    matrix = _dct_cache.get(n)
+    if matrix is None:
+        k = np.arange(n)[:, None]
+        x = np.arange(n)[None, :]
+        matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+        matrix[0] /= np.sqrt(2.0)
+        matrix = matrix.astype(np.float32)
+        _dct_cache[n] = matrix
+    return matrix
+
+
+def dhash_arrays(pixels):
+    """批量计算 dHash：pixels 形状为 (N, 8, 9)，返回 (N,) 的 uint64"""
+    bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+    return _pack_bits(bits.reshape(len(pixels), -1))
+
+
+def phash_arrays(pixels):
+    """批量计算 pHash：pixels 形状为 (N, 32, 32)，返回 (N,) 的 uint64"""
+    np = _numpy()
+    dct = _dct_matrix(pixels.shape[1])
+    coefficients = dct @ pixels @ dct.T
+    low = coefficients[:, :8, :8].reshape(len(pixels), -1)
+    # 中位数不含直流分量，避免整体亮度影响哈希
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    return _pack_bits(low > median)
+
+
+_HASH_FUNCTIONS = {"dhash": dhash_arrays, "phash": phash_arrays}
+
+
+def dhash(source: Union[str, IO[bytes]]) -> int:
+    """单张图片的 64 位 dHash（路径或二进制文件对象），与 group_duplicates 使用的哈希完全相同"""
+    return int(dhash_arrays(load_gray(source, _HASH_SIZES["dhash"])[None])[0])
+
+
+def hash_images(paths: Sequence[str], method: str = "dhash") -> List[Optional[int]]:
+    """在当前进程中计算一批图片的感知哈希，无法解码的图片返回 None"""
+    np = _numpy()
+    if method not in _HASH_FUNCTIONS:
+        raise ValueError(f"未知的哈希算法: {method}（可选 dhash、phash）")
+
+    size = _HASH_SIZES[method]
+    arrays, positions = [], []
+    for position, path in enumerate(paths):
+        try:
+            arrays.append(load_gray(path, size))
+            positions.append(position)
+        except Exception:
+            continue
+
+    hashes: List[Optional[int]] = [None] * len(paths)
+    if arrays:
+        for position, value in zip(positions, _HASH_FUNCTIONS[method](np.stack(arrays))):
+            hashes[position] = int(value)
+    return hashes
+
+
+def image_hashes(paths: Sequence[str], method: str = "dhash", max_workers: Optional[int] = None,
+                 chunk_size: int = CHUNK_SIZE) -> List[Optional[int]]:
+    """计算所有图片的感知哈希；图片较多时按块分给进程池并行解码"""
+    paths = list(paths)
+    if len(paths) <= chunk_size:
+        return hash_images(paths, method)
+
+    chunks = [paths[start:start + chunk_size] for start in range(0, len(paths), chunk_size)]
+    hashes: List[Optional[int]] = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for chunk_hashes in executor.map(hash_images, chunks, [method] * len(chunks)):
+            hashes.extend(chunk_hashes)
+    return hashes
+
+
+def popcount(values):
+    """uint64 数组逐元素统计置位数"""
+    np = _numpy()
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class HashIndex:
+    """汉明距离近邻索引：查找与给定哈希距离不超过 threshold 的已有条目"""
+
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD, bits: int = HASH_BITS):
+        if not 0 <= threshold < bits:
+            raise ValueError(f"阈值必须在 0 到 {bits - 1} 之间")
+        self.threshold = threshold
+        # 分成 threshold + 1 段，每段记录 (右移位数, 掩码)
+        band_count = threshold + 1
+        self._bands = []
+        start = 0
+        for band in range(band_count):
+            width = bits // band_count + (1 if band < bits % band_count else 0)
+            self._bands.append((start, (1 << width) - 1))
+            start += width
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self._hashes: List[int] = []
+        self._ids: List[Hashable] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, value: int, item_id: Hashable):
+        """加入一个哈希"""
+        slot = len(self._ids)
+        self._hashes.append(value)
+        self._ids.append(item_id)
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault((value >> shift) & mask, []).append(slot)
+
+    def query(self, value: int) -> List[Tuple[Hashable, int]]:
+        """返回距离不超过阈值的 [(条目 ID, 距离)]，按距离从小到大排序"""
+        np = _numpy()
+        candidates = set()
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            candidates.update(buckets.get((value >> shift) & mask, ()))
+        if not candidates:
+            return []
+
+        slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        hashes = np.array([self._hashes[slot] for slot in slots], dtype=np.uint64)
+        distances = popcount(hashes ^ np.uint64(value))
+        matched = np.flatnonzero(distances <= self.threshold)
+        order = matched[np.argsort(distances[matched], kind="stable")]
+        return [(self._ids[slots[i]], int(distances[i])) for i in order]
+
+
+def group_duplicates(paths: Sequence[str], threshold: int = DEFAULT_THRESHOLD, method: str = "dhash",
+                     keys: Optional[Sequence[Hashable]] = None, max_workers: Optional[int] = None) -> List[int]:
+    """
+    把近似重复的图片分组，返回每张图片所属组的代表下标
+
+    representatives[i] == i 表示第 i 张图片是代表（需要发送请求），否则应复用
+    representatives[i] 的结果。每张图片只与已有的代表比较，组内所有图片与代表的距离都不超过阈值。
+    keys 不为 None 时，只有 key 相同的图片才会分到同一组（例如提示词或遮罩不同的图片不能复用结果）。
+    无法解码的图片单独成组。
+    """
+    hashes = image_hashes(paths, method, max_workers)
+    indexes: Dict[Hashable, HashIndex] = {}
+    representatives = list(range(len(hashes)))
+    for position, value in enumerate(hashes):
+        if value is None:
+            continue
+        key = keys[position] if keys is not None else None
+        index = indexes.get(key)
+        if index is None:
+            index = indexes[key] = HashIndex(threshold)
+        matches = index.query(value)
+        if matches:
+            representatives[position] = matches[0][0]
+        else:
+            index.add(value, position)
+    return representatives
@@ -0,0 +1,459 @@
+"""
+HTTP 客户端公共核心
+
+所有脚本共用同一个 ApiSession（requests.Session 的子类，接口与 requests 完全相同）：
+
+- 连接池 + keep-alive：同一主机的请求复用 TCP + TLS 连接，不再每个请求重新握手
+- 按接口设置默认超时：调用方没有传 timeout 时，按 URL 路径匹配 DEFAULT_TIMEOUTS，
+  不会再出现没有超时、一直卡住的请求
+- 自动重试：连接失败、408/429/5xx 时按指数退避 + 随机抖动重试，优先遵守服务端的 Retry-After；
+  非幂等请求（POST）只在请求确定没有被处理时重试（连接没建立、429、503），
+  调用方确认可以安全重试时传 idempotent=True
+- 可选 HTTP/2：设置环境变量 APIYI_HTTP2=1 或 get_session(http2=True)，
+  通过 httpx 发送请求（需要 pip install "httpx[http2]"），未安装时退回 HTTP/1.1
+- 跨进程限流：带 Authorization 的请求发送前先从 apiyi_utils.ratelimit 的令牌桶取令牌
+  （按 API Key 和模型），收到 429 时通知同一主机上共用该 Key 的所有进程一起暂停
+- 多入口路由：设置 APIYI_ROUTING=1 时，发往 API易 入口的请求由 apiyi_utils.routing 改写到
+  延迟最低、错误最少的入口，失败重试时换到其他入口
+- 可选追踪：设置 APIYI_TRACE 时，每个请求记录 http.request 及其各阶段（限流等待、序列化、建立连接、
+  上传、等待服务端、下载、重试等待）的 span，见 apiyi_utils.tracing（HTTP/2 模式下没有连接级的阶段）
+
+用法:
+    from apiyi_utils.http import get_session
+
+    session = get_session()
+    response = session.post(url, headers=headers, json=payload, idempotent=True)
+"""
+
+import email.utils
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Tuple, Union
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from apiyi_utils.tracing import enabled as tracing_enabled, span
+
+Timeout = Union[float, Tuple[float, float]]
+
+# 按 URL 路径匹配的默认超时：(连接超时, 读取超时) 秒，先匹配先生效
+DEFAULT_TIMEOUTS: List[Tuple[str, Timeout]] = [
+    (r"/chat/completions$", (10, 300)),
+    (r"/responses$", (10, 300)),
+    (r"/images/(generations|edits)$", (10, 300)),
+    (r"/videos$", (10, 60)),                     # 提交视频任务
+    (r"/videos/[^/]+/content$", (10, 300)),      # 下载视频
+    (r"/videos/[^/]+$", (10, 30)),               # 查询任务状态
+    (r"/files", (10, 120)),
+    (r"/models$", (5, 10)),
+]
+DEFAULT_TIMEOUT: Timeout = (10, 60)
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+# 服务端明确表示没有处理请求的状态码，非幂等请求也可以重试
+NOT_PROCESSED_STATUS = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# httpx 发送时每次读取请求体的块大小
+_CHUNK_SIZE = 64 * 1024
+
+
+class ConnectFailed(requests.exceptions.ConnectionError):
+    """连接没有建立（请求没有发出），任何请求都可以安全重试"""
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """解析 retry-after-ms / Retry-After（秒数或 HTTP 日期），没有时返回 None"""
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _not_sent(error: BaseException) -> bool:
+    """连接阶段失败（超时、拒绝连接、DNS 失败），请求体没有发出"""
+    if isinstance(error, (requests.exceptions.ConnectTimeout, ConnectFailed)):
+        return True
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)
+    return type(reason).__name__ in ("NewConnectionError", "NameResolutionError")
+
+
+def _payload(kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """取出请求参数（JSON、表单或 MultipartEncoder / JsonBody 的 fields），用于识别模型"""
+    for value in (kwargs.get("json"), kwargs.get("data"), kwargs.get("files")):
+        if isinstance(value, dict):
+            return value
+        if hasattr(value, "fields"):
+            return value.fields
+    return None
+
+
+def _rewind(kwargs: Dict[str, Any]) -> bool:
+    """重试前把请求体倒回开头，请求体不能重放（如生成器）时返回 False"""
+    data = kwargs.get("data")
+    if data is not None and not isinstance(data, (bytes, str, dict, list, tuple)):
+        if not hasattr(data, "seek"):
+            return False
+        data.seek(0)
+    for value in (kwargs.get("files") or {}).values():
+        handle = value[1] if isinstance(value, (tuple, list)) else value
+        if hasattr(handle, "seek"):
+            handle.seek(0)
+    return True
+
+
+class _TracedConnectionMixin:
+    """给 urllib3 连接的建立连接、上传、等待响应头三个阶段加上 span"""
+
+    def connect(self):
+        with span("http.connect", host=self.host, port=self.port):
+            super().connect()
+
+    def request(self, method, url, body=None, headers=None, **kwargs):
+        if self.sock is None:
+            # 明文 HTTP 的连接在发送时才建立，先建好连接，避免连接耗时算进上传
+            self.connect()
+        with span("http.upload"):
+            return super().request(method, url, body=body, headers=headers, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        with span("http.wait"):
+            return super().getresponse(*args, **kwargs)
+
+
+class _TracedHTTPConnection(_TracedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TracedHTTPSConnection(_TracedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TracedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TracedHTTPConnection
+
+
+class _TracedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TracedHTTPSConnection
+
+
+class _HTTPXRaw:
+    """把 httpx 流式响应包装成 requests.Response.raw 需要的文件接口"""
+
+    def __init__(self, response):
+        self._response = response
+        self._iterator: Optional[Iterator[bytes]] = None
+        self._buffer = b""
+
+    def stream(self, chunk_size: Optional[int] = None, decode_content: bool = True) -> Iterator[bytes]:
+        if self._buffer:
+            yield self._buffer
+            self._buffer = b""
+        yield from self._chunks(chunk_size)
+
+    def _chunks(self, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+        if self._iterator is None:
+            self._iterator = self._response.iter_bytes(chunk_size)
+        return self._iterator
+
+    def read(self, amt: Optional[int] = None, **kwargs) -> bytes:
+        chunks = self._chunks(_CHUNK_SIZE)
+        while amt is None or len(self._buffer) < amt:
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if amt is None:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self._response.close()
+
+    def release_conn(self):
+        self._response.close()
+
+
+class HTTPXAdapter(BaseAdapter):
+    """用 httpx.Client 发送请求的 requests 传输适配器，用于 HTTP/2"""
+
+    def __init__(self, pool_size: int = 10, http2: bool = True):
+        super().__init__()
+        import httpx
+
+        self._httpx = httpx
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.client = httpx.Client(http2=http2, limits=limits, follow_redirects=False)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        httpx = self._httpx
+        body = request.body
+        if hasattr(body, "read"):
+            reader = body
+            body = iter(lambda: reader.read(_CHUNK_SIZE), b"")
+        elif isinstance(body, str):
+            body = body.encode("utf-8")
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        # HTTP/2 不允许逐跳首部
+        headers = [(k, v) for k, v in request.headers.items()
+                   if k.lower() not in ("connection", "keep-alive", "transfer-encoding", "host")]
+        httpx_request = self.client.build_request(
+            request.method, request.url, headers=headers, content=body,
+            timeout=httpx.Timeout(connect=connect, read=read, write=read, pool=connect))
+        try:
+            httpx_response = self.client.send(httpx_request, stream=True)
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(e, request=request)
+        except httpx.ConnectError as e:
+            raise ConnectFailed(e, request=request)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+        response = requests.Response()
+        response.status_code = httpx_response.status_code
+        response.headers = CaseInsensitiveDict(httpx_response.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = httpx_response.reason_phrase
+        response.raw = _HTTPXRaw(httpx_response)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        if not stream:
+            try:
+                response.content
+            except httpx.TimeoutException as e:
+                raise requests.exceptions.ReadTimeout(e, request=request)
+        return response
+
+    def close(self):
+        self.client.close()
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        import httpx  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ApiSession(requests.Session):
+    """带连接池、按接口默认超时和自动重试的 Session"""
+
+    def __init__(self, pool_size: int = 10, retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, max_retry_after: float = 120.0,
+                 timeouts: Optional[List[Tuple[str, Timeout]]] = None, http2: bool = False,
+                 headers: Optional[Dict[str, str]] = None, rate_limit: bool = True, route: bool = True):
+        """
+        Args:
+            pool_size: 每个主机保持的最大连接数，通常与并发数一致
+            retries: 最大重试次数（不含第一次请求）
+            backoff_base / backoff_max: 指数退避的初始值和上限（秒），实际等待时间在 [0, 退避值] 内随机
+            max_retry_after: Retry-After 超过该值时不再等待，直接返回响应
+            timeouts: 额外的 (URL 路径正则, 超时) 规则，优先于 DEFAULT_TIMEOUTS
+            http2: 是否通过 httpx 使用 HTTP/2
+            headers: 所有请求共用的请求头（如 Authorization）
+            rate_limit: 是否使用跨进程限流（apiyi_utils.ratelimit.get_rate_limiter）
+            route: 是否使用多入口路由（apiyi_utils.routing.get_router，需要 APIYI_ROUTING=1）
+        """
+        super().__init__()
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.http2 = False
+        self.pool_size = 0
+        self.retry_count = 0
+        self._http2_warned = False
+        self.rate_limiter = None
+        if rate_limit:
+            from apiyi_utils.ratelimit import get_rate_limiter
+
+            self.rate_limiter = get_rate_limiter()
+        self.router = None
+        if route:
+            from apiyi_utils.routing import get_router
+
+            self.router = get_router()
+        self._timeouts: List[Tuple[Pattern, Timeout]] = [
+            (re.compile(pattern), value) for pattern, value in (timeouts or []) + DEFAULT_TIMEOUTS]
+        self.resize(pool_size, http2)
+        if headers:
+            self.headers.update(headers)
+
+    def resize(self, pool_size: int, http2: Optional[bool] = None):
+        """
+        重新挂载传输适配器（连接池变大或切换 HTTP/2 时；连接池只增不减）
+
+        共享 Session 上可能有其他线程的请求正在使用旧适配器，因此这里不关闭旧适配器：
+        新请求使用新挂载的适配器，旧适配器在最后一个引用它的响应释放后由垃圾回收关闭连接。
+        """
+        http2 = self.http2 if http2 is None else http2
+        if http2 and not http2_available():
+            if not self._http2_warned:
+                print('⚠️ 未安装 HTTP/2 依赖（pip install "httpx[http2]"），使用 HTTP/1.1')
+                self._http2_warned = True
+            http2 = False
+        if pool_size <= self.pool_size and http2 == self.http2:
+            return
+        pool_size = max(pool_size, self.pool_size)
+        adapter = HTTPXAdapter(pool_size) if http2 else HTTPAdapter(pool_connections=pool_size,
+                                                                    pool_maxsize=pool_size)
+        if not http2 and tracing_enabled():
+            adapter.poolmanager.pool_classes_by_scheme = {
+                "http": _TracedHTTPConnectionPool, "https": _TracedHTTPSConnectionPool}
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.pool_size, self.http2 = pool_size, http2
+
+    def timeout_for(self, url: str) -> Timeout:
+        path = requests.utils.urlparse(url).path
+        for pattern, value in self._timeouts:
+            if pattern.search(path):
+                return value
+        return DEFAULT_TIMEOUT
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def prepare_request(self, request):
+        with span("http.serialize"):
+            return super().prepare_request(request)
+
+    def send(self, request, **kwargs):
+        """开启追踪时把响应体的读取单独记为 http.download（调用方自己流式读取时不记录）"""
+        if kwargs.get("stream") or not tracing_enabled():
+            return super().send(request, **kwargs)
+        kwargs["stream"] = True
+        response = super().send(request, **kwargs)
+        with span("http.download") as current:
+            current.set_attribute("bytes", len(response.content))
+        return response
+
+    def request(self, method, url, *args, idempotent: Optional[bool] = None, **kwargs):
+        """
+        发送请求，失败时自动重试
+
+        Args:
+            idempotent: 请求是否可以安全重复发送，默认按 HTTP 方法判断（GET/PUT/DELETE 等为幂等）
+        """
+        with span("http.request", method=method.upper(), url=url.split("?", 1)[0]) as current:
+            response = self._request_with_retries(method, url, *args, idempotent=idempotent, **kwargs)
+            current.set_attribute("status", response.status_code)
+            return response
+
+    def _request_with_retries(self, method, url, *args, idempotent: Optional[bool] = None, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout_for(url)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        api_key = model = None
+        if self.rate_limiter is not None:
+            from apiyi_utils.ratelimit import request_identity
+
+            api_key, model = request_identity({**self.headers, **(kwargs.get("headers") or {})}, _payload(kwargs))
+
+        attempt = 0
+        failed_endpoint = None
+        while True:
+            if api_key is not None:
+                wait = self.rate_limiter.reserve(api_key, model)
+                if wait > 0:
+                    with span("ratelimit.wait", seconds=round(wait, 3)):
+                        time.sleep(wait)
+            target = self.router.route(url, avoid=failed_endpoint) if self.router is not None else url
+            started = time.perf_counter()
+            try:
+                response = super().request(method, target, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if self.router is not None:
+                    self.router.record(target, None, False)
+                    failed_endpoint = self.router.split(target)[0]
+                if attempt >= self.retries or not (idempotent or _not_sent(e)):
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if self.router is not None:
+                    ok = response.status_code < 500
+                    self.router.record(target, time.perf_counter() - started, ok)
+                    failed_endpoint = None if ok else self.router.split(target)[0]
+                if (response.status_code not in RETRY_STATUS or attempt >= self.retries
+                        or not (idempotent or response.status_code in NOT_PROCESSED_STATUS)):
+                    return response
+                delay = retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                elif delay > self.max_retry_after:
+                    return response
+                if response.status_code == 429 and api_key is not None:
+                    # 通知共用该 Key 的所有进程一起暂停，下一次 acquire 会等到暂停结束
+                    self.rate_limiter.penalize(api_key, model, delay)
+                    delay = 0
+                response.close()
+            if not _rewind(kwargs):
+                raise requests.exceptions.RetryError(f"{method} {url} 的请求体无法重放，不能重试")
+            with span("http.backoff", attempt=attempt + 1, seconds=round(delay, 3)):
+                time.sleep(delay)
+            attempt += 1
+            self.retry_count += 1
+
+
+_shared_session: Optional[ApiSession] = None
+_shared_lock = threading.Lock()
+
+
+def get_session(pool_size: int = 10, http2: Optional[bool] = None) -> ApiSession:
+    """
+    进程内共享的 ApiSession，所有脚本和公共模块都通过它发请求
+
+    Args:
+        pool_size: 需要的连接池大小，大于现有连接池时自动扩容
+        http2: 是否使用 HTTP/2，默认读取环境变量 APIYI_HTTP2
+    """
+    global _shared_session
+    if http2 is None:
+        http2 = os.getenv("APIYI_HTTP2", "").lower() in ("1", "true", "yes")
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = ApiSession(pool_size=pool_size, http2=http2)
+        else:
+            _shared_session.resize(pool_size, http2)
+        return _shared_session
+
+
+def pooled_session(pool_size: int = 10, headers: Optional[Dict[str, str]] = None) -> ApiSession:
+    """
+    创建独立的带连接池 Session（需要单独的请求头时使用，一般直接用 get_session）
+
+    Args:
+        pool_size: 每个主机保持的最大连接数，通常与并发数一致
+        headers: 所有请求共用的请求头（如 Authorization）
+    """
+    return ApiSession(pool_size=pool_size, headers=headers)
@@ -0,0 +1,133 @@
+"""
+视觉请求的图片预处理
+
+直接把原始文件 base64 编码发送有两个问题：一是 MIME 类型常常标错（PNG 被标成 image/jpeg），
+二是模型会把超大图片在服务端缩小后再使用，多传的像素只会增加上传体积和延迟。
+
+preprocess_image 按目标模型实际使用的最大分辨率缩放图片，并重新编码为紧凑格式：
+- 不透明图片编码为 JPEG，带透明通道的图片编码为 WebP
+- 无需缩放且重新编码不会变小时，保留原始文件，只修正 MIME 类型
+结果按 (文件内容 SHA256, 目标尺寸, 质量) 缓存在内存中，同一张图片多次提问只处理一次。
+"""
+
+import base64
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict, namedtuple
+from io import BytesIO
+from typing import Optional, Tuple
+
+# 各模型实际使用的最大分辨率：(长边上限, 短边上限)，按模型名前缀匹配
+MODEL_RESOLUTION_LIMITS = {
+    "gpt-4o": (2048, 768),    # high detail：先缩放到 2048x2048 以内，再使短边不超过 768
+    "gpt-4.1": (2048, 768),
+    "gpt-5": (2048, 768),
+    "o3": (2048, 768),
+    "o4": (2048, 768),
+    "gemini": (3072, 3072),   # 大图按 768x768 切块计费，超过 3072 的细节收益很小
+    "claude": (1568, 1568),
+}
+DEFAULT_RESOLUTION_LIMIT = (2048, 2048)
+
+# 浏览器/模型普遍支持、可直接发送原文件的格式
+_PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+# 内存缓存的最大条目数
+CACHE_SIZE = 64
+
+PreparedImage = namedtuple("PreparedImage", "mime_type base64 sha256 width height bytes original_bytes")
+
+_cache: "OrderedDict[tuple, PreparedImage]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def resolution_limit(model_id: str) -> Tuple[int, int]:
+    """返回模型的 (长边上限, 短边上限)"""
+    model = (model_id or "").lower()
+    for prefix, limit in MODEL_RESOLUTION_LIMITS.items():
+        if model.startswith(prefix):
+            return limit
+    return DEFAULT_RESOLUTION_LIMIT
+
+
+def target_size(width: int, height: int, limit: Tuple[int, int]) -> Tuple[int, int]:
+    """按 (长边上限, 短边上限) 等比缩小，不放大"""
+    max_long, max_short = limit
+    scale = min(1.0, max_long / max(width, height), max_short / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def guess_mime_type(path: str) -> str:
+    """根据扩展名推断 MIME 类型（未知时返回 image/png）"""
+    mime_type = mimetypes.guess_type(path)[0]
+    return mime_type if mime_type and mime_type.startswith("image/") else "image/png"
+
+
+def _encode(image, has_alpha: bool, quality: int) -> Tuple[bytes, str]:
+    buffer = BytesIO()
+    if has_alpha:
+        image.convert("RGBA").save(buffer, "WEBP", quality=quality, method=4)
+        return buffer.getvalue(), "image/webp"
+    image.convert("RGB").save(buffer, "JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), "image/jpeg"
+
+
+def prepare_bytes(data: bytes, model_id: str = "", quality: int = 85,
+                  limit: Optional[Tuple[int, int]] = None) -> PreparedImage:
+    """预处理图片字节，返回 PreparedImage（结果按内容哈希缓存）"""
+    from PIL import Image
+
+    limit = limit or resolution_limit(model_id)
+    digest = hashlib.sha256(data).hexdigest()
+    key = (digest, limit, quality)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    with Image.open(BytesIO(data)) as image:
+        image_format = image.format
+        width, height = image.size
+        new_size = target_size(width, height, limit)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+        if new_size == (width, height) and image_format == "JPEG":
+            # 已经是 JPEG 且无需缩放，重新编码只会损失画质
+            payload, mime_type = data, "image/jpeg"
+        else:
+            if getattr(image, "is_animated", False):
+                image.seek(0)
+            frame = image.resize(new_size, Image.LANCZOS) if new_size != (width, height) else image
+            payload, mime_type = _encode(frame, has_alpha, quality)
+            if new_size == (width, height) and len(payload) >= len(data) and image_format in _PASSTHROUGH_FORMATS:
+                payload, mime_type = data, _PASSTHROUGH_FORMATS[image_format]
+
+    prepared = PreparedImage(
+        mime_type=mime_type,
+        base64=base64.b64encode(payload).decode("ascii"),
+        sha256=digest,
+        width=new_size[0],
+        height=new_size[1],
+        bytes=len(payload),
+        original_bytes=len(data),
+    )
+    with _cache_lock:
+        _cache[key] = prepared
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return prepared
+
+
+def preprocess_image(image_path: str, model_id: str = "", quality: int = 85,
+                     limit: Optional[Tuple[int, int]] = None) -> PreparedImage:
+    """读取并预处理图片文件，返回 PreparedImage"""
+    with open(image_path, "rb") as f:
+        data = f.read()
+    return prepare_bytes(data, model_id, quality, limit)
+
+
+def data_url(prepared: PreparedImage) -> str:
+    """生成 data URL"""
+    return f"data:{prepared.mime_type};base64,{prepared.base64}"
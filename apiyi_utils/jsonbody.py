@@ -0,0 +1,113 @@
+"""
+流式 JSON 请求体：图片文件边读边做 base64 编码，直接写进请求体
+
+视觉理解、图像编辑等接口要求把图片以 base64（或 data URL）内嵌在 JSON 中。常规写法
+（读文件 → b64encode → decode 成 str → 拼 data URL → json.dumps → encode）会在内存中
+同时留下原始字节、base64 字节、base64 字符串、data URL 和序列化后的请求体等 4~5 份副本。
+
+JsonBody 先序列化不含图片的 JSON "外壳"，图片值的位置用 Base64File 占位；发送时按块从
+内存映射（mmap）的文件中读取，每次读取 3 的整数倍字节并编码，内存中只保留当前数据块。
+base64 长度可以直接由文件大小算出，因此请求体总长度（Content-Length）在发送前就已确定，
+重试时 seek(0) 即可重放。
+
+用法：
+    payload = {"model": "gemini-2.5-pro", "messages": [{"role": "user", "content": [
+        {"type": "image_url", "image_url": {"url": Base64File("photo.jpg", "data:image/jpeg;base64,")}},
+    ]}]}
+    with JsonBody(payload) as body:
+        response = requests.post(url, data=body, headers={"Content-Type": body.content_type})
+"""
+
+import base64
+import json
+import re
+import uuid
+from typing import Any, Iterator, Optional
+
+from apiyi_utils.multipart import CHUNK_SIZE, ProgressCallback, StreamingBody, _FileSegment
+
+
+def base64_length(size: int) -> int:
+    """size 字节的数据编码为 base64（含填充）后的长度"""
+    return (size + 2) // 3 * 4
+
+
+class Base64File:
+    """JSON 中的占位值：发送时替换为文件内容的 base64 字符串（可带 data URL 等前缀）"""
+
+    def __init__(self, path: str, prefix: str = ""):
+        self.path = path
+        self.prefix = prefix
+        self.size = _FileSegment(path).size  # 文件不存在时在这里就抛出异常
+
+    def __len__(self) -> int:
+        """替换后字符串的长度（前缀 + base64）"""
+        return len(self.prefix) + base64_length(self.size)
+
+    def __repr__(self) -> str:
+        return f"Base64File({self.path!r}, prefix={self.prefix!r})"
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """按块产出 base64 文本（不含前缀），可用于计算哈希而不生成完整字符串"""
+        segment = _Base64Segment(self.path)
+        try:
+            for offset in range(0, segment.size, chunk_size):
+                yield segment.read(offset, chunk_size)
+        finally:
+            segment.close()
+
+
+class _Base64Segment(_FileSegment):
+    """文件片段的 base64 视图：size 和 read() 的偏移都以编码后的字节计"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.raw_size = self.size
+        self.size = base64_length(self.raw_size)
+
+    def read(self, offset: int, size: int) -> bytes:
+        if self.raw_size == 0 or offset >= self.size:
+            return b""
+        # 每 4 个 base64 字符对应 3 个原始字节，按组对齐后编码再截取
+        first_group = offset // 4
+        last_group = (min(offset + size, self.size) + 3) // 4
+        encoded = base64.b64encode(self.mapped()[first_group * 3:last_group * 3])
+        start = offset - first_group * 4
+        return encoded[start:start + size]
+
+
+class JsonBody(StreamingBody):
+    """按需生成 JSON 请求体，payload 中的 Base64File 值在发送时才分块编码"""
+
+    content_type = "application/json"
+
+    def __init__(self, payload: Any, progress: Optional[ProgressCallback] = None, chunk_size: int = CHUNK_SIZE):
+        """
+        Args:
+            payload: 可 JSON 序列化的对象，任意位置的字符串值都可以替换为 Base64File
+            progress: 上传进度回调 progress(sent, total)
+        """
+        super().__init__(progress, chunk_size)
+        self.fields = payload if isinstance(payload, dict) else {}  # 限流等需要读取 model 字段
+
+        files = []
+        marker = f"apiyi-b64-{uuid.uuid4().hex}"
+
+        def placeholder(value):
+            if isinstance(value, Base64File):
+                files.append(value)
+                return f"{marker}:{len(files) - 1}"
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+        # 与 requests 的 json= 一致输出纯 ASCII：外壳只有几 KB，图片不经过这里，不需要 orjson 等快速后端
+        text = json.dumps(payload, default=placeholder)
+        parts = re.split(f"{marker}:(\\d+)", text)
+        # parts 为 [文本, 序号, 文本, 序号, ..., 文本]
+        for position, part in enumerate(parts):
+            if position % 2 == 0:
+                self._segments.append(part.encode("utf-8"))
+                continue
+            item = files[int(part)]
+            self._segments[-1] += json.dumps(item.prefix)[1:-1].encode("utf-8")
+            self._segments.append(_Base64Segment(item.path))
+        self._finish()
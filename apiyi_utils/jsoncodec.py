@@ -0,0 +1,287 @@
+"""
+可替换的 JSON 编解码层
+
+图像编辑 / 文生图接口返回的 b64_json、内嵌 base64 图片的 chat.completions 请求和响应动辄数 MB，
+标准库 json 解析这类数据很慢。本模块按可用性自动选择后端：
+
+- msgspec：decode() 直接把 JSON 解码为 dataclass，不生成中间字典
+- orjson：loads / dumps 最快（小消息）；decode() 先解析为字典再转换为 dataclass
+- json：标准库，始终可用
+
+loads / dumps 和带类型的 decode() 分开选择后端：decode() 优先 msgspec，loads / dumps 优先 orjson。
+依据（python benchmarks/json_codec.py，2 MB 图片，orjson 3.8.3 / msgspec 0.22.0，中位数）：
+
+    decode  images_b64     msgspec 2.6 ms   orjson 3.4 ms   json 3.7 ms
+    decode  images_b64_x4  msgspec 8.0 ms   orjson 14.4 ms  json 16.6 ms
+    decode  chat_image     msgspec 4.2 ms   orjson 6.4 ms   json 5.6 ms
+    loads   SSE 增量块     orjson 1.0 us    msgspec 1.2 us  json 7.2 us
+    dumps   小请求体       orjson 0.35 us   msgspec 0.42 us json 5.8 us
+
+loads / dumps 最频繁的调用是流式响应的每个增量块和普通请求体，都是小消息，orjson 快约 20%；
+MB 级响应的 loads 则是 msgspec 快 15%～35%，需要解析大响应并且知道结构时应使用 decode()。
+通过环境变量 APIYI_JSON 指定后端（auto / orjson / msgspec / json，默认 auto）时两类操作都使用该后端，
+指定的后端未安装时退回自动选择。后端在第一次编解码时才导入，不影响脚本的启动速度。
+各后端的 decode() 类型检查一致（与 msgspec 相同）：字段类型不符时抛出 ValueError，
+null 只能出现在 Optional 字段中，未声明的字段被忽略。
+
+用法:
+    from apiyi_utils.jsoncodec import ImagesResponse, decode, dumps, loads
+
+    data = loads(response.content)                     # 字典 / 列表，等价于 response.json()
+    images = decode(response.content, ImagesResponse)  # 直接得到带类型的响应结构
+    body = dumps(payload)                              # bytes（UTF-8，紧凑格式）
+
+解析失败时统一抛出 ValueError（与 json.JSONDecodeError 一致）。
+对比各后端在 MB 级响应上的速度和内存：
+    python benchmarks/json_codec.py
+"""
+
+import dataclasses
+import json
+import os
+import threading
+import typing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union
+
+T = TypeVar("T")
+
+# 自动选择的顺序：loads / dumps 使用 BACKENDS，decode() 使用 TYPED_BACKENDS
+BACKENDS = ("orjson", "msgspec", "json")
+TYPED_BACKENDS = ("msgspec", "orjson", "json")
+
+_NONE_TYPE = type(None)
+
+
+class _Codec:
+    """标准库后端；其他后端覆盖需要加速的方法"""
+
+    name = "json"
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        # ensure_ascii=True 走 C 加速路径，MB 级字符串比 ensure_ascii=False 快且少一份副本
+        return json.dumps(obj, separators=(",", ":"), default=default).encode("ascii")
+
+    def decode(self, data: Union[bytes, str], cls: Type[T]) -> T:
+        return convert(self.loads(data), cls)
+
+
+class _OrjsonCodec(_Codec):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self._orjson.loads(data)  # orjson.JSONDecodeError 是 ValueError 的子类
+
+    def dumps(self, obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        return self._orjson.dumps(obj, default=default)
+
+
+class _MsgspecCodec(_Codec):
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self._msgspec = msgspec
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+        self._typed: Dict[type, Any] = {}
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except self._msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+    def dumps(self, obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+        if default is None:
+            return self._encoder.encode(obj)
+        return self._msgspec.json.encode(obj, enc_hook=default)
+
+    def decode(self, data: Union[bytes, str], cls: Type[T]) -> T:
+        decoder = self._typed.get(cls)
+        if decoder is None:
+            decoder = self._typed[cls] = self._msgspec.json.Decoder(cls)
+        try:
+            return decoder.decode(data)
+        except self._msgspec.DecodeError as e:  # ValidationError 是 DecodeError 的子类
+            raise ValueError(str(e)) from e
+
+
+_FACTORIES = {"msgspec": _MsgspecCodec, "orjson": _OrjsonCodec, "json": _Codec}
+
+# (loads / dumps 使用的后端, decode() 使用的后端)
+_codecs: Optional[Tuple[_Codec, _Codec]] = None
+_codec_lock = threading.Lock()
+
+
+def load_codec(name: str) -> _Codec:
+    """创建指定后端，未安装时抛出 ImportError"""
+    if name not in _FACTORIES:
+        raise ValueError(f"未知的 JSON 后端: {name}（可选 {', '.join(BACKENDS)}）")
+    return _FACTORIES[name]()
+
+
+def available_backends() -> List[str]:
+    """已安装的后端（按自动选择的顺序）"""
+    names = []
+    for name in BACKENDS:
+        try:
+            load_codec(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def _select_codecs() -> Tuple[_Codec, _Codec]:
+    preferred = os.getenv("APIYI_JSON", "auto").lower()
+    if preferred in _FACTORIES:
+        try:
+            codec = load_codec(preferred)
+            return codec, codec
+        except ImportError:
+            print(f"⚠️ 未安装 {preferred}，JSON 编解码改为自动选择后端")
+
+    loaded: Dict[str, _Codec] = {}
+
+    def first(order: Tuple[str, ...]) -> _Codec:
+        for name in order:
+            if name not in loaded:
+                try:
+                    loaded[name] = load_codec(name)
+                except ImportError:
+                    continue
+            return loaded[name]
+        raise ImportError("没有可用的 JSON 后端")  # 不会发生：标准库始终可用
+
+    return first(BACKENDS), first(TYPED_BACKENDS)
+
+
+def get_codec(typed: bool = False) -> _Codec:
+    """按 APIYI_JSON 选择后端（首次调用时确定，之后复用）；typed=True 时返回 decode() 使用的后端"""
+    global _codecs
+    if _codecs is None:
+        with _codec_lock:
+            if _codecs is None:
+                _codecs = _select_codecs()
+    return _codecs[1] if typed else _codecs[0]
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """解析 JSON（bytes 无需先解码为 str）"""
+    return get_codec().loads(data)
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """序列化为紧凑的 UTF-8 JSON；default 处理无法直接序列化的对象（返回可序列化的值）"""
+    return get_codec().dumps(obj, default)
+
+
+def decode(data: Union[bytes, str], cls: Type[T]) -> T:
+    """把 JSON 解码为 dataclass 响应结构（忽略未声明的字段）"""
+    return get_codec(typed=True).decode(data, cls)
+
+
+# ---------------------------------------------------------------------------
+# 字典 → dataclass（orjson / 标准库后端使用）
+# ---------------------------------------------------------------------------
+
+_hints_cache: Dict[type, Dict[str, Any]] = {}
+
+# 标量类型允许的 JSON 值类型（与 msgspec 一致：int 不接受 true/false 和小数，float 接受整数）
+_SCALARS = {str: (str,), int: (int,), float: (int, float), bool: (bool,)}
+
+
+def _field_types(cls: type) -> Dict[str, Any]:
+    hints = _hints_cache.get(cls)
+    if hints is None:
+        resolved = typing.get_type_hints(cls)
+        hints = _hints_cache[cls] = {f.name: resolved[f.name] for f in dataclasses.fields(cls) if f.init}
+    return hints
+
+
+def _type_error(expected: str, value: Any, path: str) -> ValueError:
+    actual = "null" if value is None else type(value).__name__
+    return ValueError(f"类型不符：{path} 需要 {expected}，收到 {actual}")
+
+
+def convert(value: Any, tp: Any, path: str = "$") -> Any:
+    """
+    按类型注解把解析后的 JSON 值转换为 dataclass（支持 List、Optional 嵌套）
+
+    类型检查与 msgspec 相同，不符时抛出 ValueError（消息中带字段路径，如 $.choices[0].message.content）。
+    """
+    if tp is Any:
+        return value
+    if dataclasses.is_dataclass(tp):
+        if not isinstance(value, dict):
+            raise _type_error(f"{tp.__name__} 对象", value, path)
+        hints = _field_types(tp)
+        return tp(**{key: convert(item, hints[key], f"{path}.{key}") for key, item in value.items() if key in hints})
+    origin = typing.get_origin(tp)
+    if origin is list:
+        if not isinstance(value, list):
+            raise _type_error("数组", value, path)
+        (item_type,) = typing.get_args(tp) or (Any,)
+        return [convert(item, item_type, f"{path}[{index}]") for index, item in enumerate(value)]
+    if origin is Union:
+        args = [arg for arg in typing.get_args(tp) if arg is not _NONE_TYPE]
+        if value is None and len(args) < len(typing.get_args(tp)):
+            return None
+        if len(args) == 1:
+            return convert(value, args[0], path)
+        raise TypeError(f"不支持的类型注解: {tp}")
+    allowed = _SCALARS.get(tp)
+    if allowed is None:
+        raise TypeError(f"不支持的类型注解: {tp}")
+    if not isinstance(value, allowed) or (isinstance(value, bool) and tp is not bool):
+        raise _type_error(tp.__name__, value, path)
+    return float(value) if tp is float else value
+
+
+# ---------------------------------------------------------------------------
+# 常用响应结构（字段与 openai SDK 的同名类型一致，未声明的字段会被忽略）
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ImageData:
+    url: Optional[str] = None
+    b64_json: Optional[str] = None
+    revised_prompt: Optional[str] = None
+
+
+@dataclass
+class ImagesResponse:
+    """images/generations、images/edits 的响应"""
+    created: Optional[int] = None
+    data: List[ImageData] = field(default_factory=list)
+
+
+@dataclass
+class ChatMessage:
+    role: Optional[str] = "assistant"
+    content: Optional[str] = None
+
+
+@dataclass
+class ChatChoice:
+    index: int = 0
+    message: ChatMessage = field(default_factory=ChatMessage)
+    finish_reason: Optional[str] = None
+
+
+@dataclass
+class ChatCompletion:
+    """chat/completions（非流式）的响应"""
+    id: str = ""
+    model: str = ""
+    choices: List[ChatChoice] = field(default_factory=list)
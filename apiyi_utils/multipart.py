@@ -0,0 +1,197 @@
+"""
+流式 multipart/form-data 编码器
+
+requests 的 files= 参数和 openai SDK 在发送前会把整个文件读入内存拼成请求体。
+MultipartEncoder 预先计算好请求体总长度（用于 Content-Length），发送时按块从内存映射（mmap）
+的文件中读取，内存中只保留当前数据块；多个并发上传即使是同一个文件，也只共享操作系统的页缓存。
+
+用法（requests）：
+    encoder = MultipartEncoder(
+        fields={"model": "gpt-image-1", "prompt": "..."},
+        files={"image": ("image.png", "input.png", "image/png")},
+        progress=print_upload_progress,
+    )
+    with encoder:
+        response = requests.post(url, data=encoder, headers={"Content-Type": encoder.content_type})
+"""
+
+import mmap
+import os
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# 每次读取的块大小
+CHUNK_SIZE = 64 * 1024
+
+# 进度回调：progress(已发送字节数, 总字节数)
+ProgressCallback = Callable[[int, int], None]
+
+
+def _quote(value: str) -> str:
+    """转义 Content-Disposition 中的文件名/字段名"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r", "%0D").replace("\n", "%0A")
+
+
+class _FileSegment:
+    """请求体中的文件片段，首次读取时才打开并映射文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = None
+        self._map = None
+
+    def mapped(self) -> mmap.mmap:
+        if self._map is None:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def read(self, offset: int, size: int) -> bytes:
+        if self.size == 0:
+            return b""
+        return self.mapped()[offset:offset + size]
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class StreamingBody:
+    """
+    由若干片段（bytes 或文件片段）拼成的请求体，按需读取，支持 read()/迭代两种读取方式
+
+    子类在 __init__ 中填好 self._segments 后调用 _finish()。文件片段需要提供
+    size、read(offset, size) 和 close()。
+    """
+
+    content_type = "application/octet-stream"
+
+    def __init__(self, progress: Optional[ProgressCallback] = None, chunk_size: int = CHUNK_SIZE):
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self._segments: List[Union[bytes, _FileSegment]] = []
+        self._length = 0
+
+        # 读取位置：当前片段序号 + 片段内偏移
+        self._index = 0
+        self._offset = 0
+        self._sent = 0
+
+    def _finish(self):
+        self._length = sum(len(s) if isinstance(s, bytes) else s.size for s in self._segments)
+
+    @property
+    def bytes_sent(self) -> int:
+        return self._sent
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        """读取最多 size 字节（size < 0 时按 chunk_size 读取，避免一次性读入全部文件）"""
+        if size is None or size < 0:
+            size = self.chunk_size
+        output = bytearray()
+        while len(output) < size and self._index < len(self._segments):
+            segment = self._segments[self._index]
+            remaining = size - len(output)
+            if isinstance(segment, bytes):
+                data = segment[self._offset:self._offset + remaining]
+                segment_size = len(segment)
+            else:
+                data = segment.read(self._offset, remaining)
+                segment_size = segment.size
+            output += data
+            self._offset += len(data)
+            if self._offset >= segment_size:
+                if isinstance(segment, _FileSegment):
+                    segment.close()
+                self._index += 1
+                self._offset = 0
+
+        self._sent += len(output)
+        if output and self.progress:
+            self.progress(self._sent, self._length)
+        return bytes(output)
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def tell(self) -> int:
+        return self._sent
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        """只支持回到开头（requests 重定向或重试时会调用 seek(0)）"""
+        if whence == os.SEEK_END:
+            offset = self._length + offset
+        if offset != 0:
+            raise ValueError(f"{type(self).__name__} 只支持 seek(0)")
+        self._index = 0
+        self._offset = 0
+        self._sent = 0
+        return 0
+
+    def close(self):
+        for segment in self._segments:
+            if isinstance(segment, _FileSegment):
+                segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MultipartEncoder(StreamingBody):
+    """按需生成 multipart/form-data 请求体"""
+
+    def __init__(self, fields: Optional[Union[Dict[str, str], List[Tuple[str, str]]]] = None,
+                 files: Optional[Dict[str, Tuple[str, str, str]]] = None, boundary: Optional[str] = None,
+                 progress: Optional[ProgressCallback] = None, chunk_size: int = CHUNK_SIZE):
+        """
+        Args:
+            fields: 普通表单字段
+            files: 文件字段 {字段名: (文件名, 本地路径, Content-Type)}
+            boundary: 分隔符，默认随机生成
+            progress: 上传进度回调 progress(sent, total)
+        """
+        super().__init__(progress, chunk_size)
+        self.boundary = boundary or uuid.uuid4().hex
+
+        items = list(fields.items() if isinstance(fields, dict) else (fields or []))
+        self.fields = dict(items)  # 普通表单字段（限流等需要读取 model 字段）
+        for name, value in items:
+            header = (f"--{self.boundary}\r\n"
+                      f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n')
+            self._segments.append(header.encode("utf-8") + str(value).encode("utf-8") + b"\r\n")
+
+        for name, (filename, path, content_type) in (files or {}).items():
+            header = (f"--{self.boundary}\r\n"
+                      f'Content-Disposition: form-data; name="{_quote(name)}"; filename="{_quote(filename)}"\r\n'
+                      f"Content-Type: {content_type}\r\n\r\n")
+            self._segments.append(header.encode("utf-8"))
+            self._segments.append(_FileSegment(path))
+            self._segments.append(b"\r\n")
+
+        self._segments.append(f"--{self.boundary}--\r\n".encode("utf-8"))
+        self._finish()
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+
+def print_upload_progress(sent: int, total: int):
+    """默认的上传进度显示"""
+    percent = sent / total * 100 if total else 100
+    print(f"\r   上传进度: {percent:.1f}% ({sent}/{total} 字节)", end='' if sent < total else '\n')
@@ -0,0 +1,215 @@
+"""
+生成图片后处理 - 在进程池中完成缩略图、感知哈希和元数据提取
+
+图片保存到本地之后调用 submit_image(path)，后处理任务会被投递到后台进程池，
+请求线程立即返回，不会等待 Pillow 的 CPU 密集型计算。
+
+后处理默认关闭（会启动进程池并在图片旁边写入额外文件），需要时通过环境变量
+APIYI_POSTPROCESS=1 或脚本的 --postprocess 参数（调用 enable()）开启。
+
+每张图片只读取和解码一次，依次完成：
+- 文件大小、SHA256
+- 格式、模式、宽高
+- dHash 感知哈希（64 位，十六进制；与 apiyi_utils.dedup 的去重哈希相同，需要 numpy）
+- 若干尺寸的缩略图
+并在原图旁边写入同名 sidecar 元数据文件：{图片路径}.json
+
+环境变量：
+- APIYI_POSTPROCESS=1        开启后处理（默认关闭）
+- APIYI_POSTPROCESS_WORKERS  进程池大小（默认为 CPU 核数）
+
+注意：进程池在部分平台上使用 spawn 方式启动子进程，会重新导入主脚本，
+因此调用方脚本的执行代码必须放在 if __name__ == "__main__": 之下；
+调用方应在 finally 中调用 shutdown()，出错退出时也要等待已提交的任务并关闭进程池。
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Sequence
+
+# 默认缩略图尺寸（长边像素）
+THUMBNAIL_SIZES = (256, 64)
+
+
+def sidecar_path(image_path: str) -> str:
+    """返回图片对应的 sidecar 元数据文件路径"""
+    return f"{image_path}.json"
+
+
+def _dhash(raw: bytes) -> Optional[str]:
+    """计算 64 位 dHash，返回 16 位十六进制字符串；未安装 numpy 时返回 None"""
+    from apiyi_utils.dedup import dhash
+
+    try:
+        # JPEG 按缩小后的尺寸解码，只需很少的像素，不必复用已完整解码的图片
+        return f"{dhash(BytesIO(raw)):016x}"
+    except ImportError:
+        return None
+
+
+def _save_thumbnails(image, image_path: str, sizes: Sequence[int], thumbnail_dir: Optional[str]) -> List[Dict[str, Any]]:
+    """从已解码的图片生成缩略图，返回缩略图信息列表"""
+    base_dir = thumbnail_dir or os.path.dirname(os.path.abspath(image_path))
+    os.makedirs(base_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+
+    # 带透明通道的图片保存为 PNG，其余保存为 JPEG
+    has_alpha = image.mode in ("RGBA", "LA", "P")
+    ext = "png" if has_alpha else "jpg"
+
+    thumbnails = []
+    for size in sizes:
+        thumb = image.copy()
+        thumb.thumbnail((size, size))
+        thumb_path = os.path.join(base_dir, f"{stem}_thumb{size}.{ext}")
+        if has_alpha:
+            thumb.save(thumb_path, "PNG", optimize=True)
+        else:
+            thumb.convert("RGB").save(thumb_path, "JPEG", quality=85)
+        thumbnails.append({"size": size, "path": thumb_path, "width": thumb.width, "height": thumb.height})
+    return thumbnails
+
+
+def process_image(image_path: str, thumbnail_sizes: Sequence[int] = THUMBNAIL_SIZES,
+                  thumbnail_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    处理单张图片并写入 sidecar 元数据（在工作进程中执行）
+
+    Returns:
+        元数据字典，同时写入 {image_path}.json
+    """
+    from PIL import Image
+
+    start = time.time()
+    with open(image_path, "rb") as f:
+        raw = f.read()
+
+    # 只解码一次，后续所有计算复用同一个 Image 对象
+    with Image.open(BytesIO(raw)) as image:
+        image_format = image.format
+        image.load()
+
+        metadata = {
+            "file": os.path.abspath(image_path),
+            "bytes": len(raw),
+            "sha256": hashlib.sha256(raw).hexdigest(),
+            "format": image_format,
+            "mode": image.mode,
+            "width": image.width,
+            "height": image.height,
+            "dhash": _dhash(raw),
+            "thumbnails": _save_thumbnails(image, image_path, thumbnail_sizes, thumbnail_dir),
+        }
+
+    metadata["processed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    metadata["process_seconds"] = round(time.time() - start, 4)
+
+    with open(sidecar_path(image_path), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    return metadata
+
+
+class ImagePostProcessor:
+    """图片后处理进程池，首次提交任务时才启动子进程"""
+
+    def __init__(self, max_workers: Optional[int] = None, thumbnail_sizes: Sequence[int] = THUMBNAIL_SIZES,
+                 thumbnail_dir: Optional[str] = None, verbose: bool = True):
+        self.max_workers = max_workers
+        self.thumbnail_sizes = tuple(thumbnail_sizes)
+        self.thumbnail_dir = thumbnail_dir
+        self.verbose = verbose
+        self._executor = None
+        self._pending = set()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def submit(self, image_path: str) -> Future:
+        """提交一张已保存的图片，立即返回 Future"""
+        future = self._get_executor().submit(
+            process_image, image_path, self.thumbnail_sizes, self.thumbnail_dir
+        )
+        self._pending.add(future)
+        future.add_done_callback(lambda f: self._on_done(image_path, f))
+        return future
+
+    def _on_done(self, image_path: str, future: Future):
+        self._pending.discard(future)
+        if not self.verbose or future.cancelled():
+            return
+        error = future.exception()
+        if error:
+            print(f"⚠️ 图片后处理失败 {image_path}: {error}")
+        else:
+            print(f"🧩 图片后处理完成: {sidecar_path(image_path)}")
+
+    @property
+    def pending(self) -> int:
+        """尚未完成的后处理任务数"""
+        return len(self._pending)
+
+    def shutdown(self, wait: bool = True):
+        """关闭进程池，wait=True 时等待所有后处理任务完成"""
+        if self._executor is None:
+            return
+        if wait and self._pending and self.verbose:
+            print(f"⏳ 等待 {len(self._pending)} 个图片后处理任务完成...")
+        self._executor.shutdown(wait=wait)
+        self._executor = None
+
+
+_default_processor: Optional[ImagePostProcessor] = None
+
+# enable() 设置的开关，None 表示按环境变量决定
+_enabled: Optional[bool] = None
+
+
+def enable(enabled: bool = True):
+    """开启（或关闭）后处理，优先于 APIYI_POSTPROCESS 环境变量"""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    """是否启用后处理（默认关闭；enable() 或 APIYI_POSTPROCESS=1 时开启）"""
+    if _enabled is not None:
+        return _enabled
+    return os.getenv("APIYI_POSTPROCESS", "0").lower() in ("1", "true", "yes", "on")
+
+
+def get_processor() -> ImagePostProcessor:
+    """获取全局默认的后处理器"""
+    global _default_processor
+    if _default_processor is None:
+        workers = os.getenv("APIYI_POSTPROCESS_WORKERS")
+        _default_processor = ImagePostProcessor(max_workers=int(workers) if workers else None)
+        atexit.register(shutdown)
+    return _default_processor
+
+
+def submit_image(image_path: str) -> Optional[Future]:
+    """
+    保存路径上的钩子：图片写入磁盘后调用，把后处理任务交给后台进程池
+
+    后处理关闭或提交失败时返回 None，不影响主流程。
+    """
+    if not image_path or not is_enabled():
+        return None
+    try:
+        return get_processor().submit(image_path)
+    except Exception as e:
+        print(f"⚠️ 无法提交图片后处理任务: {e}")
+        return None
+
+
+def shutdown(wait: bool = True):
+    """等待后台后处理任务完成并关闭进程池（脚本结束前调用）"""
+    if _default_processor is not None:
+        _default_processor.shutdown(wait=wait)
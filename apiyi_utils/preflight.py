@@ -0,0 +1,253 @@
+"""
+gpt-image-1 图像编辑的本地预检
+
+编辑接口要求图像和遮罩为尺寸一致的 RGBA PNG，且遮罩带透明通道；
+不符合要求的输入要等完整上传并经过长达数分钟的服务端处理后才会被拒绝。
+
+预检分两步：
+1. 只读取文件头（PNG 直接解析 IHDR 等数据块头，其他格式使用 Pillow 的惰性打开）
+   检查格式、尺寸、模式和文件大小，每张图片只需毫秒级
+2. 需要修正的图片在进程池中批量转换：图像转为 RGBA PNG，遮罩缩放到图像尺寸并转为
+   RGBA PNG；遮罩没有透明通道时按亮度生成（白色 = 编辑区域 = 透明）
+
+无法修正的输入（文件不存在、无法解码）直接报错，不再发送请求。
+"""
+
+import hashlib
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# gpt-image-1 单张图片大小上限
+MAX_FILE_BYTES = 50 * 1024 * 1024
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# PNG 颜色类型 -> Pillow 模式
+_PNG_COLOR_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+
+
+class PreflightError(Exception):
+    """输入无法通过预检且无法自动修正"""
+
+
+def _read_exact(f, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) < size:
+        raise PreflightError("文件头不完整")
+    return data
+
+
+def _read_png_header(f) -> Dict[str, Any]:
+    """解析 PNG 的 IHDR，并只读取数据块头直到 IDAT，判断是否有 tRNS 透明信息（文件被截断时抛出 PreflightError）"""
+    f.seek(len(PNG_SIGNATURE))
+    length, chunk_type = struct.unpack(">I4s", _read_exact(f, 8))
+    if chunk_type != b"IHDR" or length < 10:
+        raise PreflightError("PNG 文件缺少 IHDR")
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", _read_exact(f, 10))
+    f.seek(length - 10 + 4, os.SEEK_CUR)  # 跳过 IHDR 剩余字段和 CRC
+
+    has_trns = False
+    while True:
+        # 在 IDAT 之前到达文件末尾同样说明文件被截断
+        length, chunk_type = struct.unpack(">I4s", _read_exact(f, 8))
+        if chunk_type in (b"IDAT", b"IEND"):
+            break
+        if chunk_type == b"tRNS":
+            has_trns = True
+        f.seek(length + 4, os.SEEK_CUR)
+
+    mode = _PNG_COLOR_MODES.get(color_type, "unknown")
+    return {
+        "format": "PNG",
+        "width": width,
+        "height": height,
+        "mode": mode,
+        "bit_depth": bit_depth,
+        "has_alpha": mode in ("RGBA", "LA") or has_trns,
+    }
+
+
+def read_image_header(path: str) -> Dict[str, Any]:
+    """只读取文件头获取图片信息：format, width, height, mode, has_alpha, bytes"""
+    if not os.path.exists(path):
+        raise PreflightError(f"文件不存在: {path}")
+
+    with open(path, "rb") as f:
+        if f.read(len(PNG_SIGNATURE)) == PNG_SIGNATURE:
+            try:
+                info = _read_png_header(f)
+            except PreflightError as e:
+                raise PreflightError(f"{e}: {path}")
+            except OSError as e:
+                raise PreflightError(f"无法读取 {path}: {e}")
+        else:
+            # 非 PNG：Pillow 的 open 是惰性的，只解析文件头，不解码像素
+            from PIL import Image
+            f.seek(0)
+            try:
+                with Image.open(f) as image:
+                    info = {
+                        "format": image.format,
+                        "width": image.width,
+                        "height": image.height,
+                        "mode": image.mode,
+                        "has_alpha": image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info,
+                    }
+            except Exception as e:
+                raise PreflightError(f"无法识别的图片文件 {path}: {e}")
+
+    info["bytes"] = os.path.getsize(path)
+    return info
+
+
+def check_pair(image_path: str, mask_path: Optional[str] = None,
+               max_bytes: int = MAX_FILE_BYTES) -> Dict[str, Any]:
+    """
+    检查图像/遮罩对，返回 {"image": 头信息, "mask": 头信息, "problems": [问题描述]}
+
+    problems 为空表示可以直接上传。
+    """
+    image = read_image_header(image_path)
+    problems = []
+    if image["format"] != "PNG" or image["mode"] != "RGBA":
+        problems.append(f"图像不是 RGBA PNG（{image['format']} {image['mode']}）")
+    if image["bytes"] > max_bytes:
+        problems.append(f"图像文件过大（{image['bytes']} 字节）")
+
+    mask = None
+    if mask_path:
+        mask = read_image_header(mask_path)
+        if (mask["width"], mask["height"]) != (image["width"], image["height"]):
+            problems.append(f"遮罩尺寸 {mask['width']}x{mask['height']} 与图像 {image['width']}x{image['height']} 不一致")
+        if mask["format"] != "PNG" or mask["mode"] != "RGBA":
+            problems.append(f"遮罩不是 RGBA PNG（{mask['format']} {mask['mode']}）")
+        if mask["bytes"] > max_bytes:
+            problems.append(f"遮罩文件过大（{mask['bytes']} 字节）")
+
+    return {"image": image, "mask": mask, "problems": problems}
+
+
+def _output_name(path: str, suffix: str) -> str:
+    """转换结果的文件名：原文件名 + 路径哈希，避免不同目录下的同名文件互相覆盖"""
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_{digest}_{suffix}.png"
+
+
+def _save_png_within_limit(image, path: str, max_bytes: int):
+    """保存为 PNG，超过大小上限时按比例缩小后重试"""
+    from PIL import Image
+
+    image.save(path, "PNG", optimize=True)
+    while os.path.getsize(path) > max_bytes:
+        scale = (max_bytes / os.path.getsize(path)) ** 0.5 * 0.95
+        image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+        image.save(path, "PNG", optimize=True)
+    return image.size
+
+
+def convert_pair(image_path: str, mask_path: Optional[str], output_dir: str,
+                 max_bytes: int = MAX_FILE_BYTES) -> Dict[str, Optional[str]]:
+    """
+    把图像/遮罩转换为尺寸一致的 RGBA PNG（在工作进程中执行）
+
+    Returns:
+        {"image": 转换后的图像路径, "mask": 转换后的遮罩路径}
+    """
+    from PIL import Image
+
+    os.makedirs(output_dir, exist_ok=True)
+    result = {"image": image_path, "mask": mask_path}
+
+    info = check_pair(image_path, None, max_bytes)
+    if info["problems"]:
+        with Image.open(image_path) as source:
+            image = source.convert("RGBA")
+        result["image"] = os.path.join(output_dir, _output_name(image_path, "rgba"))
+        size = _save_png_within_limit(image, result["image"], max_bytes)
+    else:
+        size = (info["image"]["width"], info["image"]["height"])
+
+    if mask_path:
+        with Image.open(mask_path) as source:
+            has_alpha = source.mode in ("RGBA", "LA", "PA") or "transparency" in source.info
+            if has_alpha:
+                mask = source.convert("RGBA")
+            else:
+                # 没有透明通道：白色（编辑区域）转为透明，黑色（保留区域）转为不透明
+                luminance = source.convert("L")
+                mask = Image.new("RGBA", source.size, (0, 0, 0, 255))
+                mask.putalpha(luminance.point(lambda value: 255 - value))
+        if mask.size != size:
+            mask = mask.resize(size, Image.NEAREST)
+        result["mask"] = os.path.join(output_dir, _output_name(mask_path, "mask"))
+        mask.save(result["mask"], "PNG", optimize=True)
+
+    return result
+
+
+def preflight_pair(image_path: str, mask_path: Optional[str], output_dir: str,
+                   max_bytes: int = MAX_FILE_BYTES, verbose: bool = True) -> Dict[str, Optional[str]]:
+    """预检单个图像/遮罩对，需要时在当前进程中转换，返回可直接上传的路径"""
+    info = check_pair(image_path, mask_path, max_bytes)
+    if not info["problems"]:
+        return {"image": image_path, "mask": mask_path}
+    if verbose:
+        for problem in info["problems"]:
+            print(f"🔧 预检: {problem}，正在本地转换...")
+    try:
+        return convert_pair(image_path, mask_path, output_dir, max_bytes)
+    except Exception as e:
+        raise PreflightError(f"无法转换 {image_path}: {e}")
+
+
+def preflight_pairs(pairs: Iterable[Dict[str, Any]], output_dir: str, max_workers: Optional[int] = None,
+                    batch_size: int = 32, max_bytes: int = MAX_FILE_BYTES) -> Iterator[Dict[str, Any]]:
+    """
+    批量预检，按输入顺序产出可上传的图像/遮罩对
+
+    每 batch_size 个任务为一批：在当前进程中读取文件头检查，需要转换的交给进程池并行处理。
+    无法通过预检的任务会带上 "error" 字段，调用方应跳过上传。
+    """
+    executor = None
+    try:
+        batch: List[Dict[str, Any]] = []
+        for pair in pairs:
+            batch.append(pair)
+            if len(batch) >= batch_size:
+                executor = executor or ProcessPoolExecutor(max_workers=max_workers)
+                yield from _preflight_batch(batch, output_dir, executor, max_bytes)
+                batch = []
+        if batch:
+            executor = executor or ProcessPoolExecutor(max_workers=max_workers)
+            yield from _preflight_batch(batch, output_dir, executor, max_bytes)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _preflight_batch(batch: List[Dict[str, Any]], output_dir: str, executor: ProcessPoolExecutor,
+                     max_bytes: int) -> Iterator[Dict[str, Any]]:
+    futures = {}
+    for index, pair in enumerate(batch):
+        try:
+            info = check_pair(pair["image"], pair.get("mask"), max_bytes)
+        except (PreflightError, OSError, struct.error) as e:
+            # 单个任务的文件问题只标记该任务失败，不影响同一批中的其他任务
+            pair["error"] = str(e)
+            continue
+        if info["problems"]:
+            pair["preflight"] = info["problems"]
+            futures[index] = executor.submit(convert_pair, pair["image"], pair.get("mask"), output_dir, max_bytes)
+
+    for index, pair in enumerate(batch):
+        future = futures.get(index)
+        if future is not None:
+            try:
+                converted = future.result()
+                pair["image"], pair["mask"] = converted["image"], converted["mask"]
+            except Exception as e:
+                pair["error"] = f"预检转换失败: {e}"
+        yield pair
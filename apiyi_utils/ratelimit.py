@@ -0,0 +1,229 @@
+"""
+跨进程令牌桶限流
+
+同一台机器上同时运行多个脚本（flux、vision、gpt-4o-image、Sora ……）并共用一个 API Key 时，
+各自按最快速度请求，很快一起收到 429，又在差不多的时间一起重试。本模块把限流状态放在
+本地文件中（每个桶一个小文件，用文件锁保护读写），同一主机上的所有进程、所有线程共享：
+
+- 按 API Key 限流：APIYI_RATE_LIMIT="300/min" 限制同一个 Key 的总请求速率
+- 按模型限流：APIYI_MODEL_RATE_LIMITS="gpt-image-1=20/min,sora-2=5/min,*=60/min"，
+  同一个 Key 下每个模型单独一个桶，"*" 为未列出模型的默认速率
+- 预约而不是抢占：取令牌时直接扣减（可以扣成负数），按欠下的令牌数计算需要等待的时间，
+  各进程按先来后到依次放行，不会在令牌恢复的瞬间一起涌上去
+- 429 联动：任何进程收到 429 时调用 penalize()，所有进程在 Retry-After 期间一起暂停，
+  暂停结束后带随机抖动陆续恢复；即使没有配置速率也会生效
+
+速率格式为 "次数/单位"（单位 s、min、h，省略时为每分钟），例如 "2/s"、"120/min"。
+状态文件位于 ~/.cache/apiyi/ratelimit/（可通过 APIYI_CACHE_DIR 修改），文件名使用 Key 的哈希，不保存 Key 本身。
+
+用法:
+    from apiyi_utils.ratelimit import get_rate_limiter
+
+    get_rate_limiter().acquire(api_key, model)   # 阻塞到可以发送为止
+    ...
+    if response.status_code == 429:
+        get_rate_limiter().penalize(api_key, model, retry_after_seconds)
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import re
+import struct
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from apiyi_utils.result_cache import default_cache_path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 桶状态：(当前令牌数, 上次更新时间, 暂停截止时间)
+_STATE = struct.Struct("<ddd")
+
+_UNITS = {"s": 1.0, "sec": 1.0, "m": 60.0, "min": 60.0, "h": 3600.0, "hour": 3600.0}
+
+
+def parse_rate(spec: str) -> float:
+    """把 "120/min"、"2/s"、"1000/h"、"60" 这样的速率转换为每秒请求数"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*(?:/\s*([a-z]+))?\s*", spec.lower())
+    if not match or (match.group(2) or "min") not in _UNITS:
+        raise ValueError(f"无法解析速率: {spec!r}（示例: 120/min、2/s）")
+    return float(match.group(1)) / _UNITS[match.group(2) or "min"]
+
+
+def parse_model_rates(spec: str) -> Dict[str, float]:
+    """解析 "gpt-image-1=20/min,sora-2=5/min,*=60/min"，返回 {模型: 每秒请求数}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, rate = item.partition("=")
+        rates[model.strip()] = parse_rate(rate)
+    return rates
+
+
+class _Bucket:
+    """一个令牌桶的状态文件，文件锁保证跨进程互斥，线程锁保证同一进程内互斥"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _lock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, _STATE.size)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, _STATE.size)
+
+    def update(self, func) -> float:
+        """在锁内读出状态，调用 func(tokens, updated_at, blocked_until, now) 得到新状态和返回值并写回"""
+        with self._lock:
+            self._lock_file()
+            try:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                data = os.read(self._fd, _STATE.size)
+                now = time.time()
+                state = _STATE.unpack(data) if len(data) == _STATE.size else (None, now, 0.0)
+                new_state, result = func(*state, now)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, _STATE.pack(*new_state))
+                return result
+            finally:
+                self._unlock_file()
+
+    def close(self):
+        os.close(self._fd)
+
+
+class RateLimiter:
+    """按 (API Key) 和 (API Key, 模型) 两级令牌桶限流，状态跨进程共享"""
+
+    def __init__(self, key_rate: Optional[float] = None, model_rates: Optional[Dict[str, float]] = None,
+                 directory: Optional[str] = None, burst_seconds: float = 1.0):
+        """
+        Args:
+            key_rate: 每个 API Key 的总速率（次/秒），None 表示不限
+            model_rates: 每个模型的速率（次/秒），"*" 为默认值；未列出且没有 "*" 的模型不限
+            directory: 状态文件目录，默认 ~/.cache/apiyi/ratelimit
+            burst_seconds: 桶容量 = 速率 × burst_seconds（至少 1 个令牌），允许的瞬时突发量
+        """
+        self.key_rate = key_rate
+        self.model_rates = model_rates or {}
+        self.directory = directory or default_cache_path("ratelimit")
+        self.burst_seconds = burst_seconds
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _bucket(self, api_key: str, model: Optional[str]) -> _Bucket:
+        digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        name = digest if model is None else f"{digest}-{re.sub(r'[^A-Za-z0-9._-]', '_', model)}"
+        with self._lock:
+            bucket = self._buckets.get(name)
+            if bucket is None:
+                bucket = self._buckets[name] = _Bucket(os.path.join(self.directory, name + ".bucket"))
+            return bucket
+
+    def _rate(self, model: Optional[str]) -> Optional[float]:
+        if model is None:
+            return self.key_rate
+        return self.model_rates.get(model, self.model_rates.get("*"))
+
+    def _reserve_one(self, bucket: _Bucket, rate: Optional[float], tokens: float) -> float:
+        capacity = max(1.0, (rate or 0) * self.burst_seconds)
+
+        def take(current, updated_at, blocked_until, now):
+            wait = 0.0
+            if rate:
+                current = capacity if current is None else min(capacity, current + (now - updated_at) * rate)
+                current -= tokens
+                if current < 0:
+                    wait = -current / rate
+            if blocked_until > now:
+                # 暂停期间到来的请求在暂停结束后错开放行
+                wait = max(wait, blocked_until - now + random.uniform(0, min(1.0, (blocked_until - now) * 0.2)))
+            return (current if current is not None else 0.0, now, blocked_until), wait
+
+        return bucket.update(take)
+
+    def reserve(self, api_key: str, model: Optional[str] = None, tokens: float = 1) -> float:
+        """预约令牌，返回需要等待的秒数（令牌已经扣除，调用方等待后直接发送）"""
+        wait = self._reserve_one(self._bucket(api_key, None), self.key_rate, tokens)
+        if model is not None:
+            wait = max(wait, self._reserve_one(self._bucket(api_key, model), self._rate(model), tokens))
+        return wait
+
+    def acquire(self, api_key: str, model: Optional[str] = None, tokens: float = 1) -> float:
+        """阻塞直到可以发送请求，返回实际等待的秒数"""
+        wait = self.reserve(api_key, model, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, api_key: str, model: Optional[str] = None, tokens: float = 1) -> float:
+        """acquire 的异步版本：预约只持有文件锁很短的时间，等待期间不阻塞事件循环"""
+        wait = self.reserve(api_key, model, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def penalize(self, api_key: str, model: Optional[str] = None, delay: float = 1.0):
+        """收到 429 时调用：共用该 Key（或该模型）的所有进程暂停 delay 秒"""
+        bucket = self._bucket(api_key, model)
+
+        def block(current, updated_at, blocked_until, now):
+            return (current if current is not None else 0.0, updated_at, max(blocked_until, now + delay)), None
+
+        bucket.update(block)
+
+    def close(self):
+        with self._lock:
+            for bucket in self._buckets.values():
+                bucket.close()
+            self._buckets.clear()
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """进程内共享的限流器，速率读取环境变量 APIYI_RATE_LIMIT 和 APIYI_MODEL_RATE_LIMITS"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            key_rate = os.getenv("APIYI_RATE_LIMIT")
+            _shared_limiter = RateLimiter(
+                key_rate=parse_rate(key_rate) if key_rate else None,
+                model_rates=parse_model_rates(os.getenv("APIYI_MODEL_RATE_LIMITS", "")),
+            )
+        return _shared_limiter
+
+
+def request_identity(headers: Optional[dict], payload: Optional[dict]) -> Tuple[Optional[str], Optional[str]]:
+    """从请求头和请求参数中取出 (API Key, 模型)；没有 Authorization 时返回 (None, None)"""
+    authorization = None
+    for name, value in (headers or {}).items():
+        if name.lower() == "authorization":
+            authorization = value
+            break
+    if not authorization:
+        return None, None
+    api_key = authorization[7:] if authorization.lower().startswith("bearer ") else authorization
+    model = (payload or {}).get("model")
+    if isinstance(model, (tuple, list)):  # files={"model": (None, "sora-2")}
+        model = model[-1]
+    return api_key, model if isinstance(model, str) else None
@@ -0,0 +1,152 @@
+"""
+持久化结果缓存（SQLite）
+
+对同一张图片、同一个提示词、同一个模型重复调用时直接返回上次的结果，不再发起网络请求。
+缓存键为 (model_id, prompt, 图片内容哈希) 的 SHA256，数据保存在本地 SQLite 文件中，
+多个进程可以同时读写同一个缓存文件。
+
+支持两种淘汰策略：
+- TTL：超过有效期的条目在读取时视为未命中，并在清理时删除
+- 容量：条目数或总字节数超过上限时，按最近访问时间淘汰最久未用的条目
+
+默认缓存文件位于 ~/.cache/apiyi/results.sqlite3，可通过 APIYI_CACHE_DIR 环境变量修改目录。
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# 每写入多少条执行一次清理
+_EVICT_INTERVAL = 100
+
+
+def default_cache_path(name: str = "results.sqlite3") -> str:
+    """默认缓存文件路径"""
+    cache_dir = os.getenv("APIYI_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "apiyi")
+    return os.path.join(cache_dir, name)
+
+
+def make_key(model_id: str, prompt: str, image_hash: str) -> str:
+    """根据 (模型, 提示词, 图片内容哈希) 生成缓存键"""
+    raw = "\x1f".join([model_id or "", prompt or "", image_hash or ""])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """基于 SQLite 的键值缓存，线程安全，可跨进程共享"""
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            path: 缓存文件路径，默认 default_cache_path()
+            ttl: 有效期（秒），None 表示永不过期
+            max_entries: 最大条目数
+            max_bytes: 缓存值的最大总字节数
+        """
+        self.path = path or default_cache_path()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " model TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+        self.evict()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期时返回 None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or self._expired(row[1], now):
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str, model: Optional[str] = None):
+        """写入缓存"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, created_at, accessed_at, model)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now, model),
+            )
+            self._writes += 1
+            need_evict = self._writes % _EVICT_INTERVAL == 0
+        if need_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """删除过期条目，并按最近访问时间淘汰超出容量的条目，返回删除的条目数"""
+        removed = 0
+        with self._lock:
+            if self.ttl is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,)
+                ).rowcount
+
+            if self.max_entries is not None:
+                count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+                if count > self.max_entries:
+                    removed += self._conn.execute(
+                        "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                        (count - self.max_entries,),
+                    ).rowcount
+
+            if self.max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+                if total > self.max_bytes:
+                    # 从最久未访问的条目开始累计，删除到总大小低于上限为止
+                    excess = total - self.max_bytes
+                    keys = []
+                    for key, size in self._conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+                        keys.append(key)
+                        excess -= size
+                        if excess <= 0:
+                            break
+                    self._conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+                    removed += len(keys)
+        return removed
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：条目数、总字节数、本进程的命中/未命中次数"""
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
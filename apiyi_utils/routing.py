@@ -0,0 +1,286 @@
+"""
+多入口延迟路由与故障切换
+
+API易 提供多个等价的入口（https://vip.apiyi.com/v1 和 https://api.apiyi.com/v1），以前每个脚本写死其中一个。
+开启路由后（环境变量 APIYI_ROUTING=1），发往任一入口的请求都会被改写到当前最好的入口：
+
+- 健康探测：后台线程定期请求各入口的 /models，记录探测延迟和成败
+- 按 API 类别统计：chat、images、videos、responses、files …… 各自维护每个入口的
+  延迟滑动平均（EWMA）和错误率滑动平均；连接失败、超时和 5xx 计为错误
+- 选路：各入口在该类别都有足够样本时按类别延迟比较，否则按探测延迟比较，错误率越高得分越差；
+  少量请求（默认 5%）会发往次优入口，保持各入口的统计是新的
+- 故障切换：连续失败达到阈值的入口暂停使用一段时间（熔断），暂停结束后重新参与选路；
+  请求失败重试时避开刚失败的入口
+
+入口列表通过 APIYI_ENDPOINTS 配置（逗号分隔），默认为上面两个入口。
+
+用法:
+    from apiyi_utils.routing import get_router
+
+    router = get_router()              # 未开启路由时返回 None
+    url = router.route("https://vip.apiyi.com/v1/chat/completions")
+
+    python -m apiyi_utils.routing      # 探测各入口并打印状态
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_ENDPOINTS = ["https://vip.apiyi.com/v1", "https://api.apiyi.com/v1"]
+
+# URL 路径（去掉入口前缀后）第一段到 API 类别的映射
+_FAMILIES = {
+    "chat": "chat",
+    "completions": "chat",
+    "images": "images",
+    "videos": "videos",
+    "responses": "responses",
+    "files": "files",
+    "batches": "batches",
+    "embeddings": "embeddings",
+    "models": "models",
+}
+
+
+def api_family(path: str) -> str:
+    """根据入口之后的路径判断 API 类别，例如 /chat/completions -> chat"""
+    first = path.lstrip("/").split("/", 1)[0]
+    return _FAMILIES.get(first, "other")
+
+
+class _Stats:
+    """一个入口在一个 API 类别下的滑动统计"""
+
+    __slots__ = ("latency", "error_rate", "samples", "failures", "open_until")
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.failures = 0          # 连续失败次数
+        self.open_until = 0.0      # 熔断截止时间
+
+
+class EndpointRouter:
+    """按探测延迟和各 API 类别的请求统计，在多个等价入口之间选路"""
+
+    def __init__(self, endpoints: Optional[List[str]] = None, alpha: float = 0.2, min_samples: int = 3,
+                 explore: float = 0.05, failure_threshold: int = 3, cooldown: float = 30.0,
+                 probe_interval: float = 30.0, probe_timeout: float = 3.0, probe_path: str = "/models",
+                 api_key: Optional[str] = None):
+        """
+        Args:
+            endpoints: 等价入口列表（包含 /v1 前缀）
+            alpha: 滑动平均的权重，越大越看重最近的样本
+            min_samples: 按类别延迟比较前，每个入口至少需要的样本数
+            explore: 发往次优入口的请求比例
+            failure_threshold / cooldown: 连续失败多少次后暂停该入口多少秒
+            probe_interval / probe_timeout / probe_path: 后台健康探测的间隔、超时和路径
+            api_key: 探测请求使用的 API Key（部分入口的 /models 需要鉴权）
+        """
+        self.endpoints = [endpoint.rstrip("/") for endpoint in (endpoints or DEFAULT_ENDPOINTS)]
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.explore = explore
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.probe_path = probe_path
+        self.api_key = api_key
+        self._stats: Dict[Tuple[str, str], _Stats] = {}
+        self._lock = threading.Lock()
+        self._prober: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()  # 首次探测期间持有，其他线程在此等待探测结果
+        self._ready = threading.Event()
+
+    def _get(self, endpoint: str, family: str) -> _Stats:
+        key = (endpoint, family)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _Stats()
+        return stats
+
+    def split(self, url: str) -> Tuple[Optional[str], str]:
+        """把 URL 拆成 (入口, 入口之后的路径)；不属于任何入口时返回 (None, url)"""
+        for endpoint in self.endpoints:
+            if url == endpoint or url.startswith(endpoint + "/") or url.startswith(endpoint + "?"):
+                return endpoint, url[len(endpoint):]
+        return None, url
+
+    def _score(self, endpoint: str, family: str, use_family: bool) -> float:
+        stats = self._get(endpoint, family)
+        probe = self._get(endpoint, "probe")
+        latency = stats.latency if use_family else probe.latency
+        if latency is None:
+            latency = probe.latency if probe.latency is not None else 1.0
+        return latency * (1 + 4 * stats.error_rate + 4 * probe.error_rate)
+
+    def choose(self, family: str, avoid: Optional[str] = None) -> str:
+        """选出该类别当前最好的入口；avoid 为刚失败的入口，其他入口可用时不选它"""
+        now = time.time()
+        with self._lock:
+            healthy = [e for e in self.endpoints
+                       if self._get(e, family).open_until <= now and self._get(e, "probe").open_until <= now]
+            candidates = [e for e in healthy if e != avoid] or healthy or [e for e in self.endpoints if e != avoid]
+            candidates = candidates or self.endpoints
+            use_family = all(self._get(e, family).samples >= self.min_samples for e in candidates)
+            ranked = sorted(candidates, key=lambda e: self._score(e, family, use_family))
+        if len(ranked) > 1 and random.random() < self.explore:
+            return random.choice(ranked[1:])
+        return ranked[0]
+
+    def route(self, url: str, avoid: Optional[str] = None) -> str:
+        """把发往任一入口的 URL 改写到该 API 类别当前最好的入口，其他 URL 原样返回"""
+        endpoint, path = self.split(url)
+        if endpoint is None:
+            return url
+        self.start()
+        return self.choose(api_family(urlsplit(path).path), avoid) + path
+
+    def record(self, url: str, latency: Optional[float], ok: bool):
+        """记录一次请求的结果（latency 为秒，失败时可为 None）"""
+        endpoint, path = self.split(url)
+        if endpoint is not None:
+            self._record(endpoint, api_family(urlsplit(path).path), latency, ok)
+
+    def _record(self, endpoint: str, family: str, latency: Optional[float], ok: bool):
+        with self._lock:
+            stats = self._get(endpoint, family)
+            stats.error_rate += self.alpha * ((0.0 if ok else 1.0) - stats.error_rate)
+            if ok:
+                stats.failures = 0
+                if latency is not None:
+                    stats.latency = latency if stats.latency is None else \
+                        stats.latency + self.alpha * (latency - stats.latency)
+                    stats.samples += 1
+            else:
+                stats.failures += 1
+                if stats.failures >= self.failure_threshold:
+                    stats.open_until = time.time() + self.cooldown
+
+    def probe(self):
+        """并发探测所有入口一次"""
+        import requests
+
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+        def probe_one(endpoint):
+            start = time.perf_counter()
+            try:
+                response = requests.get(endpoint + self.probe_path, headers=headers, timeout=self.probe_timeout)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            self._record(endpoint, "probe", time.perf_counter() - start if ok else None, ok)
+
+        threads = [threading.Thread(target=probe_one, args=(endpoint,), daemon=True) for endpoint in self.endpoints]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def start(self):
+        """
+        首次选路时先同步探测一次，然后在后台定期探测
+
+        首次探测完成前到达的其他线程会等待探测结束，不会在没有探测数据时随意选择入口。
+        """
+        if self._ready.is_set():
+            return
+        with self._start_lock:
+            if self._ready.is_set():
+                return
+            self.probe()
+            self._prober = threading.Thread(target=self._probe_loop, daemon=True)
+            self._prober.start()
+            self._ready.set()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            self.probe()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        """各入口、各类别的当前统计，用于打印状态"""
+        now = time.time()
+        with self._lock:
+            return [{"endpoint": endpoint, "family": family,
+                     "latency_ms": None if s.latency is None else round(s.latency * 1000, 1),
+                     "error_rate": round(s.error_rate, 3), "samples": s.samples,
+                     "open": s.open_until > now}
+                    for (endpoint, family), s in sorted(self._stats.items())]
+
+    def httpx_event_hooks(self, is_async: bool = False) -> Dict[str, list]:
+        """
+        供 OpenAI SDK 使用的 httpx 事件钩子：发送前改写 URL，收到响应后记录延迟
+
+        用法: httpx.Client(event_hooks=router.httpx_event_hooks())
+        连接失败不会触发响应钩子，由后台探测负责发现不可用的入口。
+        """
+        def on_request(request):
+            url = self.route(str(request.url))
+            if url != str(request.url):
+                request.url = request.url.__class__(url)
+                request.headers["Host"] = request.url.netloc.decode("ascii")
+            request.extensions["apiyi_started"] = time.perf_counter()
+
+        def on_response(response):
+            started = response.request.extensions.get("apiyi_started")
+            latency = time.perf_counter() - started if started is not None else None
+            self.record(str(response.request.url), latency, response.status_code < 500)
+
+        if not is_async:
+            return {"request": [on_request], "response": [on_response]}
+
+        async def on_request_async(request):
+            on_request(request)
+
+        async def on_response_async(response):
+            on_response(response)
+
+        return {"request": [on_request_async], "response": [on_response_async]}
+
+
+_shared_router: Optional[EndpointRouter] = None
+_shared_lock = threading.Lock()
+
+
+def routing_enabled() -> bool:
+    return os.getenv("APIYI_ROUTING", "").lower() in ("1", "true", "yes")
+
+
+def get_router() -> Optional[EndpointRouter]:
+    """进程内共享的路由器；没有设置 APIYI_ROUTING=1 时返回 None"""
+    global _shared_router
+    if not routing_enabled():
+        return None
+    with _shared_lock:
+        if _shared_router is None:
+            endpoints = [e.strip() for e in os.getenv("APIYI_ENDPOINTS", "").split(",") if e.strip()]
+            _shared_router = EndpointRouter(endpoints or None, api_key=os.getenv("APIYI_API_KEY"))
+        return _shared_router
+
+
+def main():
+    endpoints = [e.strip() for e in os.getenv("APIYI_ENDPOINTS", "").split(",") if e.strip()]
+    router = EndpointRouter(endpoints or None, api_key=os.getenv("APIYI_API_KEY"))
+    for _ in range(3):
+        router.probe()
+    print("🛰️ 入口探测结果:")
+    for row in router.snapshot():
+        latency = "-" if row["latency_ms"] is None else f"{row['latency_ms']} ms"
+        print(f"  {row['endpoint']:<32} 延迟 {latency:<10} 错误率 {row['error_rate']:.0%}"
+              + ("（已熔断）" if row["open"] else ""))
+    print(f"✅ 当前首选入口: {router.choose('chat')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Server-Sent Events（SSE）解析
+
+OpenAI 兼容接口在 "stream": true 时以 SSE 格式逐段返回结果：
+
+    data: {"choices": [{"delta": {"content": "你"}}]}
+
+    data: [DONE]
+
+iter_sse_data 从 requests 的流式响应中逐个产出事件的 data 内容（多行 data 按换行拼接），
+遇到 [DONE] 结束；iter_chat_deltas 在此基础上解析 chat.completions 的增量文本。
+"""
+
+from typing import Iterable, Iterator, Union
+
+from apiyi_utils.jsoncodec import loads
+
+DONE = "[DONE]"
+
+
+def iter_sse_data(lines: Iterable[Union[bytes, str]]) -> Iterator[str]:
+    """
+    解析 SSE 行，产出每个事件的 data 内容
+
+    Args:
+        lines: 按行迭代的响应内容，一般为 response.iter_lines()
+    """
+    data = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r")
+        if not line:
+            # 空行表示一个事件结束
+            if data:
+                payload = "\n".join(data)
+                data = []
+                if payload == DONE:
+                    return
+                yield payload
+            continue
+        if line.startswith(":"):
+            continue  # 注释/心跳
+        field, _, value = line.partition(":")
+        if field == "data":
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data:
+        payload = "\n".join(data)
+        if payload != DONE:
+            yield payload
+
+
+def iter_chat_deltas(lines: Iterable[Union[bytes, str]]) -> Iterator[str]:
+    """解析 chat.completions 流式响应，逐段产出增量文本；服务端在流中返回错误时抛出 RuntimeError"""
+    for payload in iter_sse_data(lines):
+        event = loads(payload)
+        if "error" in event:
+            error = event["error"]
+            raise RuntimeError(error.get("message", error) if isinstance(error, dict) else error)
+        for choice in event.get("choices") or []:
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
@@ -0,0 +1,225 @@
+"""
+可选的调用链追踪
+
+一次 API 调用的耗时分布在很多环节：限流等待、请求序列化、建立连接（TCP + TLS）、上传请求体、
+服务端处理、下载响应、base64 解码……只看总耗时无法判断变慢的是我们这边还是服务端。
+开启追踪后，各脚本的主要调用和共享 HTTP 客户端的每个阶段都会记录为 span：
+
+    vision.api_inference                     整次调用
+      http.request  POST /v1/chat/completions
+        ratelimit.wait                       等待限流令牌
+        http.serialize                       构造请求（JSON 编码 / multipart 准备）
+        http.connect                         建立新连接（复用连接时没有这一段）
+        http.upload                          发送请求头和请求体
+        http.wait                            等待服务端返回响应头（服务端处理时间）
+        http.download                        读取响应体
+        http.backoff                         重试前的等待
+
+通过环境变量 APIYI_TRACE 开启：
+- APIYI_TRACE=jsonl：每个结束的 span 追加一行 JSON 到 APIYI_TRACE_FILE（默认 ~/.cache/apiyi/traces.jsonl）
+- APIYI_TRACE=otel：通过 OpenTelemetry API 创建 span（需要 pip install opentelemetry-sdk 并自行配置导出器），
+  未安装时退回 jsonl
+
+未开启时 span() 几乎没有开销。汇总本地追踪文件，查看各阶段耗时分布：
+    python -m apiyi_utils.tracing ~/.cache/apiyi/traces.jsonl
+
+用法:
+    from apiyi_utils.tracing import span, traced
+
+    @traced("sora.submit")
+    def step1_submit_video_request(): ...
+
+    with span("b64.decode", bytes=len(data)) as s:
+        ...
+"""
+
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from apiyi_utils.result_cache import default_cache_path
+
+_current: contextvars.ContextVar = contextvars.ContextVar("apiyi_span", default=None)
+
+
+class Span:
+    """本地 span：结束时交给导出器写出"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "events", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes):
+        self.events.append({"name": name, "time": time.time(), **attributes})
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start": self.start, "end": self.end,
+            "duration_ms": round((self.end - self.start) * 1000, 3), "attributes": self.attributes,
+        }
+        if self.events:
+            record["events"] = self.events
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def add_event(self, name: str, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonlExporter:
+    """把结束的 span 逐行追加到 JSONL 文件，多线程、多进程追加写同一个文件都是安全的"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class _LocalTracer:
+    def __init__(self, exporter: JsonlExporter):
+        self.exporter = exporter
+
+    @contextmanager
+    def start(self, name: str, attributes: Dict[str, Any]) -> Iterator[Span]:
+        current = Span(name, _current.get(), attributes)
+        token = _current.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            current.end = time.time()
+            _current.reset(token)
+            self.exporter.export(current)
+
+
+class _OtelTracer:
+    def __init__(self):
+        from opentelemetry import trace
+
+        self._trace = trace
+        self._tracer = trace.get_tracer("apiyi")
+
+    @contextmanager
+    def start(self, name: str, attributes: Dict[str, Any]):
+        attributes = {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in attributes.items()}
+        with self._tracer.start_as_current_span(name, attributes=attributes) as current:
+            yield current
+
+
+_tracer = None
+_configured = False
+_config_lock = threading.Lock()
+
+
+def get_tracer():
+    """按 APIYI_TRACE 创建追踪器；未开启时返回 None"""
+    global _tracer, _configured
+    if _configured:
+        return _tracer
+    with _config_lock:
+        if not _configured:
+            mode = os.getenv("APIYI_TRACE", "").lower()
+            if mode == "otel":
+                try:
+                    _tracer = _OtelTracer()
+                except ImportError:
+                    print("⚠️ 未安装 opentelemetry，追踪记录改为写入本地 JSONL 文件")
+                    mode = "jsonl"
+            if mode in ("1", "true", "jsonl"):
+                path = os.getenv("APIYI_TRACE_FILE") or default_cache_path("traces.jsonl")
+                _tracer = _LocalTracer(JsonlExporter(path))
+            _configured = True
+    return _tracer
+
+
+def enabled() -> bool:
+    return get_tracer() is not None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """记录一段耗时；未开启追踪时不做任何事"""
+    tracer = get_tracer()
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    with tracer.start(name, attributes) as current:
+        yield current
+
+
+def traced(name: Optional[str] = None):
+    """把整个函数调用记录为一个 span 的装饰器"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if get_tracer() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent))]
+
+
+def summarize(path: str):
+    """按 span 名称汇总追踪文件：次数、p50、p95、总耗时"""
+    durations: Dict[str, List[float]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            durations.setdefault(record["name"], []).append(record["duration_ms"])
+    print(f"{'span':<32}{'次数':>8}{'p50(ms)':>12}{'p95(ms)':>12}{'总计(s)':>10}")
+    for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+        print(f"{name:<32}{len(values):>8}{_percentile(values, 0.5):>12.1f}{_percentile(values, 0.95):>12.1f}"
+              f"{sum(values) / 1000:>10.2f}")
+    print("ℹ️ http.wait 为服务端处理时间；http.connect / http.upload / http.download 受网络影响；"
+          "其余为本地耗时")
+
+
+if __name__ == "__main__":
+    summarize(sys.argv[1] if len(sys.argv) > 1 else default_cache_path("traces.jsonl"))
@@ -0,0 +1 @@
+"""基准测试（asv 套件与独立脚本）"""
@@ -0,0 +1,84 @@
+"""
+统一命令行入口（apiyi_cli.py）的冷启动预算
+
+每个子命令在新进程中运行 `apiyi_cli.py --startup-check <子命令>` 若干次，取中位数，
+减去空解释器（python -c pass）的启动时间，得到 CLI 自身的冷启动开销，与预算比较；
+同时检查不需要 SDK 的子命令没有导入 openai / pydantic / PIL / python-dotenv。
+超出预算或导入了不该导入的依赖时退出码为 1，可以放进 CI：
+
+    python benchmarks/cli_startup.py
+    python benchmarks/cli_startup.py --runs 10 --scale 2    # 较慢的机器上放宽预算
+
+预算按普通开发机设定（requests 约 100 ms，openai SDK 约 600 ms），单位毫秒。
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT, "apiyi_cli.py")
+
+# (子命令参数, 冷启动预算 ms, 不允许导入的依赖)
+NO_SDK = ("openai", "pydantic", "PIL", "dotenv")
+BUDGETS = [
+    (["--help"], 50, ()),
+    (["sora"], 250, NO_SDK),
+    (["veo3"], 250, NO_SDK),
+    (["flux", "edit"], 250, NO_SDK),
+    (["gpt-image"], 250, NO_SDK),
+    (["vision"], 250, NO_SDK),
+    (["flux", "generate"], 1200, ("PIL", "dotenv")),
+    (["extract"], 1200, ("PIL", "dotenv")),
+]
+
+
+def wall_ms(command: List[str], runs: int) -> Tuple[List[float], str]:
+    """在新进程中运行 runs 次，返回每次的耗时（毫秒）和最后一次的输出"""
+    timings, output = [], ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True, cwd=ROOT)
+        timings.append((time.perf_counter() - start) * 1000)
+        output = result.stdout
+    return timings, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="apiyi_cli.py 冷启动预算检查")
+    parser.add_argument("--runs", type=int, default=5, help="每个子命令的运行次数（取中位数）")
+    parser.add_argument("--scale", type=float, default=1.0, help="预算倍数（慢机器上放宽）")
+    args = parser.parse_args()
+
+    baseline = statistics.median(wall_ms([sys.executable, "-c", "pass"], args.runs)[0])
+    print(f"⏱️ 空解释器启动 {baseline:.0f} ms，以下为 CLI 在此之上的开销（{args.runs} 次中位数）")
+    print(f"{'子命令':<22}{'开销(ms)':>10}{'预算(ms)':>10}  重量级依赖")
+
+    failures = 0
+    for command, budget, forbidden in BUDGETS:
+        argv = command if command == ["--help"] else ["--startup-check"] + command
+        timings, output = wall_ms([sys.executable, CLI] + argv, args.runs)
+        overhead = statistics.median(timings) - baseline
+        loaded = ""
+        for line in output.splitlines():
+            if "重量级依赖" in line:
+                loaded = line.split(":", 1)[1].strip()
+        imported = [name for name in forbidden if name in loaded.replace(",", " ").split()]
+        ok = overhead <= budget * args.scale and not imported
+        failures += not ok
+        note = f"  ⚠️ 不应导入 {', '.join(imported)}" if imported else ""
+        print(f"{' '.join(command):<22}{overhead:>10.0f}{budget * args.scale:>10.0f}  "
+              f"{loaded or '-'} {'✅' if ok else '❌'}{note}")
+
+    if failures:
+        print(f"❌ {failures} 个子命令超出冷启动预算")
+        sys.exit(1)
+    print("✅ 所有子命令都在冷启动预算内")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+各接口的客户端开销基准
+
+在本地启动 mock_server.py（服务端几乎不耗时），直接调用各脚本里的函数，测量我们这一侧的开销：
+构造请求体、base64 编码/解码、JSON 解析、下载和写文件。发往 vip.apiyi.com / api.apiyi.com 的请求
+通过传输适配器改写到本地模拟服务，SDK 客户端替换 base_url，脚本本身不需要修改。
+
+每个场景记录吞吐量（请求/秒）、单次调用延迟 p50/p99 和峰值内存（RSS），两种运行方式：
+
+- asv（按提交记录历史结果，可生成趋势图）：
+    pip install asv
+    asv run --environment existing --quick
+    asv publish && asv preview
+- 直接运行（每个场景在单独的子进程中测量峰值内存；--output 把结果连同提交号追加到 JSONL 文件）：
+    python benchmarks/endpoints.py
+    python benchmarks/endpoints.py gpt_image_edit flux_edit --requests 50 --output bench_history.jsonl
+
+图片大小由环境变量 APIYI_BENCH_IMAGE_KB 控制（默认 1024 KB），每个场景的请求数由 APIYI_BENCH_REQUESTS 控制（默认 30）。
+后台图片后处理（缩略图）在测量期间关闭。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+IMAGE_KB = int(os.getenv("APIYI_BENCH_IMAGE_KB", "1024"))
+REQUESTS = int(os.getenv("APIYI_BENCH_REQUESTS", "30"))
+API_HOSTS = ("https://vip.apiyi.com", "https://api.apiyi.com")
+API_KEY = "sk-bench"
+PROMPT = "描述这张图片的内容"
+
+
+def load_script(relative_path: str):
+    """按路径导入脚本（文件名含连字符，不能直接 import）"""
+    path = os.path.join(ROOT, relative_path)
+    name = "bench_" + os.path.splitext(os.path.basename(path))[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class BenchContext:
+    """一次基准运行共用的模拟服务、临时目录和测试图片"""
+
+    def __init__(self, image_kb: int = IMAGE_KB):
+        from requests.adapters import HTTPAdapter
+
+        from apiyi_utils.http import get_session
+        from mock_server import base_url, start_server
+
+        self.workdir = tempfile.mkdtemp(prefix="apiyi-bench-")
+        os.environ["APIYI_CACHE_DIR"] = os.path.join(self.workdir, "cache")
+        os.environ["APIYI_POSTPROCESS"] = "0"
+        os.chdir(self.workdir)  # 各脚本把结果写到当前目录
+
+        self.server = start_server(image_kb=image_kb)
+        self.base_url = base_url(self.server)
+        root_url = self.base_url[:-len("/v1")]
+
+        class RedirectAdapter(HTTPAdapter):
+            def send(self, request, **kwargs):
+                for host in API_HOSTS:
+                    if request.url.startswith(host):
+                        request.url = root_url + request.url[len(host):]
+                        request.headers.pop("Host", None)
+                return super().send(request, **kwargs)
+
+        session = get_session()
+        for host in API_HOSTS:
+            session.mount(host, RedirectAdapter())
+
+        self.image_path = os.path.join(self.workdir, "input.png")
+        self.mask_path = os.path.join(self.workdir, "mask.png")
+        for path in (self.image_path, self.mask_path):
+            with open(path, "wb") as f:
+                f.write(self.server.state.image)
+
+    def openai_client(self):
+        from openai import OpenAI
+
+        return OpenAI(api_key=API_KEY, base_url=self.base_url)
+
+
+_context: Optional[BenchContext] = None
+
+
+def get_context() -> BenchContext:
+    global _context
+    if _context is None:
+        _context = BenchContext()
+    return _context
+
+
+# ---------------------------------------------------------------------------
+# 场景：每个函数返回一次完整调用（不含一次性的准备工作）
+# ---------------------------------------------------------------------------
+
+def vision(ctx: BenchContext) -> Callable[[], Any]:
+    """视觉理解：读取图片并 base64 编码，发送 chat.completions，解析回复"""
+    module = load_script("Vision-API-OpenAI/vision-test.py")
+
+    def call():
+        base64_image, mime_type = module.encode_image(ctx.image_path, raw=True)
+        assert module.api_inference(PROMPT, base64_image, api_key=API_KEY, mime_type=mime_type)
+    return call
+
+
+def vision_stream(ctx: BenchContext) -> Callable[[], Any]:
+    """视觉理解（SSE 流式）：逐段解析增量并写入结果文件"""
+    module = load_script("Vision-API-OpenAI/vision-test.py")
+
+    def call():
+        base64_image, mime_type = module.encode_image(ctx.image_path, raw=True)
+        result, _ = module.api_inference_stream(PROMPT, base64_image, ctx.image_path, api_key=API_KEY,
+                                                mime_type=mime_type)
+        assert result
+    return call
+
+
+def veo3(ctx: BenchContext) -> Callable[[], Any]:
+    """Veo3：chat.completions 返回 markdown，提取视频链接"""
+    module = load_script("veo3-video-generate-demo.py")
+
+    def call():
+        assert module.generate_video(API_KEY, "a bee playing video games")["download_url"]
+    return call
+
+
+def gpt4o_image(ctx: BenchContext) -> Callable[[], Any]:
+    """gpt-4o-image 文生图：解析 markdown 图片链接并下载保存"""
+    module = load_script("sora_image-API/gpt-4o-text-to-image-demo.py")
+
+    def call():
+        result = module.generate_image_from_text(API_KEY, module.add_ratio("生成一只可爱的小猫"))
+        assert result
+        module.process_and_download(result, "bench")
+    return call
+
+
+def flux_generate(ctx: BenchContext) -> Callable[[], Any]:
+    """Flux 文生图（SDK）：返回图片链接，下载保存"""
+    module = load_script("flux-Image-API/flux-image-generate-demo.py")
+    module.client = ctx.openai_client()
+    return module.main
+
+
+def flux_edit(ctx: BenchContext) -> Callable[[], Any]:
+    """Flux 图像编辑：流式 multipart 上传，下载结果图片"""
+    module = load_script("flux-Image-API/flux-image-edit-demo.py")
+    module.API_KEY, module.BASE_URL = API_KEY, ctx.base_url
+
+    def call():
+        response = module.edit_image_streaming(ctx.image_path, PROMPT)
+        assert module.save_image_from_response(response, "bench_edit")
+    return call
+
+
+def gpt_image_edit(ctx: BenchContext) -> Callable[[], Any]:
+    """gpt-image-1 编辑：multipart 上传图片和遮罩，b64_json 响应流式解码写文件"""
+    module = load_script("openai-gpt-image-1-edits-and-mask-demo.py")
+    output_path = os.path.join(ctx.workdir, "edited.png")
+
+    def call():
+        result = module.edit_image(ctx.image_path, ctx.mask_path, api_key=API_KEY, output_path=output_path,
+                                   verbose=False)
+        assert result["success"], result
+    return call
+
+
+def responses(ctx: BenchContext) -> Callable[[], Any]:
+    """Responses API 结构化抽取（异步 SDK + Pydantic 校验）"""
+    import responses_extraction as rx
+
+    engine = rx.ExtractionEngine(rx.make_client(API_KEY, base_url=ctx.base_url), rx.load_schema(rx.DEFAULT_SCHEMA))
+    loop = asyncio.new_event_loop()
+    text = "Alice and Bob are going to a science fair on Friday."
+
+    def call():
+        loop.run_until_complete(engine.parse(text))
+    return call
+
+
+SCENARIOS: Dict[str, Callable[[BenchContext], Callable[[], Any]]] = {
+    "vision": vision,
+    "vision_stream": vision_stream,
+    "veo3": veo3,
+    "gpt4o_image": gpt4o_image,
+    "flux_generate": flux_generate,
+    "flux_edit": flux_edit,
+    "gpt_image_edit": gpt_image_edit,
+    "responses": responses,
+}
+
+
+def build(scenario: str) -> Callable[[], Any]:
+    """准备场景，返回不打印输出的单次调用"""
+    call = SCENARIOS[scenario](get_context())
+
+    def quiet():
+        with contextlib.redirect_stdout(io.StringIO()):
+            call()
+    return quiet
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent))]
+
+
+def measure(call: Callable[[], Any], count: int = REQUESTS, warmup: int = 2) -> Dict[str, float]:
+    """顺序调用 count 次，返回吞吐量和延迟分位数（毫秒）"""
+    for _ in range(warmup):
+        call()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(count):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+    return {"throughput": count / elapsed, "p50_ms": _percentile(latencies, 0.5),
+            "p99_ms": _percentile(latencies, 0.99)}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """当前进程的峰值 RSS（MB），Windows 上返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# ---------------------------------------------------------------------------
+# asv 基准：time_* 为单次调用耗时，peakmem_* 为峰值内存，track_* 为自定义指标
+# ---------------------------------------------------------------------------
+
+class EndpointSuite:
+    params = list(SCENARIOS)
+    param_names = ["scenario"]
+    timeout = 300
+
+    def setup(self, scenario):
+        self.call = build(scenario)
+        self._stats = None
+
+    def _measure(self) -> Dict[str, float]:
+        if self._stats is None:
+            self._stats = measure(self.call)
+        return self._stats
+
+    def time_request(self, scenario):
+        self.call()
+
+    def peakmem_request(self, scenario):
+        self.call()
+
+    def track_throughput(self, scenario):
+        return self._measure()["throughput"]
+
+    track_throughput.unit = "requests/s"
+
+    def track_p50_ms(self, scenario):
+        return self._measure()["p50_ms"]
+
+    track_p50_ms.unit = "ms"
+
+    def track_p99_ms(self, scenario):
+        return self._measure()["p99_ms"]
+
+    track_p99_ms.unit = "ms"
+
+
+# ---------------------------------------------------------------------------
+# 直接运行
+# ---------------------------------------------------------------------------
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_child(scenario: str, count: int):
+    """子进程：测量单个场景并以 JSON 输出（峰值内存只包含该场景）"""
+    stats = measure(build(scenario), count)
+    stats["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="各接口客户端开销基准（本地模拟服务）")
+    parser.add_argument("scenarios", nargs="*", help=f"要运行的场景，默认全部：{', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="每个场景的请求数")
+    parser.add_argument("--output", help="把结果（含提交号和时间）追加到该 JSONL 文件，便于跟踪历史变化")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child, args.requests)
+
+    scenarios = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+
+    print(f"⏱️ 客户端开销基准：图片 {IMAGE_KB} KB，每个场景 {args.requests} 个请求")
+    print(f"{'场景':<16}{'吞吐(req/s)':>12}{'p50(ms)':>10}{'p99(ms)':>10}{'峰值RSS(MB)':>13}")
+    commit = _git_commit()
+    records = []
+    for scenario in scenarios:
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", scenario,
+                                "--requests", str(args.requests)], capture_output=True, text=True)
+        if child.returncode != 0:
+            print(f"{scenario:<16}❌ 运行失败:\n{child.stderr.strip()[-2000:]}")
+            continue
+        stats = json.loads(child.stdout.strip().splitlines()[-1])
+        rss = "-" if stats["peak_rss_mb"] is None else f"{stats['peak_rss_mb']:.1f}"
+        print(f"{scenario:<16}{stats['throughput']:>12.1f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{rss:>13}")
+        records.append({"scenario": scenario, "commit": commit, "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                        "image_kb": IMAGE_KB, "requests": args.requests, **stats})
+
+    if args.output and records:
+        with open(args.output, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"📄 结果已追加到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+HTTP 客户端单请求延迟对比
+
+对比三种发请求的方式，输出每种方式的单请求延迟（p50 / p95 / 平均）：
+
+- before：裸 requests.get，每个请求新建一条 TCP（+ TLS）连接
+- after：共享的 ApiSession（apiyi_utils.http.get_session），连接保持 keep-alive
+- after-http2：共享的 ApiSession + HTTP/2（需要 pip install "httpx[http2]"）
+
+默认在本地启动 mock_server.py 并请求 /v1/models；传入 --url 可以对真实接口测试，
+HTTPS 接口上差距主要来自每次请求省掉的 TLS 握手：
+
+    python benchmarks/http_client_latency.py --requests 200
+    python benchmarks/http_client_latency.py --url https://vip.apiyi.com/v1/models --requests 30
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(send: Callable[[], object], count: int, warmup: int = 3) -> List[float]:
+    """连续发送 count 个请求，返回每个请求的耗时（毫秒）"""
+    for _ in range(warmup):
+        send()
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        send()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "p50": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "mean": statistics.fmean(ordered),
+    }
+
+
+def run(url: str, count: int, headers: Dict[str, str]) -> Dict[str, Dict[str, float]]:
+    import requests
+
+    from apiyi_utils.http import ApiSession, http2_available
+
+    def bare():
+        response = requests.get(url, headers=headers, timeout=30)
+        response.raise_for_status()
+
+    results = {"before": summarize(measure(bare, count))}
+
+    session = ApiSession(pool_size=1)
+    results["after"] = summarize(measure(lambda: session.get(url, headers=headers).raise_for_status(), count))
+    session.close()
+
+    if http2_available():
+        session = ApiSession(pool_size=1, http2=True)
+        results["after-http2"] = summarize(
+            measure(lambda: session.get(url, headers=headers).raise_for_status(), count))
+        session.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP 客户端单请求延迟对比")
+    parser.add_argument("--url", help="测试地址，默认请求本地模拟服务的 /v1/models")
+    parser.add_argument("--requests", type=int, default=100, help="每种方式的请求数")
+    parser.add_argument("--api-key", default=os.getenv("APIYI_API_KEY", "sk-"), help="API Key（默认读取 APIYI_API_KEY 环境变量）")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        from mock_server import base_url, start_server
+
+        server = start_server()
+        url = base_url(server) + "/models"
+
+    print(f"⏱️ 单请求延迟对比: {url}（每种方式 {args.requests} 个请求）")
+    try:
+        results = run(url, args.requests, {"Authorization": f"Bearer {args.api_key}"})
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    baseline = results["before"]["p50"]
+    print(f"{'方式':<14}{'p50(ms)':>10}{'p95(ms)':>10}{'平均(ms)':>10}{'p50 提升':>10}")
+    for name, stats in results.items():
+        speedup = baseline / stats["p50"] if stats["p50"] else 0
+        print(f"{name:<14}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['mean']:>10.2f}{speedup:>9.1f}x")
+    if "after-http2" not in results:
+        print('ℹ️ 未安装 HTTP/2 依赖，跳过 after-http2（pip install "httpx[http2]"）')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+JSON 编解码后端对比（apiyi_utils/jsoncodec.py）
+
+用接近真实的 MB 级负载比较已安装的各个后端（msgspec / orjson / 标准库 json）：
+
+- images_b64：images/edits 响应，data 中 1 张 b64_json 图片
+- images_b64_x4：images/generations n=4 的响应，4 张 b64_json 图片
+- chat_image：chat.completions 响应，回复内容中内嵌 data URL 图片
+- chat_request：内嵌 data URL 图片的 chat.completions 请求体（测量序列化）
+
+每个后端测量 loads（解析为字典）、decode（解码为响应结构 dataclass）、dumps（序列化），
+记录中位耗时、吞吐（MB/s）和 tracemalloc 统计的峰值内存增量。"baseline" 一行是改造前
+脚本的写法：bytes 先解码为 str 再交给 json.loads（flux 还会用 object_hook 转为 SimpleNamespace）。
+
+    python benchmarks/json_codec.py
+    python benchmarks/json_codec.py --image-kb 8192 --runs 5
+    asv run --environment existing --bench JsonCodec
+
+图片大小（base64 之前）由 --image-kb 或环境变量 APIYI_BENCH_IMAGE_KB 控制，默认 2048 KB。
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from apiyi_utils.jsoncodec import ChatCompletion, ImagesResponse, available_backends, load_codec
+
+IMAGE_KB = int(os.getenv("APIYI_BENCH_IMAGE_KB", "2048"))
+
+# 负载名 → (响应结构, 是否为请求体)
+PAYLOADS = {
+    "images_b64": (ImagesResponse, False),
+    "images_b64_x4": (ImagesResponse, False),
+    "chat_image": (ChatCompletion, False),
+    "chat_request": (None, True),
+}
+
+
+def _image_b64(image_kb: int, seed: int = 0) -> str:
+    # 随机字节的 base64 与压缩后图片的 base64 在字符分布上没有区别
+    return base64.b64encode(os.urandom(image_kb * 1024 - seed)).decode("ascii")
+
+
+def build_payload(name: str, image_kb: int = IMAGE_KB) -> Any:
+    """构造负载对象（请求体直接返回对象，响应返回序列化后的 bytes）"""
+    if name == "images_b64":
+        data = {"created": 1760000000, "data": [{"b64_json": _image_b64(image_kb), "revised_prompt": "a red fox"}],
+                "usage": {"input_tokens": 120, "output_tokens": 4160, "total_tokens": 4280}}
+    elif name == "images_b64_x4":
+        data = {"created": 1760000000, "data": [{"b64_json": _image_b64(image_kb, i)} for i in range(4)]}
+    elif name == "chat_image":
+        content = f"这是生成的图片：\n\n![image](data:image/png;base64,{_image_b64(image_kb)})\n\n如需调整请告诉我。"
+        data = {"id": "chatcmpl-bench", "object": "chat.completion", "created": 1760000000, "model": "gpt-4o-image",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 20, "completion_tokens": 400, "total_tokens": 420}}
+    elif name == "chat_request":
+        return {"model": "gemini-2.5-pro", "messages": [{"role": "user", "content": [
+            {"type": "text", "text": "请详细分析这张图片的内容"},
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{_image_b64(image_kb)}"}},
+        ]}]}
+    else:
+        raise ValueError(f"未知负载: {name}")
+    return json.dumps(data).encode("utf-8")
+
+
+def operations(payload_name: str, payload: Any, backend: str) -> Dict[str, Callable[[], Any]]:
+    """返回该后端在该负载上可测的操作 {操作名: 调用}"""
+    cls, is_request = PAYLOADS[payload_name]
+    if backend == "baseline":
+        if is_request:
+            return {"dumps": lambda: json.dumps(payload).encode("utf-8")}
+        return {"loads": lambda: json.loads(payload.decode("utf-8")),
+                "decode": lambda: json.loads(payload.decode("utf-8"),
+                                             object_hook=lambda item: SimpleNamespace(**item))}
+    codec = load_codec(backend)
+    if is_request:
+        return {"dumps": lambda: codec.dumps(payload)}
+    return {"loads": lambda: codec.loads(payload), "decode": lambda: codec.decode(payload, cls)}
+
+
+def time_call(call: Callable[[], Any], runs: int) -> float:
+    """中位耗时（秒）"""
+    call()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def peak_alloc_mb(call: Callable[[], Any]) -> float:
+    """一次调用期间 Python 分配器的峰值内存增量（MB，包括返回值）"""
+    tracemalloc.start()
+    try:
+        result = call()
+        peak = tracemalloc.get_traced_memory()[1]
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def payload_mb(payload: Any) -> float:
+    size = len(payload) if isinstance(payload, bytes) else len(json.dumps(payload))
+    return size / (1024 * 1024)
+
+
+# ---------------------------------------------------------------------------
+# asv 基准
+# ---------------------------------------------------------------------------
+
+class JsonCodecSuite:
+    params = (["baseline"] + available_backends(), list(PAYLOADS))
+    param_names = ["backend", "payload"]
+    timeout = 300
+
+    def setup(self, backend, payload):
+        # 响应测 decode（带类型的完整解码），请求体测 dumps
+        calls = operations(payload, build_payload(payload), backend)
+        self.call = calls.get("decode") or calls["dumps"]
+
+    def time_codec(self, backend, payload):
+        self.call()
+
+    def peakmem_codec(self, backend, payload):
+        self.call()
+
+
+# ---------------------------------------------------------------------------
+# 直接运行
+# ---------------------------------------------------------------------------
+
+def run(payload_names: List[str], backends: List[str], image_kb: int,
+        runs: int) -> List[Tuple[str, str, str, float, float, float]]:
+    rows = []
+    for payload_name in payload_names:
+        payload = build_payload(payload_name, image_kb)
+        size = payload_mb(payload)
+        for backend in backends:
+            for operation, call in operations(payload_name, payload, backend).items():
+                seconds = time_call(call, runs)
+                rows.append((payload_name, backend, operation, seconds * 1000, size / seconds, peak_alloc_mb(call)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 编解码后端对比（MB 级图片响应）")
+    parser.add_argument("payloads", nargs="*", help=f"要测的负载，默认全部：{', '.join(PAYLOADS)}")
+    parser.add_argument("--image-kb", type=int, default=IMAGE_KB, help="单张图片大小（KB，base64 之前）")
+    parser.add_argument("--runs", type=int, default=10, help="每项测量的次数（取中位数）")
+    args = parser.parse_args()
+
+    payload_names = args.payloads or list(PAYLOADS)
+    unknown = [name for name in payload_names if name not in PAYLOADS]
+    if unknown:
+        parser.error(f"未知负载: {', '.join(unknown)}")
+
+    backends = ["baseline"] + available_backends()
+    missing = [name for name in ("msgspec", "orjson") if name not in backends]
+    print(f"⏱️ JSON 编解码基准：图片 {args.image_kb} KB，每项 {args.runs} 次中位数，后端 {', '.join(backends[1:])}")
+    if missing:
+        print(f"💡 未安装 {', '.join(missing)}（pip install {' '.join(missing)}）")
+    print(f"{'负载':<16}{'后端':<10}{'操作':<8}{'耗时(ms)':>10}{'MB/s':>10}{'峰值内存(MB)':>14}")
+    for payload_name, backend, operation, ms, throughput, peak in run(payload_names, backends, args.image_kb,
+                                                                       args.runs):
+        print(f"{payload_name:<16}{backend:<10}{operation:<8}{ms:>10.2f}{throughput:>10.0f}{peak:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
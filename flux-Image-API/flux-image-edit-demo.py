@@ -29,7 +29,9 @@ Flux 图像编辑示例 - OpenAI 兼容格式调用
 - 单张图片大小限制：20MB
 - 在线图片会自动下载到临时目录
 - 生成的图片会保存在当前目录，文件名包含时间戳
+- 设置 APIYI_POSTPROCESS=1 时，保存后在后台进程池生成缩略图和 sidecar 元数据文件（{图片}.json）
 - 所有额外参数需要通过 extra_body 传递（如 aspect_ratio）
+- 本示例使用 edit_image_streaming 流式上传图片（等价于 client.images.edit），大图上传不占用额外内存
 - 支持同步调用，无需轮询等待
 - 图片总像素约为 1MP，不同宽高比会调整具体尺寸
 
@@ -38,21 +40,36 @@ python3 flux-image-edit-demo.py
 功能：编辑图像（修改背景、添加元素等）
 """
 
-from openai import OpenAI
 import base64
+import mimetypes
 import os
-import requests
+import sys
 import time
-from PIL import Image
 import tempfile
-from io import BytesIO
 from urllib.parse import urlparse
 
+# 引入仓库根目录下的公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils import postprocess
+from apiyi_utils.http import get_session
+from apiyi_utils.jsoncodec import ImagesResponse, decode
+from apiyi_utils.multipart import MultipartEncoder, print_upload_progress
+from apiyi_utils.tracing import span, traced
+
 # 使用中转站的 API
-client = OpenAI(
-    api_key="sk-",  # 中转站 API KEY（按次计费类型）- 请替换为您的真实 API Key
-    base_url="https://vip.apiyi.com/v1"  # 中转站的 base URL
-)
+API_KEY = "sk-"  # 中转站 API KEY（按次计费类型）- 请替换为您的真实 API Key
+BASE_URL = "https://vip.apiyi.com/v1"  # 中转站的 base URL
+
+_client = None
+
+def get_client():
+    """OpenAI SDK 客户端（只有上传文件时用到，首次使用时才导入 openai）"""
+    global _client
+    if _client is None:
+        from openai import OpenAI
+
+        _client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
+    return _client
 
 def download_image_from_url(url, save_dir=None):
     """从URL下载图片并返回本地文件路径"""
@@ -64,7 +81,7 @@ def download_image_from_url(url, save_dir=None):
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(url, headers=headers, timeout=30)
+        response = get_session().get(url, headers=headers, timeout=30)
         response.raise_for_status()  # 检查HTTP错误
         
         # 从URL获取文件扩展名
@@ -104,6 +121,8 @@ def download_image_from_url(url, save_dir=None):
         
         # 验证图片是否有效
         try:
+            from PIL import Image
+
             with Image.open(file_path) as img:
                 print(f"图片信息: {img.format}, 尺寸: {img.size}, 模式: {img.mode}")
         except Exception as e:
@@ -144,7 +163,7 @@ def create_file(file_path):
     """上传文件到 OpenAI 并返回 file_id"""
     try:
         with open(file_path, "rb") as file:
-            response = client.files.create(
+            response = get_client().files.create(
                 file=file,
                 purpose="vision"
             )
@@ -153,6 +172,38 @@ def create_file(file_path):
         print(f"文件上传失败: {e}")
         return None
 
+@traced("flux.edit")
+def edit_image_streaming(image_path, prompt, aspect_ratio="1:1", mask_path=None, model="flux-kontext-max", timeout=300):
+    """
+    以流式 multipart 上传调用图像编辑接口，等价于 client.images.edit
+
+    图片按块从内存映射的文件中读取并发送，不会把整个文件读入内存，并显示上传进度；
+    返回可按属性访问的响应对象（字段与 SDK 的 ImagesResponse 一致），可直接交给 save_image_from_response 处理
+    """
+    fields = {
+        "model": model,
+        "prompt": prompt,
+        "aspect_ratio": aspect_ratio  # 对应 SDK 调用时 extra_body 中的参数
+    }
+    files = {
+        "image": (os.path.basename(image_path), image_path, mimetypes.guess_type(image_path)[0] or "image/png")
+    }
+    if mask_path:
+        files["mask"] = (os.path.basename(mask_path), mask_path, mimetypes.guess_type(mask_path)[0] or "image/png")
+
+    url = BASE_URL.rstrip("/") + "/images/edits"
+    with MultipartEncoder(fields=fields, files=files, progress=print_upload_progress) as encoder:
+        headers = {
+            "Authorization": f"Bearer {API_KEY}",
+            "Content-Type": encoder.content_type
+        }
+        response = get_session().post(url, headers=headers, data=encoder, timeout=timeout)
+
+    if response.status_code != 200:
+        raise Exception(f"API 返回错误 {response.status_code}: {response.text[:500]}")
+    with span("json.decode", bytes=len(response.content)):
+        return decode(response.content, ImagesResponse)
+
 def save_image_from_response(response_data, filename_prefix="edited_image"):
     """保存响应中的图片"""
     try:
@@ -162,24 +213,28 @@ def save_image_from_response(response_data, filename_prefix="edited_image"):
             if hasattr(image_data, 'url') and image_data.url:
                 # 从 URL 下载图片
                 print(f"正在从 URL 下载图片: {image_data.url}")
-                response = requests.get(image_data.url)
+                with span("flux.download"):
+                    response = get_session().get(image_data.url)
                 if response.status_code == 200:
                     timestamp = int(time.time())
                     filename = f"{filename_prefix}_{timestamp}.png"
                     with open(filename, "wb") as f:
                         f.write(response.content)
                     print(f"图片已保存为: {filename}")
+                    postprocess.submit_image(filename)  # 后台生成缩略图和元数据
                     return filename
                     
             elif hasattr(image_data, 'b64_json') and image_data.b64_json:
                 # 处理 base64 数据
                 print("正在处理 base64 图片数据...")
-                image_bytes = base64.b64decode(image_data.b64_json)
+                with span("b64.decode", bytes=len(image_data.b64_json)):
+                    image_bytes = base64.b64decode(image_data.b64_json)
                 timestamp = int(time.time())
                 filename = f"{filename_prefix}_{timestamp}.png"
                 with open(filename, "wb") as f:
                     f.write(image_bytes)
                 print(f"图片已保存为: {filename}")
+                postprocess.submit_image(filename)  # 后台生成缩略图和元数据
                 return filename
                 
         print("错误：无法从响应中提取图片数据")
@@ -265,24 +320,20 @@ def edit_image_example():
         print(f"📐 宽高比: {aspect_ratio}")
         print(f"💭 编辑提示: {prompt}")
         
-        # 准备 API 调用参数 - 使用 OpenAI 兼容格式，通过 extra_body 传递 Flux 特有参数
-        edit_params = {
-            "model": "flux-kontext-max",           # 使用的模型
-            "image": open(original_file_path, "rb"),   # 原始图片文件
-            "prompt": prompt,                      # 编辑指令
-            "extra_body": {
-                "aspect_ratio": aspect_ratio       # 自定义宽高比（必须通过 extra_body 传递）
-            }
-        }
-        
-        # 如果指定了蒙版图片，添加到参数中
+        # 如果指定了蒙版图片，一并上传
         if mask_file_path:
-            edit_params["mask"] = open(mask_file_path, "rb")
             print(f"使用蒙版图片: {mask_image}")
         else:
             print("未使用蒙版，AI 将自动决定编辑区域")
         
-        result = client.images.edit(**edit_params)
+        # 流式上传调用编辑接口，参数与 client.images.edit 相同（aspect_ratio 对应 extra_body 中的字段）
+        result = edit_image_streaming(
+            original_file_path,
+            prompt,
+            aspect_ratio=aspect_ratio,
+            mask_path=mask_file_path,
+            model="flux-kontext-max"
+        )
         
         # 添加调试信息
         print("API 响应类型:", type(result))
@@ -316,4 +367,8 @@ if __name__ == "__main__":
     print("- 可在代码中修改 aspect_ratio 参数来调整输出图片比例")
     
     print("\n🎨 开始图像编辑...")
-    edit_image_example() 
+    try:
+        edit_image_example()
+    finally:
+        postprocess.shutdown()
+
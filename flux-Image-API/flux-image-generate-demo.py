@@ -11,7 +11,7 @@ Flux 图像生成示例 - OpenAI 兼容格式调用
 - 生成的图片自动保存到本地，文件名包含时间戳
 
 使用前准备：
-1. 安装依赖：pip install openai requests
+1. 安装依赖：pip install openai requests pillow
 2. 配置 API Key：将下方的 "sk-" 替换为您的真实 API Key
 3. 根据需要修改提示词和宽高比参数
 
@@ -31,6 +31,7 @@ Flux 图像生成示例 - OpenAI 兼容格式调用
 - 图片文件保存在当前目录
 - 文件名格式：otter_{时间戳}.png
 - 控制台显示生成过程和结果信息
+- 设置 APIYI_POSTPROCESS=1 时，后台进程池生成缩略图和 sidecar 元数据文件（{图片}.json）
 
 使用示例：
 python3 flux-kontext-pro-generate-demo.py
@@ -44,9 +45,16 @@ python3 flux-kontext-pro-generate-demo.py
 from openai import OpenAI
 import base64
 import os
-import requests
+import sys
 import time
 
+# 引入仓库根目录下的公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils import postprocess
+from apiyi_utils.http import get_session
+from apiyi_utils.ratelimit import get_rate_limiter
+from apiyi_utils.tracing import span
+
 # 中转站 API 配置
 client = OpenAI(
   api_key="sk-", # 中转站 API KEY（按次计费）- 请替换为您的真实 API Key
@@ -73,79 +81,97 @@ aspect_ratio = "2:3"  # 当前设置为竖版 2:3
 # "3:7"  - 超窄竖版
 # "7:3"  - 超宽横版
 
-try:
-    print("🎨 正在调用 Flux API 生成图片...")
-    print(f"📐 宽高比: {aspect_ratio}")
-    print(f"💭 提示词: {prompt.strip()}")
-    
-    # OpenAI 兼容模式调用 - 通过 extra_body 传递 Flux 特有参数
-    result = client.images.generate(
-        model="flux-kontext-pro",              # 使用 Flux Kontext Pro 模型
-        prompt=prompt,                         # 文本提示词
-        extra_body={
-            "aspect_ratio": aspect_ratio       # 自定义宽高比（必须通过 extra_body 传递）
-        }
-    )
-    
-    print("✅ API 调用成功！")
-    print("📦 API 响应:", result)
-    
-    if not result.data:
-        print("❌ 错误：API 没有返回图片数据")
-        exit(1)
-    
-    # 处理返回的图片数据（支持 URL 和 base64 两种格式）
-    image_data = result.data[0]
-    
-    if image_data.url:
-        # 方式1：从 URL 下载图片（常见格式）
-        print(f"🌐 正在从 URL 下载图片...")
-        print(f"🔗 图片链接: {image_data.url}")
-        response = requests.get(image_data.url)
-        
-        if response.status_code == 200:
+def main():
+    """调用 API 生成图片并保存到当前目录"""
+    try:
+        print("🎨 正在调用 Flux API 生成图片...")
+        print(f"📐 宽高比: {aspect_ratio}")
+        print(f"💭 提示词: {prompt.strip()}")
+
+        # 与同一主机上共用该 Key 的其他脚本共享限流
+        get_rate_limiter().acquire(client.api_key, "flux-kontext-pro")
+
+        # OpenAI 兼容模式调用 - 通过 extra_body 传递 Flux 特有参数
+        # 设置 APIYI_TRACE 时记录生成和下载的耗时
+        with span("flux.generate", model="flux-kontext-pro"):
+            result = client.images.generate(
+                model="flux-kontext-pro",              # 使用 Flux Kontext Pro 模型
+                prompt=prompt,                         # 文本提示词
+                extra_body={
+                    "aspect_ratio": aspect_ratio       # 自定义宽高比（必须通过 extra_body 传递）
+                }
+            )
+
+        print("✅ API 调用成功！")
+        print("📦 API 响应:", result)
+
+        if not result.data:
+            print("❌ 错误：API 没有返回图片数据")
+            exit(1)
+
+        # 处理返回的图片数据（支持 URL 和 base64 两种格式）
+        image_data = result.data[0]
+
+        if image_data.url:
+            # 方式1：从 URL 下载图片（常见格式）
+            print(f"🌐 正在从 URL 下载图片...")
+            print(f"🔗 图片链接: {image_data.url}")
+            with span("flux.download"):
+                response = get_session().get(image_data.url)
+
+            if response.status_code == 200:
+                # 生成带时间戳的文件名，避免重复
+                timestamp = int(time.time())
+                filename = f"otter_{timestamp}.png"
+
+                with open(filename, "wb") as f:
+                    f.write(response.content)
+
+                print(f"💾 图片已成功保存为: {filename}")
+                postprocess.submit_image(filename)  # 后台生成缩略图和元数据
+                print(f"📊 文件大小: {len(response.content)} 字节")
+            else:
+                print(f"❌ 下载图片失败，HTTP状态码: {response.status_code}")
+
+        elif image_data.b64_json:
+            # 方式2：处理 base64 编码的图片数据（备用格式）
+            print("🔢 正在处理 base64 图片数据...")
+            image_base64 = image_data.b64_json
+            with span("b64.decode", bytes=len(image_base64)):
+                image_bytes = base64.b64decode(image_base64)
+
             # 生成带时间戳的文件名，避免重复
             timestamp = int(time.time())
             filename = f"otter_{timestamp}.png"
-            
+
             with open(filename, "wb") as f:
-                f.write(response.content)
-            
+                f.write(image_bytes)
+
             print(f"💾 图片已成功保存为: {filename}")
-            print(f"📊 文件大小: {len(response.content)} 字节")
+            postprocess.submit_image(filename)  # 后台生成缩略图和元数据
+            print(f"📊 文件大小: {len(image_bytes)} 字节")
         else:
-            print(f"❌ 下载图片失败，HTTP状态码: {response.status_code}")
-            
-    elif image_data.b64_json:
-        # 方式2：处理 base64 编码的图片数据（备用格式）
-        print("🔢 正在处理 base64 图片数据...")
-        image_base64 = image_data.b64_json
-        image_bytes = base64.b64decode(image_base64)
-        
-        # 生成带时间戳的文件名，避免重复
-        timestamp = int(time.time())
-        filename = f"otter_{timestamp}.png"
-        
-        with open(filename, "wb") as f:
-            f.write(image_bytes)
-        
-        print(f"💾 图片已成功保存为: {filename}")
-        print(f"📊 文件大小: {len(image_bytes)} 字节")
-    else:
-        print("❌ 错误：API 既没有返回 URL 也没有返回 base64 数据")
-        print("🔍 完整响应内容:", result)
-        
-except Exception as e:
-    print(f"💥 发生错误: {str(e)}")
-    print(f"🔧 错误类型: {type(e)}")
-    print("💡 请检查：")
-    print("  - API Key 是否正确配置")
-    print("  - 网络连接是否正常") 
-    print("  - 中转站服务是否可用")
-    raise
-
-print("\n" + "="*50)
-print("🎉 图片生成完成！")
-print("📁 请查看当前目录中的新图片文件")
-print("💡 提示：如需生成不同图片，请修改 prompt 或 aspect_ratio 参数")
-print("="*50)
\ No newline at end of file
+            print("❌ 错误：API 既没有返回 URL 也没有返回 base64 数据")
+            print("🔍 完整响应内容:", result)
+
+    except Exception as e:
+        print(f"💥 发生错误: {str(e)}")
+        print(f"🔧 错误类型: {type(e)}")
+        print("💡 请检查：")
+        print("  - API Key 是否正确配置")
+        print("  - 网络连接是否正常") 
+        print("  - 中转站服务是否可用")
+        raise
+
+    print("\n" + "="*50)
+    print("🎉 图片生成完成！")
+    print("📁 请查看当前目录中的新图片文件")
+    print("💡 提示：如需生成不同图片，请修改 prompt 或 aspect_ratio 参数")
+    print("="*50)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        postprocess.shutdown()
@@ -1,9 +1,13 @@
 from openai import OpenAI
 import base64
 import os
-import requests
 import time
 
+from apiyi_utils import postprocess
+from apiyi_utils.http import get_session
+from apiyi_utils.ratelimit import get_rate_limiter
+from apiyi_utils.tracing import span
+
 # 使用中转站的 API
 client = OpenAI(
   api_key="sk-", #API易的 KEY
@@ -15,58 +19,73 @@ A children's book drawing of a veterinarian using a stethoscope to
 listen to the heartbeat of a baby otter.
 """
 
-try:
-    print("正在调用 API 生成图片...")
-    result = client.images.generate(
-        model="flux-kontext-pro",
-        prompt=prompt
-    )
-    
-    print("API 响应:", result)
-    
-    if not result.data:
-        print("错误：API 没有返回图片数据")
-        exit(1)
-    
-    # 检查是否有 URL 或 base64 数据
-    image_data = result.data[0]
-    
-    if image_data.url:
-        # 如果返回的是 URL，下载图片
-        print(f"正在从 URL 下载图片: {image_data.url}")
-        response = requests.get(image_data.url)
-        
-        if response.status_code == 200:
+def main():
+    """调用 API 生成图片并保存到当前目录"""
+    try:
+        print("正在调用 API 生成图片...")
+        get_rate_limiter().acquire(client.api_key, "flux-kontext-pro")  # 与同一主机上的其他脚本共享限流
+        with span("flux.generate", model="flux-kontext-pro"):  # 设置 APIYI_TRACE 时记录耗时
+            result = client.images.generate(
+                model="flux-kontext-pro",
+                prompt=prompt
+            )
+
+        print("API 响应:", result)
+
+        if not result.data:
+            print("错误：API 没有返回图片数据")
+            exit(1)
+
+        # 检查是否有 URL 或 base64 数据
+        image_data = result.data[0]
+
+        if image_data.url:
+            # 如果返回的是 URL，下载图片
+            print(f"正在从 URL 下载图片: {image_data.url}")
+            with span("flux.download"):
+                response = get_session().get(image_data.url)
+
+            if response.status_code == 200:
+                # 生成时间戳文件名
+                timestamp = int(time.time())
+                filename = f"otter_{timestamp}.png"
+
+                with open(filename, "wb") as f:
+                    f.write(response.content)
+
+                print(f"图片已成功保存为 {filename}")
+                postprocess.submit_image(filename)  # 后台生成缩略图和元数据
+            else:
+                print(f"下载图片失败，状态码: {response.status_code}")
+
+        elif image_data.b64_json:
+            # 如果返回的是 base64 数据
+            print("正在处理 base64 图片数据...")
+            image_base64 = image_data.b64_json
+            with span("b64.decode", bytes=len(image_base64)):
+                image_bytes = base64.b64decode(image_base64)
+
             # 生成时间戳文件名
             timestamp = int(time.time())
             filename = f"otter_{timestamp}.png"
-            
+
             with open(filename, "wb") as f:
-                f.write(response.content)
-            
+                f.write(image_bytes)
+
             print(f"图片已成功保存为 {filename}")
+            postprocess.submit_image(filename)  # 后台生成缩略图和元数据
         else:
-            print(f"下载图片失败，状态码: {response.status_code}")
-            
-    elif image_data.b64_json:
-        # 如果返回的是 base64 数据
-        print("正在处理 base64 图片数据...")
-        image_base64 = image_data.b64_json
-        image_bytes = base64.b64decode(image_base64)
-        
-        # 生成时间戳文件名
-        timestamp = int(time.time())
-        filename = f"otter_{timestamp}.png"
-        
-        with open(filename, "wb") as f:
-            f.write(image_bytes)
-        
-        print(f"图片已成功保存为 {filename}")
-    else:
-        print("错误：API 既没有返回 URL 也没有返回 base64 数据")
-        print("完整响应:", result)
-        
-except Exception as e:
-    print(f"发生错误: {str(e)}")
-    print(f"错误类型: {type(e)}")
-    raise
+            print("错误：API 既没有返回 URL 也没有返回 base64 数据")
+            print("完整响应:", result)
+
+    except Exception as e:
+        print(f"发生错误: {str(e)}")
+        print(f"错误类型: {type(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        postprocess.shutdown()
@@ -0,0 +1,559 @@
+"""
+本地 API 模拟服务
+
+在不消耗额度、不依赖网络的情况下测试批量流程和各脚本的客户端开销：实现 OpenAI 兼容的 models、files、
+batches、chat.completions、images 与 responses 接口。批处理任务在后台线程中按 /v1/responses 请求体
+生成结构化输出（按 JSON schema 构造模拟对象）；图片类接口返回固定大小的随机噪点 PNG（--image-kb），
+用于测量 base64 编解码、JSON 解析和写文件的开销（见 benchmarks/endpoints.py）。
+
+    python mock_server.py --port 8080 --batch-delay 2
+
+然后把客户端的 base_url 指向 http://127.0.0.1:8080/v1，例如：
+    python responses_batch_api.py --input messages.jsonl --base-url http://127.0.0.1:8080/v1
+
+支持的接口：
+    GET    /v1/models               模型列表
+    POST   /v1/files                上传文件（multipart/form-data，字段 file 与 purpose）
+    GET    /v1/files/{id}           文件信息
+    GET    /v1/files/{id}/content   下载文件内容
+    DELETE /v1/files/{id}           删除文件
+    POST   /v1/batches              创建批处理任务
+    GET    /v1/batches              列出批处理任务
+    GET    /v1/batches/{id}         查询批处理任务
+    POST   /v1/batches/{id}/cancel  取消批处理任务
+    POST   /v1/chat/completions     按模型返回：veo3 视频链接、gpt-4o-image 的 markdown 图片链接、
+                                    其他模型（视觉理解）的文本回复；stream=true 时返回 SSE
+    POST   /v1/images/generations   生成图片（response_format 为 url 或 b64_json）
+    POST   /v1/images/edits         编辑图片（multipart/form-data，response_format 同上）
+    POST   /v1/responses            Responses API（有 json_schema 时返回结构化输出）
+    GET    /v1/assets/{name}        下载上述接口返回链接中的图片/视频
+
+输入文本中包含 MOCK_FAIL 的请求会在批处理结果中返回 400 错误，用于测试失败记录的处理。
+
+故障注入（测试重试、多入口路由和故障切换）：
+    --latency-ms 200   每个响应前额外等待 200 毫秒
+    --error-rate 0.3   30% 的请求直接返回 503
+同时启动两个不同端口、不同参数的实例，即可模拟一个正常入口和一个劣化入口：
+    APIYI_ROUTING=1 APIYI_ENDPOINTS=http://127.0.0.1:8080/v1,http://127.0.0.1:8081/v1 python ...
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+FAIL_MARKER = "MOCK_FAIL"
+DEFAULT_IMAGE_KB = 512
+# 视觉理解回复的长度（字符），接近真实回复的长度
+ANALYSIS_CHARS = 1200
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def fake_from_schema(schema: Dict[str, Any], text: str, defs: Optional[Dict[str, Any]] = None) -> Any:
+    """按 JSON schema 构造模拟对象：字符串取自输入文本，字符串数组取输入中首字母大写的单词"""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return fake_from_schema(defs[schema["$ref"].rsplit("/", 1)[-1]], text, defs)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            return fake_from_schema(schema[key][0], text, defs)
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if "enum" in schema:
+        return schema["enum"][0]
+    if kind == "object":
+        return {name: fake_from_schema(prop, text, defs) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        items = schema.get("items", {})
+        if items.get("type") == "string":
+            return re.findall(r"\b[A-Z][a-z]+\b", text)[:5]
+        return [fake_from_schema(items, text, defs)]
+    if kind == "string":
+        return text[:40]
+    if kind == "integer":
+        return 0
+    if kind == "number":
+        return 0.0
+    if kind == "boolean":
+        return False
+    return None
+
+
+def fake_png(size: int) -> bytes:
+    """生成约 size 字节的有效 PNG（随机噪点几乎不可压缩，文件大小与像素数成正比）"""
+    side = max(1, int((size / 3) ** 0.5))
+    raw = b"".join(b"\x00" + os.urandom(side * 3) for _ in range(side))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (len(data).to_bytes(4, "big") + kind + data
+                + zlib.crc32(kind + data).to_bytes(4, "big"))
+
+    header = side.to_bytes(4, "big") * 2 + bytes([8, 2, 0, 0, 0])  # 8 位 RGB
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1))
+            + chunk(b"IEND", b""))
+
+
+class EventStream(list):
+    """处理函数返回的 SSE 事件列表，按 data: {JSON} 逐条写出并以 data: [DONE] 结束"""
+
+
+def _input_text(body: Dict[str, Any]) -> str:
+    """取出请求中最后一条用户消息的文本"""
+    value = body.get("input")
+    if isinstance(value, str):
+        return value
+    for message in reversed(value or []):
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def responses_body(body: Dict[str, Any]) -> Dict[str, Any]:
+    """为 /v1/responses 请求生成响应体：有 json_schema 时按 schema 构造结构化输出"""
+    text = _input_text(body)
+    text_format = (body.get("text") or {}).get("format") or {}
+    if text_format.get("type") == "json_schema":
+        output_text = json.dumps(fake_from_schema(text_format["schema"], text), ensure_ascii=False)
+    else:
+        output_text = f"mock response: {text[:80]}"
+    input_tokens = max(1, len(text) // 4)
+    output_tokens = max(1, len(output_text) // 4)
+    return {
+        "id": _new_id("resp"),
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body.get("model", "mock"),
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": _new_id("msg"),
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": output_text, "annotations": []}],
+        }],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens_details": {"reasoning_tokens": 0},
+        },
+    }
+
+
+class MockState:
+    """文件与批处理任务的内存存储"""
+
+    def __init__(self, batch_delay: float = 1.0, latency: float = 0.0, error_rate: float = 0.0,
+                 image_kb: int = DEFAULT_IMAGE_KB):
+        self.batch_delay = batch_delay
+        self.image = fake_png(image_kb * 1024)
+        self.image_b64 = base64.b64encode(self.image).decode("ascii")
+        self.latency = latency          # 每个响应前的额外延迟（秒），运行中可修改
+        self.error_rate = error_rate    # 直接返回 503 的请求比例，运行中可修改
+        self.requests = 0
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.contents: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def add_file(self, content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+        info = {
+            "id": _new_id("file"),
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self.lock:
+            self.files[info["id"]] = info
+            self.contents[info["id"]] = content
+        return info
+
+    def run_batch(self, batch_id: str):
+        """后台执行批处理任务：逐行生成结果，写入输出文件和错误文件"""
+        time.sleep(self.batch_delay / 2)
+        with self.lock:
+            batch = self.batches[batch_id]
+            if batch["status"] == "cancelling":
+                batch.update(status="cancelled", cancelled_at=int(time.time()))
+                return
+            batch.update(status="in_progress", in_progress_at=int(time.time()))
+            content = self.contents.get(batch["input_file_id"], b"")
+
+        outputs: List[str] = []
+        errors: List[str] = []
+        for line in content.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request.get("body") or {}
+            result = {"id": _new_id("batch_req"), "custom_id": request.get("custom_id")}
+            if FAIL_MARKER in _input_text(body):
+                result["response"] = {"status_code": 400, "request_id": _new_id("req"), "body": {
+                    "error": {"message": "mock failure", "type": "invalid_request_error"}}}
+                result["error"] = None
+                errors.append(json.dumps(result, ensure_ascii=False))
+            else:
+                result["response"] = {"status_code": 200, "request_id": _new_id("req"),
+                                      "body": responses_body(body)}
+                result["error"] = None
+                outputs.append(json.dumps(result, ensure_ascii=False))
+
+        time.sleep(self.batch_delay / 2)
+        with self.lock:
+            batch = self.batches[batch_id]
+            if batch["status"] == "cancelling":
+                batch.update(status="cancelled", cancelled_at=int(time.time()))
+                return
+        output_file = self.add_file(("\n".join(outputs) + "\n").encode("utf-8"), f"{batch_id}_output.jsonl",
+                                    "batch_output") if outputs else None
+        error_file = self.add_file(("\n".join(errors) + "\n").encode("utf-8"), f"{batch_id}_errors.jsonl",
+                                   "batch_output") if errors else None
+        with self.lock:
+            batch.update(
+                status="completed",
+                completed_at=int(time.time()),
+                output_file_id=output_file["id"] if output_file else None,
+                error_file_id=error_file["id"] if error_file else None,
+                request_counts={"total": len(outputs) + len(errors), "completed": len(outputs),
+                                "failed": len(errors)},
+            )
+
+
+Route = Tuple[str, "re.Pattern", Callable[..., Any]]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """按路由表分发请求，处理函数返回 (状态码, JSON 对象或字节)"""
+
+    protocol_version = "HTTP/1.1"
+    # keep-alive 连接上首部和响应体分两次写出，不关闭 Nagle 算法会遇到 40ms 的延迟确认
+    disable_nagle_algorithm = True
+    state: MockState = None
+    routes: List[Route] = []
+
+    def log_message(self, format, *args):
+        if getattr(self.server, "verbose", False):
+            super().log_message(format, *args)
+
+    def _dispatch(self, method: str):
+        path = urlparse(self.path).path
+        state = self.state
+        with state.lock:
+            state.requests += 1
+        if state.latency:
+            time.sleep(state.latency)
+        if state.error_rate and random.random() < state.error_rate:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            return self._send(503, {"error": {"message": "mock overloaded", "type": "server_error"}})
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                try:
+                    status, payload = handler(self, body, *match.groups())
+                except Exception as e:
+                    status, payload = 500, {"error": {"message": str(e), "type": "server_error"}}
+                return self._send(status, payload)
+        self._send(404, {"error": {"message": f"{method} {path} 不存在", "type": "invalid_request_error"}})
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        if isinstance(payload, bytes):
+            data, content_type = payload, "application/octet-stream"
+        elif isinstance(payload, EventStream):
+            events = [f"data: {json.dumps(event, ensure_ascii=False)}\n\n" for event in payload]
+            data, content_type = ("".join(events) + "data: [DONE]\n\n").encode("utf-8"), "text/event-stream"
+        else:
+            data, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def json_body(self, body: bytes) -> Dict[str, Any]:
+        return json.loads(body or b"{}")
+
+    def form_body(self, body: bytes) -> Dict[str, Tuple[Optional[str], bytes]]:
+        """
+        解析 multipart/form-data，返回 {字段名: (文件名, 内容)}
+
+        直接按分隔符切分请求体（email 解析器处理 MB 级文件要几十毫秒，会掩盖客户端开销）
+        """
+        match = re.search(r'boundary="?([^";]+)"?', self.headers.get("Content-Type", ""))
+        if match is None:
+            return {}
+        fields = {}
+        for part in body.split(b"--" + match.group(1).encode("latin-1"))[1:]:
+            if part.startswith(b"--"):
+                break
+            head, _, content = part[2:].partition(b"\r\n\r\n")
+            disposition = head.decode("utf-8", "replace")
+            name = re.search(r'\bname="([^"]*)"', disposition)
+            filename = re.search(r'\bfilename="([^"]*)"', disposition)
+            if name is not None:
+                fields[name.group(1)] = (filename.group(1) if filename else None,
+                                         content[:-2] if content.endswith(b"\r\n") else content)
+        return fields
+
+    def asset_url(self, extension: str = "png") -> str:
+        """图片/视频下载链接，指向本服务的 /v1/assets"""
+        return f"http://{self.headers.get('Host')}/v1/assets/{uuid.uuid4().hex[:16]}.{extension}"
+
+
+MOCK_MODELS = ["gpt-4.1", "gpt-4.1-mini", "gpt-image-1", "gemini-2.5-pro", "sora-2", "veo3", "flux-kontext-pro"]
+
+
+def list_models(handler: MockHandler, body: bytes):
+    return 200, {"object": "list", "data": [{"id": name, "object": "model", "created": 0, "owned_by": "mock"}
+                                            for name in MOCK_MODELS]}
+
+
+def upload_file(handler: MockHandler, body: bytes):
+    fields = handler.form_body(body)
+    if "file" not in fields:
+        return 400, {"error": {"message": "缺少 file 字段", "type": "invalid_request_error"}}
+    filename, content = fields["file"]
+    purpose = fields.get("purpose", (None, b"user_data"))[1].decode("utf-8")
+    return 200, handler.state.add_file(content, filename or "upload", purpose)
+
+
+def retrieve_file(handler: MockHandler, body: bytes, file_id: str):
+    info = handler.state.files.get(file_id)
+    if info is None:
+        return 404, {"error": {"message": f"文件 {file_id} 不存在", "type": "invalid_request_error"}}
+    return 200, info
+
+
+def file_content(handler: MockHandler, body: bytes, file_id: str):
+    content = handler.state.contents.get(file_id)
+    if content is None:
+        return 404, {"error": {"message": f"文件 {file_id} 不存在", "type": "invalid_request_error"}}
+    return 200, content
+
+
+def delete_file(handler: MockHandler, body: bytes, file_id: str):
+    with handler.state.lock:
+        existed = handler.state.files.pop(file_id, None) is not None
+        handler.state.contents.pop(file_id, None)
+    return (200 if existed else 404), {"id": file_id, "object": "file", "deleted": existed}
+
+
+def create_batch(handler: MockHandler, body: bytes):
+    params = handler.json_body(body)
+    if params.get("input_file_id") not in handler.state.files:
+        return 400, {"error": {"message": "input_file_id 不存在", "type": "invalid_request_error"}}
+    now = int(time.time())
+    batch = {
+        "id": _new_id("batch"),
+        "object": "batch",
+        "endpoint": params.get("endpoint", "/v1/responses"),
+        "input_file_id": params["input_file_id"],
+        "completion_window": params.get("completion_window", "24h"),
+        "status": "validating",
+        "created_at": now,
+        "expires_at": now + 24 * 3600,
+        "metadata": params.get("metadata"),
+        "output_file_id": None,
+        "error_file_id": None,
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+    }
+    with handler.state.lock:
+        handler.state.batches[batch["id"]] = batch
+    threading.Thread(target=handler.state.run_batch, args=(batch["id"],), daemon=True).start()
+    return 200, batch
+
+
+def retrieve_batch(handler: MockHandler, body: bytes, batch_id: str):
+    batch = handler.state.batches.get(batch_id)
+    if batch is None:
+        return 404, {"error": {"message": f"批处理任务 {batch_id} 不存在", "type": "invalid_request_error"}}
+    return 200, batch
+
+
+def list_batches(handler: MockHandler, body: bytes):
+    data = list(handler.state.batches.values())
+    return 200, {"object": "list", "data": data, "has_more": False,
+                 "first_id": data[0]["id"] if data else None, "last_id": data[-1]["id"] if data else None}
+
+
+def cancel_batch(handler: MockHandler, body: bytes, batch_id: str):
+    with handler.state.lock:
+        batch = handler.state.batches.get(batch_id)
+        if batch is None:
+            return 404, {"error": {"message": f"批处理任务 {batch_id} 不存在", "type": "invalid_request_error"}}
+        if batch["status"] in ("validating", "in_progress"):
+            batch.update(status="cancelling", cancelling_at=int(time.time()))
+    return 200, batch
+
+
+def _chat_text(params: Dict[str, Any]) -> str:
+    """取出最后一条用户消息中的文本部分"""
+    for message in reversed(params.get("messages") or []):
+        content = message.get("content")
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            return " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return ""
+
+
+def chat_completions(handler: MockHandler, body: bytes):
+    params = handler.json_body(body)
+    model = params.get("model", "mock")
+    text = _chat_text(params)
+    if model.startswith("veo"):
+        url = handler.asset_url("mp4")
+        content = (f"视频已生成：{text[:40]}\n\n[▶️ Watch Online]({url})\n\n"
+                   f"[⏬ Download Video]({url})")
+    elif "image" in model:
+        content = "\n\n".join(f"![image]({handler.asset_url()})" for _ in range(int(params.get("n", 1))))
+    else:
+        content = (f"mock analysis: {text[:80]} " * (ANALYSIS_CHARS // 100 + 1))[:ANALYSIS_CHARS]
+    completion_id = _new_id("chatcmpl")
+    prompt_tokens = max(1, len(body) // 4)
+    completion_tokens = max(1, len(content) // 4)
+    if params.get("stream"):
+        pieces = [content[i:i + 20] for i in range(0, len(content), 20)]
+        return 200, EventStream(
+            {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            for piece in pieces)
+    return 200, {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def _images_body(handler: MockHandler, n: int, response_format: str) -> Dict[str, Any]:
+    if response_format == "b64_json":
+        data = [{"b64_json": handler.state.image_b64} for _ in range(n)]
+    else:
+        data = [{"url": handler.asset_url()} for _ in range(n)]
+    return {"created": int(time.time()), "data": data}
+
+
+def image_generations(handler: MockHandler, body: bytes):
+    params = handler.json_body(body)
+    return 200, _images_body(handler, int(params.get("n") or 1), params.get("response_format") or "url")
+
+
+def image_edits(handler: MockHandler, body: bytes):
+    fields = handler.form_body(body)
+    if "image" not in fields and "image[]" not in fields:
+        return 400, {"error": {"message": "缺少 image 字段", "type": "invalid_request_error"}}
+    def value(name: str, default: str) -> str:
+        return fields[name][1].decode("utf-8") if name in fields else default
+
+    return 200, _images_body(handler, int(value("n", "1")), value("response_format", "url"))
+
+
+def create_response(handler: MockHandler, body: bytes):
+    return 200, responses_body(handler.json_body(body))
+
+
+def asset(handler: MockHandler, body: bytes, name: str):
+    return 200, handler.state.image
+
+
+ROUTES: List[Route] = [
+    ("GET", re.compile(r"^/v1/models$"), list_models),
+    ("POST", re.compile(r"^/v1/files$"), upload_file),
+    ("GET", re.compile(r"^/v1/files/([^/]+)$"), retrieve_file),
+    ("GET", re.compile(r"^/v1/files/([^/]+)/content$"), file_content),
+    ("DELETE", re.compile(r"^/v1/files/([^/]+)$"), delete_file),
+    ("POST", re.compile(r"^/v1/batches$"), create_batch),
+    ("GET", re.compile(r"^/v1/batches$"), list_batches),
+    ("GET", re.compile(r"^/v1/batches/([^/]+)$"), retrieve_batch),
+    ("POST", re.compile(r"^/v1/batches/([^/]+)/cancel$"), cancel_batch),
+    ("POST", re.compile(r"^/v1/chat/completions$"), chat_completions),
+    ("POST", re.compile(r"^/v1/images/generations$"), image_generations),
+    ("POST", re.compile(r"^/v1/images/edits$"), image_edits),
+    ("POST", re.compile(r"^/v1/responses$"), create_response),
+    ("GET", re.compile(r"^/v1/assets/([^/]+)$"), asset),
+]
+
+
+def start_server(host: str = "127.0.0.1", port: int = 0, batch_delay: float = 1.0, verbose: bool = False,
+                 latency: float = 0.0, error_rate: float = 0.0,
+                 image_kb: int = DEFAULT_IMAGE_KB) -> ThreadingHTTPServer:
+    """在后台线程中启动模拟服务，返回服务器对象（server.server_port 为实际端口，server.state 为内存状态）"""
+    state = MockState(batch_delay, latency, error_rate, image_kb)
+    handler = type("Handler", (MockHandler,), {"state": state, "routes": ROUTES})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 API 模拟服务（models / files / batches / chat / images / responses）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8080, help="监听端口")
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="每个批处理任务的模拟耗时（秒）")
+    parser.add_argument("--latency-ms", type=float, default=0, help="每个响应前的额外延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0, help="直接返回 503 的请求比例（0~1）")
+    parser.add_argument("--image-kb", type=int, default=DEFAULT_IMAGE_KB, help="图片类接口返回的图片大小（KB）")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求")
+    args = parser.parse_args()
+
+    server = start_server(args.host, args.port, args.batch_delay, args.verbose,
+                          args.latency_ms / 1000, args.error_rate, args.image_kb)
+    print(f"🧪 模拟服务已启动: {base_url(server)}（Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
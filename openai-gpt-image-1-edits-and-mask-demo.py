@@ -1,120 +1,372 @@
 import requests
+import csv
 import json
 import os
-import base64
 import argparse
-from dotenv import load_dotenv
+import hashlib
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Iterator, Optional
 
-# 加载环境变量
-load_dotenv()
+from apiyi_utils import postprocess
+from apiyi_utils.b64stream import STREAM_CHUNK_SIZE, B64JsonStreamDecoder
+from apiyi_utils.concurrency import bounded_map
+from apiyi_utils.http import get_session
+from apiyi_utils.multipart import MultipartEncoder, print_upload_progress
+from apiyi_utils.preflight import PreflightError, preflight_pair, preflight_pairs
+from apiyi_utils.tracing import span, traced
+
+url = "https://vip.apiyi.com/v1/images/edits"
+
+DEFAULT_PROMPT = "将图像中的背景替换为蓝色，保持主体不变"
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
 
 # 解析命令行参数
 def parse_arguments():
     parser = argparse.ArgumentParser(description='OpenAI 图像编辑 API 测试工具')
     parser.add_argument('--image', type=str, default="input_image.png", help='输入图像文件路径')
     parser.add_argument('--mask', type=str, default="mask_image.png", help='遮罩图像文件路径')
-    parser.add_argument('--prompt', type=str, default="将图像中的背景替换为蓝色，保持主体不变", 
+    parser.add_argument('--prompt', type=str, default=DEFAULT_PROMPT, 
                         help='编辑提示词')
     parser.add_argument('--size', type=str, default="1024x1024", 
                         choices=["1024x1024", "1536x1024", "1024x1536"], 
                         help='输出图像尺寸')
+    # 批量模式参数
+    parser.add_argument('--image-dir', type=str, help='批量模式：输入图像目录')
+    parser.add_argument('--mask-dir', type=str, help='批量模式：遮罩目录（按文件名与图像配对，默认在图像目录中查找 *_mask.*）')
+    parser.add_argument('--manifest', type=str, help='批量模式：清单文件（.jsonl 或 .csv，字段 image, mask, prompt, output）')
+    parser.add_argument('--output-dir', type=str, default="batch_output", help='批量模式：输出目录')
+    parser.add_argument('--concurrency', type=int, default=8, help='批量模式：同时进行的上传/编辑请求数上限')
+    parser.add_argument('--overwrite', action='store_true', help='批量模式：覆盖已存在的输出（默认跳过，便于中断后续跑）')
+    parser.add_argument('--skip-preflight', action='store_true', help='跳过本地预检（尺寸/模式/大小检查与 RGBA PNG 转换）')
+    parser.add_argument('--dedup', action='store_true', help='批量模式：按感知哈希合并近似重复的图像，每组只编辑一次并复制结果')
+    parser.add_argument('--dedup-threshold', type=int, default=6, help='去重：64 位哈希的汉明距离阈值')
+    parser.add_argument('--postprocess', action='store_true', help='为保存的图像生成缩略图和元数据（也可设置 APIYI_POSTPROCESS=1）')
     return parser.parse_args()
 
-# 设置API密钥和URL
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("未找到 OPENAI_API_KEY 环境变量，请在 .env 文件中设置")
+def get_api_key():
+    """从环境变量（或 .env 文件）读取 API Key；环境变量已设置时不读取 .env"""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        from dotenv import load_dotenv
 
-url = "https://vip.apiyi.com/v1/images/edits"
+        load_dotenv()
+        api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("未找到 OPENAI_API_KEY 环境变量，请在 .env 文件中设置")
+    return api_key
 
-# 设置请求头
-headers = {
-    "Authorization": f"Bearer {api_key}"
-}
-
-# 获取命令行参数
-args = parse_arguments()
-image_path = args.image
-mask_path = args.mask
-prompt = args.prompt
-size = args.size
-
-# 准备请求数据
-data = {
-    'model': 'gpt-image-1',
-    'prompt': prompt,
-    'n': '1',
-    'size': size,
-    'response_format': 'b64_json'
-}
-
-print(f"正在调用API进行图像编辑: {prompt}...")
-
-# 调试信息
-print(f"请求URL: {url}")
-print(f"使用模型: {data['model']}")
-print(f"图像路径: {image_path}, 遮罩路径: {mask_path}")
+def build_edit_data(prompt: str, size: str = "1024x1024") -> Dict[str, str]:
+    """构建图像编辑请求的表单字段"""
+    return {
+        'model': 'gpt-image-1',
+        'prompt': prompt,
+        'n': '1',
+        'size': size,
+        'response_format': 'b64_json'
+    }
+
+@traced("gpt_image.edit")
+def edit_image(image_path: str, mask_path: Optional[str] = None, prompt: str = DEFAULT_PROMPT,
+               size: str = "1024x1024", api_key: Optional[str] = None, output_path: Optional[str] = None,
+               session: Optional[requests.Session] = None, timeout: int = 300, verbose: bool = True) -> Dict[str, Any]:
+    """
+    调用 gpt-image-1 编辑单张图像（可被其他脚本导入复用）
+
+    Args:
+        image_path: 输入图像路径
+        mask_path: 遮罩路径，为 None 时不上传遮罩
+        api_key: API Key，为 None 时从环境变量读取
+        output_path: 输出路径，默认为 output_{输入文件名}
+        session: 复用连接的 Session，为 None 时使用进程内共享的 Session
+        verbose: 是否打印响应详情
+
+    Returns:
+        {"success": bool, "output_path": str, "status_code": int, "error": str}
+
+    Raises:
+        FileNotFoundError: 输入文件不存在
+        requests.exceptions.RequestException: 网络请求失败
+    """
+    # 检查文件是否存在
+    if not os.path.exists(image_path):
+        raise FileNotFoundError(f"输入图像文件不存在: {image_path}")
+    if mask_path and not os.path.exists(mask_path):
+        raise FileNotFoundError(f"遮罩图像文件不存在: {mask_path}")
+
+    headers = {
+        "Authorization": f"Bearer {api_key or get_api_key()}"
+    }
+    data = build_edit_data(prompt, size)
+    if output_path is None:
+        output_path = f"output_{os.path.basename(image_path)}"
+    http = session or get_session()
+
+    # 流式构建 multipart 请求体：图像和遮罩按块从内存映射文件读取，不整体读入内存
+    files = {
+        'image': ('image.png', image_path, 'image/png')
+    }
+    if mask_path:
+        files['mask'] = ('mask.png', mask_path, 'image/png')
+    encoder = MultipartEncoder(fields=data, files=files, progress=print_upload_progress if verbose else None)
+    headers["Content-Type"] = encoder.content_type
+
+    with encoder:
+        # 发送请求（stream=True：响应体边接收边解码，不在内存中保留完整 JSON）
+        response = http.post(url, headers=headers, data=encoder, timeout=timeout, stream=True)  # 超时时间默认为5分钟
+
+    # 流式解析响应：b64_json 分块解码直接写入输出文件，其余字段保留为小体积 JSON 骨架
+    stem, ext = os.path.splitext(output_path)
+    decoder = B64JsonStreamDecoder(lambda index: output_path if index == 0 else f"{stem}_{index}{ext}")
+    # 下载和解码交替进行，decode_ms 单独统计解码（本地）耗时，其余为网络耗时
+    with span("gpt_image.download_decode") as current:
+        decode_seconds = 0.0
+        try:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                started = time.perf_counter()
+                decoder.feed(chunk)
+                decode_seconds += time.perf_counter() - started
+            decoder.close()
+        except BaseException:
+            decoder.abort()  # 连接中断、超时或 base64 数据有误：不留下 .part 临时文件
+            raise
+        finally:
+            response.close()
+        current.set_attribute("decode_ms", round(decode_seconds * 1000, 3))
 
-def main():
     try:
-        # 检查文件是否存在
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"输入图像文件不存在: {image_path}")
-        if not os.path.exists(mask_path):
-            raise FileNotFoundError(f"遮罩图像文件不存在: {mask_path}")
-            
-        # 打开图像文件
-        with open(image_path, 'rb') as image_file_handle, open(mask_path, 'rb') as mask_file_handle:
-            files = {
-                'image': ('image.png', image_file_handle, 'image/png'),
-                'mask': ('mask.png', mask_file_handle, 'image/png')
+        response_data = decoder.skeleton_json()
+    except ValueError as e:
+        print(f"API响应不是有效的JSON格式: {decoder.preview(1000)}")
+        print(f"JSON解析错误: {str(e)}")
+        raise Exception(f"API响应格式错误: {decoder.preview(200)}")
+
+    if verbose:
+        print("API响应状态码:", response.status_code)
+        print("API响应:", decoder.preview(500))
+
+    # 处理成功响应（图像已在解析过程中写入 output_path）
+    if response.status_code == 200 and 'data' in response_data and decoder.paths:
+        for path in decoder.paths:
+            postprocess.submit_image(path)  # 后台生成缩略图和元数据
+        return {"success": True, "output_path": output_path, "status_code": response.status_code}
+
+    error = response_data.get('error', {}).get('message', '未知错误') if isinstance(response_data, dict) else '未知错误'
+    return {"success": False, "output_path": None, "status_code": response.status_code, "error": error}
+
+def _find_mask(image_path: str, mask_dir: Optional[str]) -> Optional[str]:
+    """按文件名查找与图像配对的遮罩：mask_dir/同名文件，或图像目录下的 *_mask.*"""
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    if mask_dir:
+        candidates = [os.path.join(mask_dir, stem + ext) for ext in IMAGE_EXTENSIONS]
+    else:
+        image_dir = os.path.dirname(image_path)
+        candidates = [os.path.join(image_dir, f"{stem}_mask{ext}") for ext in IMAGE_EXTENSIONS]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+def iter_pairs_from_dirs(image_dir: str, mask_dir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """遍历图像目录，按文件名配对遮罩"""
+    for name in sorted(os.listdir(image_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTENSIONS:
+            continue
+        # 与图像放在同一目录下的遮罩文件本身不作为输入
+        if not mask_dir and stem.endswith('_mask'):
+            continue
+        image_path = os.path.join(image_dir, name)
+        yield {"image": image_path, "mask": _find_mask(image_path, mask_dir)}
+
+def iter_pairs_from_manifest(manifest_path: str) -> Iterator[Dict[str, Any]]:
+    """读取清单文件，支持 .jsonl（每行一个对象）和 .csv（带表头），相对路径以清单所在目录为基准"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    def resolve(path):
+        return os.path.join(base_dir, path) if path and not os.path.isabs(path) else path
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        if manifest_path.lower().endswith('.csv'):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            yield {
+                "image": resolve(row["image"]),
+                "mask": resolve(row.get("mask") or None),
+                "prompt": row.get("prompt") or None,
+                "output": resolve(row.get("output") or None),
             }
-            
-            # 发送请求
-            response = requests.post(url, headers=headers, files=files, data=data, timeout=300)  # 超时时间设置为5分钟
-            
-            # 解析响应
+
+def _file_digest(path: Optional[str], digests: Dict[str, str]) -> Optional[str]:
+    """文件内容的 SHA256（同一路径只计算一次）"""
+    if not path:
+        return None
+    if path not in digests:
+        with open(path, "rb") as f:
+            digests[path] = hashlib.sha256(f.read()).hexdigest()
+    return digests[path]
+
+def run_batch(pairs, api_key: str, prompt: str, size: str, output_dir: str,
+              concurrency: int = 8, overwrite: bool = False, preflight: bool = True,
+              dedup_threshold: Optional[int] = None) -> Dict[str, int]:
+    """
+    批量编辑：多个请求并发执行，共用一个连接池 Session
+
+    同时进行的上传/编辑请求数不超过 concurrency，输入按需读取，
+    已存在的输出默认跳过，中断后重新运行即可继续。
+    preflight=True 时先在本地预检，需要转换的图像/遮罩在进程池中批量转换后再上传。
+    dedup_threshold 不为 None 时先按感知哈希把遮罩和提示词相同的近似重复图像分组，
+    每组只编辑代表图像，成功后把结果复制给组内其他图像。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    session = get_session(pool_size=concurrency)
+    stats = {"success": 0, "failed": 0, "skipped": 0, "duplicates": 0}
+
+    def pending_pairs():
+        for pair in pairs:
+            pair["output"] = pair.get("output") or os.path.join(output_dir, f"output_{os.path.basename(pair['image'])}")
+            if not overwrite and os.path.exists(pair["output"]):
+                stats["skipped"] += 1
+                continue
+            pair["source"] = pair["image"]
+            yield pair
+
+    def process(pair):
+        if pair.get("error"):
+            raise PreflightError(pair["error"])
+        return edit_image(pair["image"], pair.get("mask"), pair.get("prompt") or prompt, size,
+                          api_key=api_key, output_path=pair["output"], session=session, verbose=False)
+
+    duplicates = {}
+    queue = pending_pairs()
+    if dedup_threshold is not None:
+        from apiyi_utils.dedup import group_duplicates
+
+        pending = list(queue)
+        digests: Dict[str, str] = {}
+        keys = []
+        for pair in pending:
             try:
-                response_data = response.json()
-                print("API响应状态码:", response.status_code)
-                print("API响应:", json.dumps(response_data, ensure_ascii=False)[:500] + "..." if len(json.dumps(response_data, ensure_ascii=False)) > 500 else json.dumps(response_data, ensure_ascii=False))
-                
-                # 处理成功响应
-                if response.status_code == 200 and 'data' in response_data:
-                    # 从响应中获取base64编码的图像
-                    b64_image = response_data['data'][0]['b64_json']
-                    
-                    # 保存生成的图像
-                    output_path = f"output_{os.path.basename(image_path)}"
-                    with open(output_path, "wb") as f:
-                        f.write(base64.b64decode(b64_image))
-                    print(f"✅ 生成的图像已保存到: {output_path}")
-                else:
-                    print(f"⚠️ API返回了错误: {response_data.get('error', {}).get('message', '未知错误')}")
-                    
-            except ValueError as e:
-                print(f"API响应不是有效的JSON格式: {response.text[:1000]}")
-                print(f"JSON解析错误: {str(e)}")
-                raise Exception(f"API响应格式错误: {response.text[:200]}")
-    
-    except FileNotFoundError as e:
+                mask_digest = _file_digest(pair.get("mask"), digests)
+            except OSError:
+                mask_digest = pair.get("mask")  # 遮罩读取失败：交给预检报错，不参与合并
+            keys.append((mask_digest, pair.get("prompt") or prompt))
+        representatives = group_duplicates([pair["image"] for pair in pending], dedup_threshold, keys=keys)
+        for position, representative in enumerate(representatives):
+            if representative != position:
+                duplicates.setdefault(id(pending[representative]), []).append(pending[position])
+        queue = [pair for position, pair in enumerate(pending) if representatives[position] == position]
+        print(f"🧬 近似重复去重：{len(pending)} 张图像分为 {len(queue)} 组，减少 {len(pending) - len(queue)} 次编辑请求")
+
+    if preflight:
+        queue = preflight_pairs(queue, os.path.join(output_dir, ".preflight"))
+    for pair, result, error in bounded_map(process, queue, max_workers=concurrency):
+        if error is None and result["success"]:
+            stats["success"] += 1
+            print(f"✅ {pair['source']} -> {result['output_path']}")
+            for duplicate in duplicates.get(id(pair), ()):
+                shutil.copyfile(result["output_path"], duplicate["output"])
+                postprocess.submit_image(duplicate["output"])
+                stats["success"] += 1
+                stats["duplicates"] += 1
+                print(f"✅ {duplicate['source']} -> {duplicate['output']}（复用 {pair['source']} 的结果）")
+        else:
+            group = [pair] + duplicates.get(id(pair), [])
+            stats["failed"] += len(group)
+            for failed in group:
+                print(f"❌ {failed['source']}: {error or result.get('error')}")
+    return stats
+
+def main():
+    # 获取命令行参数
+    args = parse_arguments()
+    if args.postprocess:
+        postprocess.enable()
+
+    try:
+        api_key = get_api_key()
+
+        # 批量模式
+        if args.image_dir or args.manifest:
+            if args.manifest:
+                pairs = iter_pairs_from_manifest(args.manifest)
+            else:
+                pairs = iter_pairs_from_dirs(args.image_dir, args.mask_dir)
+            print(f"正在批量编辑图像，并发数: {args.concurrency}，输出目录: {args.output_dir}")
+            stats = run_batch(pairs, api_key, args.prompt, args.size, args.output_dir,
+                              concurrency=args.concurrency, overwrite=args.overwrite,
+                              preflight=not args.skip_preflight,
+                              dedup_threshold=args.dedup_threshold if args.dedup else None)
+            print(f"📊 批量编辑完成: 成功 {stats['success']}，失败 {stats['failed']}，跳过 {stats['skipped']}")
+            if stats["duplicates"]:
+                print(f"🧬 {stats['duplicates']} 张近似重复图像复用了代表图像的编辑结果")
+            return
+
+        image_path = args.image
+        mask_path = args.mask
+
+        print(f"正在调用API进行图像编辑: {args.prompt}...")
+
+        # 调试信息
+        print(f"请求URL: {url}")
+        print(f"使用模型: gpt-image-1")
+        print(f"图像路径: {image_path}, 遮罩路径: {mask_path}")
+
+        # 本地预检：尺寸、模式、文件大小不符合要求时先转换为 RGBA PNG，避免上传后才被拒绝
+        output_path = f"output_{os.path.basename(image_path)}"
+        if not args.skip_preflight:
+            checked = preflight_pair(image_path, mask_path, os.path.join(tempfile.gettempdir(), "gpt_image_preflight"))
+            image_path, mask_path = checked["image"], checked["mask"]
+
+        result = edit_image(image_path, mask_path, args.prompt, args.size, api_key=api_key, output_path=output_path)
+        if result["success"]:
+            print(f"✅ 生成的图像已保存到: {result['output_path']}")
+        else:
+            print(f"⚠️ API返回了错误: {result['error']}")
+
+    except (FileNotFoundError, PreflightError) as e:
         print(f"❌ 错误: {str(e)}")
     except requests.exceptions.RequestException as e:
         print(f"❌ API请求错误: {str(e)}")
     except Exception as e:
         print(f"❌ 发生未知错误: {str(e)}")
+    finally:
+        postprocess.shutdown()
 
 if __name__ == "__main__":
     main()
     
 """
 使用说明:
-1. 确保已安装所需的依赖库: pip install requests python-dotenv
+1. 确保已安装所需的依赖库: pip install requests python-dotenv pillow
 2. 在同目录下创建 .env 文件，并设置 OPENAI_API_KEY=your_api_key_here
 3. 准备一个输入图像和一个遮罩图像(遮罩中白色区域表示要编辑的部分)
 4. 运行命令示例:
    python test.py --image input.png --mask mask.png --prompt "将背景改为海滩场景" --size 1024x1024
    
+5. 批量模式示例（按文件名配对，并发上传，共用连接池）:
+   python openai-gpt-image-1-edits-and-mask-demo.py --image-dir shots/ --mask-dir masks/ --concurrency 8
+   python openai-gpt-image-1-edits-and-mask-demo.py --manifest pairs.jsonl --output-dir edited/
+   清单每行格式: {"image": "a.png", "mask": "a_mask.png", "prompt": "可选，覆盖 --prompt"}
+6. 在其他脚本中复用编辑函数:
+   import importlib.util
+   spec = importlib.util.spec_from_file_location("gpt_image_edit", "openai-gpt-image-1-edits-and-mask-demo.py")
+   module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)
+   module.edit_image("input.png", "mask.png", "将背景改为海滩场景", api_key="sk-...")
+
+预检说明:
+- 上传前只读取文件头检查图像/遮罩的格式、尺寸和大小，不符合要求时在本地自动转换为尺寸一致的 RGBA PNG
+- 批量模式下转换在进程池中并行执行，转换结果保存在 输出目录/.preflight
+- 使用 --skip-preflight 可跳过预检
+
+去重说明（需要 pip install numpy）:
+- 批量模式加上 --dedup 后，先按感知哈希（dHash）把遮罩和提示词相同的近似重复图像
+  （缩放副本、重新压缩的 JPEG、连拍）分组，每组只编辑一次，结果复制给组内其他图像
+- --dedup-threshold 控制 64 位哈希的汉明距离阈值（默认 6，越小越严格）
+
 遮罩说明:
 - 遮罩中白色区域(RGB值接近255,255,255)表示要编辑的区域
 - 遮罩中原有区域(RGB值接近0,0,0)表示要保留原图的区域
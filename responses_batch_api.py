@@ -0,0 +1,395 @@
+"""
+Batch API 离线批量结构化抽取
+
+对不着急的回填任务，逐条调用 responses.parse 是最慢也最贵的方式。本脚本走 Batch API：
+
+1. 把输入记录转换为 Batch API 的 JSONL 请求（url 为 /v1/responses，text.format 为目标
+   Pydantic 模型的 JSON schema，与 responses.parse 发送的完全一致）
+2. 按批处理限制切分为多个分片文件（每个分片最多 50,000 条请求、约 190MB）
+3. 上传分片（purpose="batch"）并创建批处理任务，completion_window 为 24h
+4. 轮询任务状态，完成后下载输出文件和错误文件
+5. 按 custom_id 把结果映射回记录，用 Pydantic 校验后写入与 responses_extraction.py 相同格式的输出
+
+任务状态保存在工作目录的 batch_state.json 中：中途退出后用相同命令重新运行，
+已提交的任务会继续轮询而不会重复提交。
+
+用法:
+    python responses_batch_api.py --input messages.jsonl --output events.jsonl --work-dir batch_work
+    python responses_batch_api.py --work-dir batch_work --cancel
+
+本地测试（不消耗额度）:
+    python mock_server.py --port 8080
+    python responses_batch_api.py --input messages.jsonl --base-url http://127.0.0.1:8080/v1 --poll-interval 1
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Type
+
+from pydantic import BaseModel, ValidationError
+
+from responses_extraction import (
+    BASE_URL,
+    DEFAULT_INSTRUCTIONS,
+    DEFAULT_MODEL,
+    DEFAULT_SCHEMA,
+    iter_records,
+    load_done_ids,
+    load_schema,
+    usage_cost,
+)
+
+# Batch API 单个输入文件的限制：最多 50,000 条请求、200MB，留出余量
+MAX_REQUESTS_PER_BATCH = 50000
+MAX_BATCH_FILE_BYTES = 190 * 1024 * 1024
+BATCH_ENDPOINT = "/v1/responses"
+COMPLETION_WINDOW = "24h"
+STATE_FILE = "batch_state.json"
+
+TERMINAL_STATUS = {"completed", "failed", "expired", "cancelled"}
+
+# Batch API 按同步价格的 50% 计费
+BATCH_DISCOUNT = 0.5
+
+
+def schema_format(schema: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    目标模型对应的 text.format 参数
+
+    strict schema 由 SDK 公开的 pydantic_function_tool 生成，与 responses.parse 内部使用同一个
+    转换（to_strict_json_schema），得到的 text.format 与 responses.parse 发送的一致。
+    """
+    from openai import pydantic_function_tool
+
+    strict_schema = pydantic_function_tool(schema)["function"]["parameters"]
+    return {"type": "json_schema", "name": schema.__name__, "schema": strict_schema, "strict": True}
+
+
+def build_request(record: Dict[str, Any], text_format: Dict[str, Any], model: str,
+                  instructions: str) -> Dict[str, Any]:
+    """一条记录对应的 Batch API 请求行；custom_id 为 JSON 编码的记录 ID，保留原始类型"""
+    return {
+        "custom_id": json.dumps(record["id"], ensure_ascii=False),
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": model,
+            "input": [
+                {"role": "system", "content": instructions},
+                {"role": "user", "content": record["text"]},
+            ],
+            "text": {"format": text_format},
+        },
+    }
+
+
+def write_chunks(records: Iterable[Dict[str, Any]], work_dir: str, text_format: Dict[str, Any], model: str,
+                 instructions: str, skip_ids: Optional[Set[Any]] = None,
+                 max_requests: int = MAX_REQUESTS_PER_BATCH,
+                 max_bytes: int = MAX_BATCH_FILE_BYTES) -> Dict[str, Any]:
+    """
+    把记录写成 Batch API 输入分片，返回 {"chunks": [...], "skipped": n, "duplicates": n, "empty": n}
+
+    每个分片同时满足请求条数和文件大小限制；已完成、重复 ID 和空文本的记录不会写入。
+    """
+    skip_ids = skip_ids or set()
+    seen: Set[str] = set()
+    chunks: List[Dict[str, Any]] = []
+    counts = {"skipped": 0, "duplicates": 0, "empty": 0}
+    handle = None
+    size = 0
+
+    try:
+        for record in records:
+            if record["id"] in skip_ids:
+                counts["skipped"] += 1
+                continue
+            if not record.get("text"):
+                counts["empty"] += 1
+                continue
+            line = (json.dumps(build_request(record, text_format, model, instructions), ensure_ascii=False)
+                    + "\n").encode("utf-8")
+            custom_id = json.dumps(record["id"], ensure_ascii=False)
+            if custom_id in seen:
+                counts["duplicates"] += 1
+                continue
+            seen.add(custom_id)
+
+            if handle is None or chunks[-1]["requests"] >= max_requests or size + len(line) > max_bytes:
+                if handle is not None:
+                    handle.close()
+                path = os.path.join(work_dir, f"chunk_{len(chunks):04d}.jsonl")
+                handle = open(path, "wb")
+                chunks.append({"file": path, "requests": 0, "input_file_id": None, "batch_id": None,
+                               "status": "pending", "collected": False})
+                size = 0
+            handle.write(line)
+            size += len(line)
+            chunks[-1]["requests"] += 1
+    finally:
+        if handle is not None:
+            handle.close()
+    return {"chunks": chunks, **counts}
+
+
+def load_state(work_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(work_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(work_dir: str, state: Dict[str, Any]):
+    """先写临时文件再替换，避免中断时留下半个状态文件"""
+    path = os.path.join(work_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def submit_chunk(client, chunk: Dict[str, Any], metadata: Optional[Dict[str, str]] = None):
+    """上传分片并创建批处理任务（已上传/已创建的步骤不会重复执行）"""
+    if not chunk["input_file_id"]:
+        with open(chunk["file"], "rb") as f:
+            chunk["input_file_id"] = client.files.create(file=f, purpose="batch").id
+    if not chunk["batch_id"]:
+        batch = client.batches.create(input_file_id=chunk["input_file_id"], endpoint=BATCH_ENDPOINT,
+                                      completion_window=COMPLETION_WINDOW, metadata=metadata)
+        chunk["batch_id"] = batch.id
+        chunk["status"] = batch.status
+
+
+def download_file(client, file_id: str, path: str):
+    """流式下载文件内容到本地，不在内存中保留整个文件"""
+    with client.files.with_streaming_response.content(file_id) as response:
+        response.stream_to_file(path)
+
+
+def _output_text(body: Dict[str, Any]) -> Optional[str]:
+    for item in body.get("output") or []:
+        if item.get("type") != "message":
+            continue
+        for part in item.get("content") or []:
+            if part.get("type") == "output_text":
+                return part.get("text")
+            if part.get("type") == "refusal":
+                raise ValueError(f"模型拒绝回答: {part.get('refusal')}")
+    return None
+
+
+def parse_result_line(line: Dict[str, Any], schema: Type[BaseModel]):
+    """
+    解析输出/错误文件中的一行，返回 (解析后的对象, 用量, None) 或 (None, 用量, (错误信息, 错误类型))
+    """
+    if line.get("error"):
+        error = line["error"]
+        return None, None, (error.get("message", str(error)), error.get("code") or "BatchError")
+    response = line.get("response") or {}
+    body = response.get("body") or {}
+    usage = body.get("usage")
+    if response.get("status_code") != 200:
+        error = body.get("error") or {}
+        return None, usage, (error.get("message", f"HTTP {response.get('status_code')}"),
+                             error.get("type") or f"HTTP{response.get('status_code')}")
+    try:
+        text = _output_text(body)
+    except ValueError as e:
+        return None, usage, (str(e), "Refusal")
+    if not text:
+        return None, usage, ("响应中没有 output_text", "EmptyOutput")
+    try:
+        return schema.model_validate_json(text), usage, None
+    except ValidationError as e:
+        return None, usage, (str(e), "ValidationError")
+
+
+def _chunk_inputs(path: str) -> Dict[str, str]:
+    """读取分片文件，返回 {custom_id: 输入文本}，用于写失败记录"""
+    inputs = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            request = json.loads(line)
+            inputs[request["custom_id"]] = request["body"]["input"][-1]["content"]
+    return inputs
+
+
+def collect_chunk(client, chunk: Dict[str, Any], schema: Type[BaseModel], model: str, out, failed,
+                  stats: Dict[str, Any]):
+    """下载已结束任务的输出和错误文件，把结果按 custom_id 写回；没有结果的记录计为失败"""
+    batch = client.batches.retrieve(chunk["batch_id"])
+    inputs = _chunk_inputs(chunk["file"])
+    base = chunk["file"][:-len(".jsonl")]
+
+    for file_id, suffix in ((batch.output_file_id, "output"), (batch.error_file_id, "errors")):
+        if not file_id:
+            continue
+        path = f"{base}.{suffix}.jsonl"
+        download_file(client, file_id, path)
+        with open(path, "r", encoding="utf-8") as f:
+            for raw in f:
+                if not raw.strip():
+                    continue
+                line = json.loads(raw)
+                custom_id = line.get("custom_id")
+                text = inputs.pop(custom_id, None)
+                if text is None:
+                    continue  # 重复或未知的结果行
+                parsed, usage, error = parse_result_line(line, schema)
+                if usage:
+                    cost = usage_cost(model, usage)
+                    if cost is not None:
+                        stats["cost_usd"] += cost * BATCH_DISCOUNT
+                if error is None:
+                    out.write(json.dumps({"id": json.loads(custom_id), "result": parsed.model_dump(mode="json")},
+                                         ensure_ascii=False) + "\n")
+                    stats["success"] += 1
+                else:
+                    message, error_type = error
+                    failed.write(json.dumps({"id": json.loads(custom_id), "input": text, "error": message,
+                                             "error_type": error_type, "attempts": 1}, ensure_ascii=False) + "\n")
+                    stats["failed"] += 1
+
+    # 任务过期、失败或取消时，没有返回结果的记录也写入失败文件，重新运行时会再次提交
+    for custom_id, text in inputs.items():
+        failed.write(json.dumps({"id": json.loads(custom_id), "input": text,
+                                 "error": f"批处理任务 {batch.status}，没有返回结果",
+                                 "error_type": f"Batch{batch.status.capitalize()}", "attempts": 1},
+                                ensure_ascii=False) + "\n")
+        stats["failed"] += 1
+    out.flush()
+    failed.flush()
+    chunk["collected"] = True
+
+
+def poll_until_done(client, state: Dict[str, Any], work_dir: str, poll_interval: float = 10.0,
+                    max_interval: float = 120.0):
+    """轮询所有未结束的任务，间隔从 poll_interval 逐步放大到 max_interval"""
+    interval = poll_interval
+    while True:
+        pending = [c for c in state["chunks"] if c["status"] not in TERMINAL_STATUS]
+        if not pending:
+            return
+        changed = False
+        for chunk in pending:
+            batch = client.batches.retrieve(chunk["batch_id"])
+            counts = batch.request_counts
+            progress = f"{counts.completed + counts.failed}/{counts.total}" if counts else "-"
+            if batch.status != chunk["status"]:
+                changed = True
+                print(f"⏳ {chunk['batch_id']}: {chunk['status']} -> {batch.status}（{progress}）")
+            chunk["status"] = batch.status
+        save_state(work_dir, state)
+        if any(c["status"] not in TERMINAL_STATUS for c in state["chunks"]):
+            interval = poll_interval if changed else min(interval * 1.5, max_interval)
+            time.sleep(interval)
+
+
+def run_batch(args) -> Dict[str, Any]:
+    from openai import OpenAI
+
+    schema = load_schema(args.schema)
+    client = OpenAI(base_url=args.base_url, api_key=args.api_key, max_retries=5)
+    os.makedirs(args.work_dir, exist_ok=True)
+    stats = {"success": 0, "failed": 0, "skipped": 0, "requests": 0, "batches": 0, "cost_usd": 0.0}
+
+    state = load_state(args.work_dir)
+    if state is not None and all(c["collected"] for c in state["chunks"]):
+        print(f"ℹ️ 工作目录 {args.work_dir} 中的上一轮任务已全部完成，开始新一轮")
+        state = None
+    if state is None:
+        skip_ids = None if args.no_resume else load_done_ids(args.output)
+        records = iter_records(args.input, args.text_field, args.id_field)
+        state = write_chunks(records, args.work_dir, schema_format(schema), args.model, args.instructions,
+                             skip_ids, args.max_requests, int(args.max_file_mb * 1024 * 1024))
+        state.update(input=args.input, model=args.model, schema=args.schema)
+        save_state(args.work_dir, state)
+        print(f"📦 已生成 {len(state['chunks'])} 个分片，共 {sum(c['requests'] for c in state['chunks'])} 条请求"
+              f"（跳过已完成 {state['skipped']}，重复 ID {state['duplicates']}，空文本 {state['empty']}）")
+    else:
+        print(f"♻️ 继续工作目录 {args.work_dir} 中的 {len(state['chunks'])} 个分片")
+
+    stats["skipped"] = state["skipped"]
+    stats["requests"] = sum(c["requests"] for c in state["chunks"])
+    stats["batches"] = len(state["chunks"])
+
+    for chunk in state["chunks"]:
+        if not chunk["batch_id"]:
+            submit_chunk(client, chunk, metadata={"source": os.path.basename(args.input or "")})
+            save_state(args.work_dir, state)
+            print(f"🚀 已提交 {os.path.basename(chunk['file'])}: {chunk['batch_id']}（{chunk['requests']} 条）")
+
+    poll_until_done(client, state, args.work_dir, args.poll_interval, args.max_poll_interval)
+
+    with open(args.output, "a", encoding="utf-8") as out, open(args.failures, "a", encoding="utf-8") as failed:
+        for chunk in state["chunks"]:
+            if not chunk["collected"]:
+                collect_chunk(client, chunk, schema, state["model"], out, failed, stats)
+                save_state(args.work_dir, state)
+    return stats
+
+
+def cancel_batches(args):
+    from openai import OpenAI
+
+    state = load_state(args.work_dir)
+    if state is None:
+        print(f"❌ {args.work_dir} 中没有批处理状态文件")
+        return
+    client = OpenAI(base_url=args.base_url, api_key=args.api_key)
+    for chunk in state["chunks"]:
+        if chunk["batch_id"] and chunk["status"] not in TERMINAL_STATUS:
+            chunk["status"] = client.batches.cancel(chunk["batch_id"]).status
+            print(f"🛑 {chunk['batch_id']}: {chunk['status']}")
+    save_state(args.work_dir, state)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Batch API 离线批量结构化抽取")
+    parser.add_argument("--input", help="输入 JSONL/文本文件")
+    parser.add_argument("--output", default="batch_extracted.jsonl", help="成功结果输出文件")
+    parser.add_argument("--failures", default="batch_failures.jsonl", help="失败记录输出文件")
+    parser.add_argument("--work-dir", default="batch_work", help="分片文件和任务状态目录")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="目标 Pydantic 模型（模块:类名）")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="模型名称")
+    parser.add_argument("--instructions", default=DEFAULT_INSTRUCTIONS, help="系统提示词")
+    parser.add_argument("--text-field", default="text", help="JSONL 中的文本字段")
+    parser.add_argument("--id-field", default="id", help="JSONL 中的 ID 字段")
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS_PER_BATCH, help="每个分片的最大请求数")
+    parser.add_argument("--max-file-mb", type=float, default=MAX_BATCH_FILE_BYTES / 1024 / 1024,
+                        help="每个分片文件的最大大小（MB）")
+    parser.add_argument("--poll-interval", type=float, default=10.0, help="初始轮询间隔（秒）")
+    parser.add_argument("--max-poll-interval", type=float, default=120.0, help="最大轮询间隔（秒）")
+    parser.add_argument("--cancel", action="store_true", help="取消工作目录中未结束的批处理任务")
+    parser.add_argument("--no-resume", action="store_true", help="不跳过输出文件中已完成的记录")
+    parser.add_argument("--base-url", default=BASE_URL, help="API 地址")
+    parser.add_argument("--api-key", default=os.getenv("APIYI_API_KEY", "sk-"), help="API Key（默认读取 APIYI_API_KEY 环境变量）")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.cancel:
+        cancel_batches(args)
+        return
+    state = load_state(args.work_dir)
+    if not args.input and (state is None or all(c["collected"] for c in state["chunks"])):
+        print("❌ 请通过 --input 指定输入文件")
+        return
+
+    print("=== Batch API 离线批量结构化抽取 ===")
+    start = time.time()
+    stats = run_batch(args)
+    print(f"\n📊 批处理完成: {stats['batches']} 个任务，{stats['requests']} 条请求，成功 {stats['success']}，"
+          f"失败 {stats['failed']}，跳过 {stats['skipped']}，用时 {time.time() - start:.1f} 秒")
+    if stats["cost_usd"]:
+        print(f"💰 估算费用 ${stats['cost_usd']:.4f}（已按 Batch API 五折计算）")
+    print(f"✅ 结果: {args.output}")
+    if stats["failed"]:
+        print(f"❌ 失败记录: {args.failures}（修正后重新运行即可再次提交）")
+
+
+if __name__ == "__main__":
+    main()
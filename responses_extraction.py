@@ -0,0 +1,689 @@
+"""
+基于 client.responses.parse 的并发结构化抽取引擎
+
+responses_api_demo.py 演示了用一次阻塞的 client.responses.parse 调用抽取一个 CalendarEvent。
+对数百万条消息逐条阻塞调用太慢，本模块使用 AsyncOpenAI：
+
+- 按行流式读取 JSONL 输入，不会把全部输入读入内存
+- 同时保持最多 concurrency 个 responses.parse 请求在途，完成一个补充一个
+- 限流、超时、连接错误、5xx 等临时错误按指数退避（带随机抖动）重试，优先使用服务端的 Retry-After
+- 校验通过的 Pydantic 对象与失败记录分别追加写入两个 JSONL 文件，每完成一条立即写出
+- 成功输出同时作为断点：重新运行时跳过已成功的记录
+- 打包模式（--pack）：系统提示词和 schema 对每条短文本都要重复发送一次，开销远大于输入本身。
+  打包模式把目标模型包装为列表 schema，按 token 预算把多条记录合并为一次请求，输出按 index
+  对应回输入；结果缺失、编号错误或整包失败时自动拆分重试
+- 级联模式（--fast-model）：先用更快更便宜的模型抽取，Pydantic 校验失败、请求失败或未通过检查
+  （默认检查空字段，可用 --check 模块:函数名 追加自定义检查）时才升级到 --model，
+  结束时输出升级率、延迟分位数和相对全部使用大模型节省的估算费用
+
+用法:
+    python responses_extraction.py --input messages.jsonl --output events.jsonl --failures failed.jsonl \\
+        --concurrency 64
+    python responses_extraction.py --input messages.jsonl --pack --pack-tokens 4000 --pack-max-records 50
+    python responses_extraction.py --input messages.jsonl --fast-model gpt-4.1-mini --check my_checks:has_date
+
+输入每行一个 JSON 对象（默认读取 "id" 与 "text" 字段），也可以是 JSON 字符串或纯文本行。
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
+
+from openai import AsyncOpenAI, RateLimitError
+from pydantic import BaseModel, ValidationError, create_model
+
+from apiyi_utils.ratelimit import get_rate_limiter
+from apiyi_utils.routing import get_router
+
+BASE_URL = "https://vip.apiyi.com/v1"
+DEFAULT_MODEL = "gpt-4.1"
+DEFAULT_INSTRUCTIONS = "Extract the event information."
+DEFAULT_SCHEMA = "responses_api_demo:CalendarEvent"
+
+# 可重试的 HTTP 状态码
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# 打包模式：每包的默认输入 token 预算和最大记录数
+DEFAULT_PACK_TOKENS = 4000
+DEFAULT_PACK_MAX_RECORDS = 50
+
+# 每条记录在打包请求中的固定开销（JSON 包装、index 字段），按 token 估算
+_RECORD_OVERHEAD_TOKENS = 8
+
+PACK_INSTRUCTIONS = (
+    "\n\nThe user message is a JSON array of records, each with an `index` and a `text`. "
+    "Process every record independently and return exactly one element in `items` for each record, "
+    "copying the record's `index` into the element."
+)
+
+# 模型价格（美元 / 百万 token：输入, 输出），用于估算级联模式节省的费用；按模型名前缀匹配
+MODEL_PRICES = {
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# (记录, 抽取结果, 错误)
+Outcome = Tuple[Dict[str, Any], Optional[BaseModel], Optional["ExtractionError"]]
+
+
+def load_schema(spec: str) -> Type[BaseModel]:
+    """按 "模块:类名" 加载 Pydantic 模型，例如 responses_api_demo:CalendarEvent"""
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"schema 格式应为 模块:类名，实际为 {spec}")
+    schema = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(schema, type) and issubclass(schema, BaseModel)):
+        raise TypeError(f"{spec} 不是 Pydantic 模型")
+    return schema
+
+
+def model_price(model: str) -> Optional[Tuple[float, float]]:
+    """返回模型的 (输入, 输出) 单价，未知模型返回 None（最长前缀优先）"""
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            return MODEL_PRICES[prefix]
+    return None
+
+
+def usage_cost(model: str, usage: Dict[str, int]) -> Optional[float]:
+    """按 token 用量估算费用（美元），未知模型返回 None"""
+    price = model_price(model)
+    if price is None:
+        return None
+    return (usage.get("input_tokens", 0) * price[0] + usage.get("output_tokens", 0) * price[1]) / 1_000_000
+
+
+def check_non_empty(text: str, parsed: BaseModel) -> Optional[str]:
+    """默认的低置信度检查：字符串字段为空或列表字段为空时返回问题描述"""
+    for name, value in parsed:
+        if isinstance(value, str) and not value.strip():
+            return f"字段 {name} 为空"
+        if isinstance(value, (list, dict)) and not value:
+            return f"字段 {name} 为空"
+    return None
+
+
+def load_check(spec: str) -> Callable[[str, BaseModel], Any]:
+    """按 "模块:函数名" 加载自定义检查函数 check(输入文本, 抽取结果)"""
+    module_name, _, function_name = spec.partition(":")
+    if not function_name:
+        raise ValueError(f"检查函数格式应为 模块:函数名，实际为 {spec}")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+class CascadeMetrics:
+    """级联模式的统计：升级率、升级原因、各层延迟、实际费用与全部使用大模型的估算费用"""
+
+    def __init__(self, fast_model: str, model: str):
+        self.fast_model = fast_model
+        self.model = model
+        self.total = 0
+        self.escalated = 0
+        self.reasons: Counter = Counter()
+        self.fast_latency: List[float] = []
+        self.escalated_latency: List[float] = []
+        self.record_latency: List[float] = []
+        self.actual_cost = 0.0
+        self.baseline_cost = 0.0
+        self.cost_known = True
+
+    def add(self, latency: float, fast_latency: float, fast_usage: Dict[str, int],
+            escalation_reason: Optional[str] = None, usage: Optional[Dict[str, int]] = None):
+        self.total += 1
+        self.record_latency.append(latency)
+        self.fast_latency.append(fast_latency)
+
+        fast_cost = usage_cost(self.fast_model, fast_usage)
+        if escalation_reason is None:
+            # 未升级：若直接使用大模型，token 用量按快速模型的实际用量估算
+            actual, baseline = fast_cost, usage_cost(self.model, fast_usage)
+        else:
+            self.escalated += 1
+            self.reasons[escalation_reason] += 1
+            self.escalated_latency.append(latency - fast_latency)
+            large_cost = usage_cost(self.model, usage or {})
+            actual = None if fast_cost is None or large_cost is None else fast_cost + large_cost
+            baseline = large_cost
+        if actual is None or baseline is None:
+            self.cost_known = False
+        else:
+            self.actual_cost += actual
+            self.baseline_cost += baseline
+
+    def summary(self) -> Dict[str, Any]:
+        summary = {
+            "records": self.total,
+            "escalated": self.escalated,
+            "escalation_rate": round(self.escalated / self.total, 4) if self.total else 0.0,
+            "escalation_reasons": dict(self.reasons.most_common(10)),
+            "latency_p50": round(_percentile(self.record_latency, 50), 3),
+            "latency_p95": round(_percentile(self.record_latency, 95), 3),
+            "fast_latency_p50": round(_percentile(self.fast_latency, 50), 3),
+            "escalated_latency_p50": round(_percentile(self.escalated_latency, 50), 3),
+        }
+        if self.cost_known:
+            summary["actual_cost_usd"] = round(self.actual_cost, 6)
+            summary["baseline_cost_usd"] = round(self.baseline_cost, 6)
+            summary["cost_saved_usd"] = round(self.baseline_cost - self.actual_cost, 6)
+        return summary
+
+
+def make_list_schema(text_format: Type[BaseModel]) -> Type[BaseModel]:
+    """把目标模型包装为列表 schema：{"items": [目标模型字段 + index]}"""
+    item = create_model(f"{text_format.__name__}Item", __base__=text_format, index=(int, ...))
+    return create_model(f"{text_format.__name__}List", items=(List[item], ...))
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：按 UTF-8 字节数 / 3（英文偏保守，中文约为每字 1 个 token）"""
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def iter_packs(records: Iterable[Dict[str, Any]], max_tokens: int = DEFAULT_PACK_TOKENS,
+               max_records: int = DEFAULT_PACK_MAX_RECORDS) -> Iterator[List[Dict[str, Any]]]:
+    """按输入 token 预算和记录数上限贪心打包；单条超出预算的记录单独成包"""
+    pack: List[Dict[str, Any]] = []
+    tokens = 0
+    for record in records:
+        cost = estimate_tokens(record["text"]) + _RECORD_OVERHEAD_TOKENS
+        if pack and (len(pack) >= max_records or tokens + cost > max_tokens):
+            yield pack
+            pack, tokens = [], 0
+        pack.append(record)
+        tokens += cost
+    if pack:
+        yield pack
+
+
+def iter_records(path: str, text_field: str = "text", id_field: str = "id") -> Iterator[Dict[str, Any]]:
+    """
+    按行读取输入，产出 {"id": ..., "text": ...}；没有 id 字段时使用行号
+
+    以引号开头但不是合法 JSON 字符串的行按纯文本处理；以 { 开头但无法解析的行产出带 "error" 的记录
+    （id 为行号，text 为原始行），由调用方记为失败，不影响后续记录。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            value = line
+            if line[0] in "{\"":
+                try:
+                    value = json.loads(line)
+                except json.JSONDecodeError as e:
+                    if line[0] == "{":
+                        yield {"id": line_number, "text": line, "error": f"第 {line_number} 行不是合法的 JSON: {e}"}
+                        continue
+            if isinstance(value, dict):
+                record_id = value.get(id_field, line_number)
+                text = value.get(text_field)
+            else:
+                record_id, text = line_number, value
+            yield {"id": record_id, "text": text}
+
+
+def load_done_ids(path: str) -> Set[Any]:
+    """读取已有的成功输出，返回已完成的记录 ID（用于断点续跑）"""
+    done: Set[Any] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                continue  # 上次中断时写了一半的行
+    return done
+
+
+def is_retryable(error: BaseException) -> bool:
+    """判断是否为值得重试的临时错误"""
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+
+def is_output_error(error: "ExtractionError") -> bool:
+    """
+    判断失败是否出在模型输出上：输出为空、被截断、无法解析或未通过 schema 校验
+
+    这类失败换成更小的包可能成功；API 错误（400/401/403、模型不存在，或重试用尽的临时错误）
+    与包的大小无关，拆分只会重复失败。
+    """
+    import openai
+
+    if error.error_type == "EmptyOutput":
+        return True
+    # pydantic.ValidationError 和 json.JSONDecodeError 都是 ValueError 的子类
+    return isinstance(error.__cause__, (ValueError, openai.LengthFinishReasonError))
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """读取服务端返回的 Retry-After（秒），没有时返回 None"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class ExtractionError(Exception):
+    """抽取失败（不可重试，或重试次数用尽）"""
+
+    def __init__(self, message: str, attempts: int = 1, error_type: Optional[str] = None):
+        super().__init__(message)
+        self.attempts = attempts
+        self.error_type = error_type or type(self).__name__
+
+
+class ExtractionEngine:
+    """并发调用 responses.parse，把文本抽取为 Pydantic 对象"""
+
+    def __init__(self, client: AsyncOpenAI, text_format: Type[BaseModel], model: str = DEFAULT_MODEL,
+                 instructions: str = DEFAULT_INSTRUCTIONS, concurrency: int = 32, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0, timeout: float = 120.0,
+                 fast_model: Optional[str] = None,
+                 checks: Optional[List[Callable[[str, BaseModel], Any]]] = None, rate_limiter=None):
+        """
+        Args:
+            client: AsyncOpenAI 客户端（建议 max_retries=0，由引擎统一重试）
+            text_format: 目标 Pydantic 模型
+            concurrency: 同时在途的请求数上限
+            max_retries: 临时错误的最大重试次数
+            backoff_base / backoff_max: 指数退避的基数和上限（秒）
+            timeout: 单个请求的超时（秒）
+            fast_model: 级联模式的快速模型；设置后每条记录先用快速模型抽取，失败或未通过检查时再用 model
+            checks: 级联模式对快速模型结果的检查函数 check(输入文本, 结果)，返回 False 或问题描述表示不通过
+            rate_limiter: 跨进程限流器（apiyi_utils.ratelimit.RateLimiter），每个请求发送前按 Key 和模型取令牌
+        """
+        self.client = client
+        self.text_format = text_format
+        self.model = model
+        self.instructions = instructions
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.fast_model = fast_model
+        self.checks = list(checks or [])
+        self.rate_limiter = rate_limiter
+        self.cascade = CascadeMetrics(fast_model, model) if fast_model else None
+        self.list_format = make_list_schema(text_format)
+        # 限制同时在途的 API 请求数（打包模式拆分重试时一个任务可能并发发出多个请求）
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.stats = {"success": 0, "failed": 0, "skipped": 0, "retries": 0, "requests": 0, "splits": 0}
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """第 attempt 次重试前的等待时间：优先 Retry-After，否则指数退避 + 随机抖动"""
+        hinted = retry_after(error)
+        if hinted is not None:
+            return min(hinted, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def with_retries(self, call: Callable[[], Any]) -> Any:
+        """执行协程工厂 call，临时错误按退避重试；最终失败时抛出 ExtractionError"""
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    self.stats["requests"] += 1
+                    return await call()
+            except ExtractionError as e:
+                e.attempts = attempt + 1
+                raise
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise ExtractionError(str(e) or type(e).__name__, attempt + 1, type(e).__name__) from e
+                await asyncio.sleep(self._backoff(attempt, e))
+                attempt += 1
+                self.stats["retries"] += 1
+
+    async def _call(self, text: str, text_format: Type[BaseModel], instructions: str,
+                    model: Optional[str] = None, usage: Optional[Dict[str, int]] = None) -> BaseModel:
+        model = model or self.model
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(self.client.api_key, model)
+        try:
+            response = await self.client.responses.parse(
+                model=model,
+                input=[
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": text},
+                ],
+                text_format=text_format,
+                timeout=self.timeout,
+            )
+        except RateLimitError as e:
+            if self.rate_limiter is not None:
+                # 通知同一主机上共用该 Key 的其他进程一起暂停
+                self.rate_limiter.penalize(self.client.api_key, model, retry_after(e) or 1.0)
+            raise
+        if usage is not None and response.usage is not None:
+            usage["input_tokens"] = usage.get("input_tokens", 0) + response.usage.input_tokens
+            usage["output_tokens"] = usage.get("output_tokens", 0) + response.usage.output_tokens
+        if response.output_parsed is None:
+            raise ExtractionError("模型未返回可解析的结果（可能拒绝回答）", error_type="EmptyOutput")
+        return response.output_parsed
+
+    async def parse(self, text: str, model: Optional[str] = None,
+                    text_format: Optional[Type[BaseModel]] = None,
+                    usage: Optional[Dict[str, int]] = None) -> BaseModel:
+        """抽取单条文本，返回校验通过的 Pydantic 对象；传入 usage 时累加 token 用量"""
+        text_format = text_format or self.text_format
+        return await self.with_retries(lambda: self._call(text, text_format, self.instructions, model, usage))
+
+    def _check(self, text: str, parsed: BaseModel) -> Optional[str]:
+        """依次执行检查函数，返回第一个问题描述；全部通过返回 None"""
+        for check in self.checks:
+            try:
+                verdict = check(text, parsed)
+            except Exception as e:
+                return f"检查 {getattr(check, '__name__', check)} 出错: {e}"
+            if verdict is False:
+                return f"未通过检查 {getattr(check, '__name__', check)}"
+            if isinstance(verdict, str) and verdict:
+                return verdict
+        return None
+
+    async def parse_cascade(self, text: str) -> Tuple[BaseModel, str]:
+        """
+        级联抽取：先用快速模型，结果校验失败或未通过检查时升级到大模型
+
+        返回 (结果, 实际使用的模型)；大模型也失败时抛出 ExtractionError。
+        """
+        start = time.perf_counter()
+        fast_usage: Dict[str, int] = {}
+        reason = None
+        try:
+            parsed = await self.parse(text, self.fast_model, usage=fast_usage)
+            reason = self._check(text, parsed)
+        except ExtractionError as e:
+            reason = e.error_type
+        fast_latency = time.perf_counter() - start
+
+        if reason is None:
+            self.cascade.add(fast_latency, fast_latency, fast_usage)
+            return parsed, self.fast_model
+
+        usage: Dict[str, int] = {}
+        try:
+            parsed = await self.parse(text, usage=usage)
+        finally:
+            self.cascade.add(time.perf_counter() - start, fast_latency, fast_usage, reason, usage)
+        return parsed, self.model
+
+    async def parse_pack(self, records: List[Dict[str, Any]]) -> List[Outcome]:
+        """
+        把多条记录打包成一次请求抽取，返回 [(记录, 结果, 错误)]
+
+        请求体为 [{"index": i, "text": ...}] 的 JSON 数组，输出使用列表 schema，
+        按 index 对应回输入。输出为空、被截断、无法解析或校验失败时对半拆分重试；
+        API 错误（不可重试或重试用尽）与包的大小无关，整包记录直接标记为失败。
+        部分记录缺失、编号重复或单条校验失败时，只把这些记录重新拆分请求；拆到单条时使用普通请求。
+        """
+        if len(records) == 1:
+            try:
+                return [(records[0], await self.parse(records[0]["text"]), None)]
+            except ExtractionError as e:
+                return [(records[0], None, e)]
+
+        payload = json.dumps([{"index": i, "text": record["text"]} for i, record in enumerate(records)],
+                             ensure_ascii=False)
+        try:
+            packed = await self.with_retries(
+                lambda: self._call(payload, self.list_format, self.instructions + PACK_INSTRUCTIONS))
+        except ExtractionError as e:
+            if not is_output_error(e):
+                return [(record, None, e) for record in records]
+            self.stats["splits"] += 1
+            middle = len(records) // 2
+            left, right = await asyncio.gather(self.parse_pack(records[:middle]), self.parse_pack(records[middle:]))
+            return left + right
+
+        counts = Counter(item.index for item in packed.items)
+        results: Dict[int, BaseModel] = {}
+        for item in packed.items:
+            if counts[item.index] != 1 or not 0 <= item.index < len(records):
+                continue  # 编号重复或越界：无法确定对应关系，重新请求
+            try:
+                results[item.index] = self.text_format.model_validate(item.model_dump(exclude={"index"}))
+            except ValidationError:
+                continue
+
+        outcomes: List[Outcome] = [(records[i], result, None) for i, result in sorted(results.items())]
+        missing = [record for i, record in enumerate(records) if i not in results]
+        if missing:
+            self.stats["splits"] += 1
+            if len(missing) == 1:
+                outcomes.extend(await self.parse_pack(missing))
+            else:
+                middle = len(missing) // 2
+                left, right = await asyncio.gather(self.parse_pack(missing[:middle]),
+                                                   self.parse_pack(missing[middle:]))
+                outcomes.extend(left + right)
+        return outcomes
+
+    async def run(self, records: Iterable[Dict[str, Any]],
+                  on_success: Callable[[Dict[str, Any], BaseModel], None],
+                  on_failure: Callable[[Dict[str, Any], ExtractionError], None],
+                  skip_ids: Optional[Set[Any]] = None,
+                  progress_every: int = 1000,
+                  pack_tokens: Optional[int] = None,
+                  pack_max_records: int = DEFAULT_PACK_MAX_RECORDS) -> Dict[str, Any]:
+        """
+        并发处理 records，每完成一条立即回调
+
+        records 按需读取：在途任务达到 concurrency 时先等待任意一个完成，再读取下一条，
+        因此内存占用与输入总量无关。
+        pack_tokens 不为 None 时启用打包模式：按估算的输入 token 数把记录打包（每包最多
+        pack_max_records 条），每个任务处理一包。
+        """
+        start = time.time()
+        pending: Set[asyncio.Task] = set()
+        completed = 0
+
+        def valid(record) -> bool:
+            return isinstance(record.get("text"), str) and bool(record["text"].strip())
+
+        def report(record, result, error):
+            nonlocal completed
+            if error is None:
+                self.stats["success"] += 1
+                on_success(record, result)
+            else:
+                if not isinstance(error, ExtractionError):
+                    error = ExtractionError(str(error) or type(error).__name__, error_type=type(error).__name__)
+                self.stats["failed"] += 1
+                on_failure(record, error)
+            completed += 1
+            if progress_every and completed % progress_every == 0:
+                elapsed = time.time() - start
+                print(f"⏳ 已完成 {completed} 条，成功 {self.stats['success']}，失败 {self.stats['failed']}，"
+                      f"{completed / elapsed:.1f} 条/秒，平均每个请求 {completed / max(1, self.stats['requests']):.1f} 条")
+
+        async def work(unit):
+            if pack_tokens is not None:
+                return await self.parse_pack(unit)
+            try:
+                if self.fast_model:
+                    parsed, unit["model"] = await self.parse_cascade(unit["text"])
+                    return [(unit, parsed, None)]
+                return [(unit, await self.parse(unit["text"]), None)]
+            except ExtractionError as e:
+                return [(unit, None, e)]
+
+        def pending_records():
+            for record in records:
+                if skip_ids and record["id"] in skip_ids:
+                    self.stats["skipped"] += 1
+                elif record.get("error"):
+                    report(record, None, ExtractionError(record["error"], error_type="InvalidInput"))
+                elif not valid(record):
+                    report(record, None, ExtractionError("输入文本为空", error_type="EmptyInput"))
+                else:
+                    yield record
+
+        if pack_tokens is not None and self.fast_model:
+            raise ValueError("级联模式不能与打包模式同时使用")
+        if pack_tokens is not None:
+            units = iter_packs(pending_records(), pack_tokens, pack_max_records)
+        else:
+            units = pending_records()
+
+        def drain(done):
+            for task in done:
+                for record, result, error in task.result():
+                    report(record, result, error)
+
+        for unit in units:
+            if len(pending) >= self.concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                drain(done)
+            pending.add(asyncio.ensure_future(work(unit)))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            drain(done)
+
+        elapsed = time.time() - start
+        self.stats["elapsed"] = round(elapsed, 3)
+        self.stats["throughput"] = round(completed / elapsed, 2) if elapsed > 0 else 0.0
+        if self.cascade is not None:
+            self.stats["cascade"] = self.cascade.summary()
+        return self.stats
+
+
+def make_client(api_key: str, base_url: str = BASE_URL, concurrency: int = 32) -> AsyncOpenAI:
+    """创建 AsyncOpenAI 客户端：连接池大小与并发数一致，关闭 SDK 自带重试（由引擎统一重试）"""
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    router = get_router()  # APIYI_ROUTING=1 时按延迟在多个入口之间选路
+    hooks = router.httpx_event_hooks(is_async=True) if router is not None else None
+    return AsyncOpenAI(base_url=base_url, api_key=api_key, max_retries=0,
+                       http_client=httpx.AsyncClient(limits=limits, timeout=None, event_hooks=hooks))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Responses API 并发结构化抽取")
+    parser.add_argument("--input", required=True, help="输入 JSONL 文件（每行一个 JSON 对象、JSON 字符串或纯文本）")
+    parser.add_argument("--output", default="extracted.jsonl", help="成功结果 JSONL 文件（同时作为断点）")
+    parser.add_argument("--failures", default="extract_failures.jsonl", help="失败记录 JSONL 文件")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="目标 Pydantic 模型（模块:类名）")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="模型名称")
+    parser.add_argument("--instructions", default=DEFAULT_INSTRUCTIONS, help="系统提示词")
+    parser.add_argument("--text-field", default="text", help="输入中的文本字段")
+    parser.add_argument("--id-field", default="id", help="输入中的 ID 字段（缺失时使用行号）")
+    parser.add_argument("--concurrency", type=int, default=32, help="同时在途的请求数")
+    parser.add_argument("--max-retries", type=int, default=5, help="临时错误的最大重试次数")
+    parser.add_argument("--timeout", type=float, default=120, help="单个请求超时（秒）")
+    parser.add_argument("--pack", action="store_true", help="打包模式：多条记录合并为一次请求")
+    parser.add_argument("--pack-tokens", type=int, default=DEFAULT_PACK_TOKENS, help="打包模式：每个请求的输入 token 预算（估算）")
+    parser.add_argument("--pack-max-records", type=int, default=DEFAULT_PACK_MAX_RECORDS, help="打包模式：每个请求最多包含的记录数")
+    parser.add_argument("--fast-model", help="级联模式：先用该模型抽取，失败或未通过检查时再用 --model")
+    parser.add_argument("--check", action="append", default=[], help="级联模式：自定义检查函数（模块:函数名，可重复）")
+    parser.add_argument("--no-default-check", action="store_true", help="级联模式：不检查空字段（默认空字段视为低置信度）")
+    parser.add_argument("--no-resume", action="store_true", help="不跳过成功输出中已有的记录")
+    parser.add_argument("--api-key", default=os.getenv("APIYI_API_KEY", "sk-"), help="API Key（默认读取 APIYI_API_KEY 环境变量）")
+    return parser.parse_args()
+
+
+async def run_extraction(args) -> Dict[str, Any]:
+    schema = load_schema(args.schema)
+    skip_ids = None if args.no_resume else load_done_ids(args.output)
+    if skip_ids:
+        print(f"♻️ 断点续跑：已完成 {len(skip_ids)} 条，将跳过")
+
+    client = make_client(args.api_key, concurrency=args.concurrency)
+    checks = [] if args.no_default_check else [check_non_empty]
+    checks += [load_check(spec) for spec in args.check]
+    engine = ExtractionEngine(client, schema, args.model, args.instructions, args.concurrency,
+                              args.max_retries, timeout=args.timeout, fast_model=args.fast_model, checks=checks,
+                              rate_limiter=get_rate_limiter())
+
+    with open(args.output, "a", encoding="utf-8") as out, open(args.failures, "a", encoding="utf-8") as failed:
+        def on_success(record, parsed):
+            line = {"id": record["id"], "result": parsed.model_dump(mode="json")}
+            if "model" in record:
+                line["model"] = record["model"]
+            out.write(json.dumps(line, ensure_ascii=False) + "\n")
+            out.flush()
+
+        def on_failure(record, error):
+            failed.write(json.dumps({"id": record["id"], "input": record.get("text"), "error": str(error),
+                                     "error_type": error.error_type, "attempts": error.attempts},
+                                    ensure_ascii=False) + "\n")
+            failed.flush()
+
+        try:
+            records = iter_records(args.input, args.text_field, args.id_field)
+            return await engine.run(records, on_success, on_failure, skip_ids,
+                                    pack_tokens=args.pack_tokens if args.pack else None,
+                                    pack_max_records=args.pack_max_records)
+        finally:
+            await client.close()
+
+
+def main():
+    args = parse_arguments()
+    if args.pack and args.fast_model:
+        print("❌ 级联模式（--fast-model）不能与打包模式（--pack）同时使用")
+        return
+    print("=== Responses API 并发结构化抽取 ===")
+    print(f"📥 输入: {args.input}，模型: {args.model}，并发数: {args.concurrency}")
+    if args.pack:
+        print(f"📦 打包模式：每个请求约 {args.pack_tokens} 个输入 token，最多 {args.pack_max_records} 条记录")
+    stats = asyncio.run(run_extraction(args))
+    print(f"\n📊 抽取完成: 成功 {stats['success']}，失败 {stats['failed']}，跳过 {stats['skipped']}，"
+          f"重试 {stats['retries']} 次，用时 {stats['elapsed']} 秒（{stats['throughput']} 条/秒）")
+    completed = stats["success"] + stats["failed"]
+    if stats["requests"]:
+        print(f"📨 共发送 {stats['requests']} 个请求，平均每个请求 {completed / stats['requests']:.1f} 条，"
+              f"拆分重试 {stats['splits']} 次")
+    cascade = stats.get("cascade")
+    if cascade:
+        print(f"🪜 级联: {args.fast_model} -> {args.model}，升级 {cascade['escalated']}/{cascade['records']} 条"
+              f"（{cascade['escalation_rate']:.1%}），原因 {cascade['escalation_reasons']}")
+        print(f"⏱️ 延迟 p50 {cascade['latency_p50']} 秒，p95 {cascade['latency_p95']} 秒；"
+              f"快速模型 p50 {cascade['fast_latency_p50']} 秒，升级部分 p50 {cascade['escalated_latency_p50']} 秒")
+        if "cost_saved_usd" in cascade:
+            print(f"💰 估算费用 ${cascade['actual_cost_usd']:.4f}，全部使用 {args.model} 约 "
+                  f"${cascade['baseline_cost_usd']:.4f}，节省 ${cascade['cost_saved_usd']:.4f}")
+    print(f"✅ 结果: {args.output}")
+    if stats["failed"]:
+        print(f"❌ 失败记录: {args.failures}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+结构化输出的增量流式解析
+
+client.responses.parse 要等整个响应生成完才返回 output_parsed。输出较长时（例如参与者很多的
+CalendarEvent，或打包模式下包含几十条结果的列表），下游只能干等。
+
+本模块基于 Responses 流式接口（client.responses.stream）：每收到一段 output_text 增量，
+就用增量 JSON 扫描器检查顶层对象中是否有字段或列表元素已经完整生成，
+完整的部分立即用 Pydantic 校验并产出，下游可以在生成结束前开始处理：
+
+- 顶层列表字段（如 participants）的每个元素生成完就产出一个 "item" 事件
+- 顶层字段的值生成完就产出一个 "field" 事件
+- 响应结束时产出 "done" 事件，携带完整的 output_parsed
+
+用法:
+    async for event in stream_partial(client, CalendarEvent, input_messages):
+        if event.kind == "item":
+            handle_participant(event.index, event.value)
+
+    python responses_streaming.py --text "Alice, Bob and Carol are going to a science fair on Friday."
+"""
+
+import argparse
+import json
+import os
+import time
+import typing
+from collections import namedtuple
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Type
+
+from pydantic import BaseModel, TypeAdapter
+
+BASE_URL = "https://vip.apiyi.com/v1"
+DEFAULT_MODEL = "gpt-4.1"
+DEFAULT_INSTRUCTIONS = "Extract the event information."
+
+# kind: "field"（顶层字段完成）、"item"（顶层列表字段的一个元素完成）、"done"（完整对象）
+PartialEvent = namedtuple("PartialEvent", "kind field index value")
+
+_WHITESPACE = " \t\r\n"
+
+
+def _list_item_type(annotation: Any) -> Optional[Any]:
+    """list[X] / List[X] 返回 X，其他类型返回 None"""
+    if typing.get_origin(annotation) in (list, List):
+        args = typing.get_args(annotation)
+        return args[0] if args else Any
+    return None
+
+
+class IncrementalObjectParser:
+    """
+    增量扫描顶层 JSON 对象，在字段值或顶层列表元素完整时产出校验后的事件
+
+    扫描器只跟踪嵌套深度、字符串/转义状态和当前顶层键，每个字符只处理一次；
+    完整的片段从缓冲区切出后再交给 json.loads 和 Pydantic 校验。
+    """
+
+    def __init__(self, schema: Type[BaseModel]):
+        self.schema = schema
+        self._fields: Dict[str, TypeAdapter] = {}
+        self._items: Dict[str, TypeAdapter] = {}
+        for name, info in schema.model_fields.items():
+            self._fields[name] = TypeAdapter(info.annotation)
+            item_type = _list_item_type(info.annotation)
+            if item_type is not None:
+                self._items[name] = TypeAdapter(item_type)
+
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"           # 深度 1 处期待 "key" / "colon" / "value"
+        self._key: Optional[str] = None
+        self._string_start = 0
+        self._value_start: Optional[int] = None
+        self._element_start: Optional[int] = None
+        self._element_index = 0
+        self._list_value = False
+        self.completed: Dict[str, Any] = {}
+
+    def feed(self, text: str) -> List[PartialEvent]:
+        """追加一段输出文本，返回新完成的事件"""
+        self.buffer += text
+        events: List[PartialEvent] = []
+        buffer = self.buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key":
+                        self._key = json.loads(buffer[self._string_start:pos + 1])
+                        self._expect = "colon"
+                continue
+
+            if char in _WHITESPACE:
+                continue
+
+            # 记录顶层值、顶层列表元素的起点
+            if self._depth == 1 and self._expect == "value" and self._value_start is None:
+                self._value_start = pos
+                self._list_value = char == "[" and self._key in self._items
+            elif (self._depth == 2 and self._list_value and self._element_start is None
+                  and char not in ",]"):
+                self._element_start = pos
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 2 and self._list_value and char == "]":
+                    self._finish_element(pos, events)
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_value(pos, events)
+            elif char == ":" and self._depth == 1:
+                self._expect = "value"
+            elif char == ",":
+                if self._depth == 1:
+                    self._finish_value(pos, events)
+                elif self._depth == 2 and self._list_value:
+                    self._finish_element(pos, events)
+        self._pos = len(buffer)
+        return events
+
+    def _finish_element(self, end: int, events: List[PartialEvent]):
+        if self._element_start is None:
+            return  # 空列表
+        raw = self.buffer[self._element_start:end]
+        self._element_start = None
+        value = self._items[self._key].validate_python(json.loads(raw))
+        events.append(PartialEvent("item", self._key, self._element_index, value))
+        self._element_index += 1
+
+    def _finish_value(self, end: int, events: List[PartialEvent]):
+        if self._value_start is not None and self._key is not None:
+            raw = self.buffer[self._value_start:end].strip()
+            adapter = self._fields.get(self._key)
+            if adapter is not None:
+                value = adapter.validate_python(json.loads(raw))
+                self.completed[self._key] = value
+                events.append(PartialEvent("field", self._key, None, value))
+        self._key = None
+        self._value_start = None
+        self._element_index = 0
+        self._list_value = False
+        self._expect = "key"
+
+
+def _build_input(text: str, instructions: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": text},
+    ]
+
+
+async def stream_partial(client, schema: Type[BaseModel], input: Any, model: str = DEFAULT_MODEL,
+                         **kwargs) -> AsyncIterator[PartialEvent]:
+    """
+    使用 AsyncOpenAI 流式抽取，逐个产出完成的字段/列表元素，最后产出 "done" 事件
+
+    input 与 responses.parse 的 input 参数相同；其余参数原样传给 client.responses.stream。
+    """
+    parser = IncrementalObjectParser(schema)
+    async with client.responses.stream(model=model, input=input, text_format=schema, **kwargs) as stream:
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                for partial in parser.feed(event.delta):
+                    yield partial
+        response = await stream.get_final_response()
+    yield PartialEvent("done", None, None, response.output_parsed)
+
+
+def stream_partial_sync(client, schema: Type[BaseModel], input: Any, model: str = DEFAULT_MODEL,
+                        **kwargs) -> Iterator[PartialEvent]:
+    """stream_partial 的同步版本，使用 OpenAI 客户端"""
+    parser = IncrementalObjectParser(schema)
+    with client.responses.stream(model=model, input=input, text_format=schema, **kwargs) as stream:
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                yield from parser.feed(event.delta)
+        response = stream.get_final_response()
+    yield PartialEvent("done", None, None, response.output_parsed)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Responses API 结构化输出增量流式解析")
+    parser.add_argument("--text", default="Alice, Bob and Carol are going to a science fair on Friday.",
+                        help="要抽取的文本")
+    parser.add_argument("--schema", default="responses_api_demo:CalendarEvent", help="目标 Pydantic 模型（模块:类名）")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="模型名称")
+    parser.add_argument("--instructions", default=DEFAULT_INSTRUCTIONS, help="系统提示词")
+    parser.add_argument("--api-key", default=os.getenv("APIYI_API_KEY", "sk-"), help="API Key（默认读取 APIYI_API_KEY 环境变量）")
+    return parser.parse_args()
+
+
+def main():
+    from openai import OpenAI
+
+    from responses_extraction import load_schema
+
+    args = parse_arguments()
+    schema = load_schema(args.schema)
+    client = OpenAI(base_url=BASE_URL, api_key=args.api_key)
+
+    print("=== Responses API 结构化输出增量流式解析 ===")
+    start = time.time()
+    try:
+        for event in stream_partial_sync(client, schema, _build_input(args.text, args.instructions), args.model):
+            elapsed = time.time() - start
+            if event.kind == "item":
+                print(f"[{elapsed:6.2f}s] 🧩 {event.field}[{event.index}] = {event.value!r}")
+            elif event.kind == "field":
+                print(f"[{elapsed:6.2f}s] ✅ {event.field} 完成: {event.value!r}")
+            else:
+                print(f"[{elapsed:6.2f}s] 🎯 完整结果: {event.value}")
+    except Exception as e:
+        print(f"❌ API调用失败: {type(e).__name__}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
-import requests
 import time
 import os
+import sys
 from datetime import datetime
 
+# 引入仓库根目录下的公共模块
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from apiyi_utils.http import get_session
+from apiyi_utils.tracing import traced
+from apiyi_utils.multipart import MultipartEncoder, print_upload_progress
+
 # API 配置
 BASE_URL = "https://api.apiyi.com/v1/videos"
 API_KEY = "sk-"
@@ -38,6 +44,7 @@ def get_mime_type(file_path):
     return mime_types.get(ext, 'image/png')
 
 
+@traced("sora.submit")
 def step1_submit_video_request():
     """第一步：提交视频生成请求（自动识别文字或图片模式）"""
     print("=" * 60)
@@ -62,7 +69,6 @@ def step1_submit_video_request():
     headers = {
         'Accept': 'application/json',
         'Authorization': API_KEY,
-        'Host': 'api.apiyi.com',
         'Connection': 'keep-alive'
     }
 
@@ -77,16 +83,20 @@ def step1_submit_video_request():
             print(f"   - 尺寸: {SIZE}")
             print(f"   - 时长: {SECONDS}秒")
 
-            with open(IMAGE_PATH, 'rb') as f:
-                files['input_reference'] = (
+            # 流式上传参考图：按块从内存映射文件读取，不把整张图片读入内存
+            fields = {name: value for name, (_, value) in files.items()}
+            reference = {
+                'input_reference': (
                     os.path.basename(IMAGE_PATH),
-                    f,
+                    IMAGE_PATH,
                     get_mime_type(IMAGE_PATH)
                 )
-                response = requests.post(
+            }
+            with MultipartEncoder(fields=fields, files=reference, progress=print_upload_progress) as encoder:
+                response = get_session().post(
                     BASE_URL,
-                    headers=headers,
-                    files=files
+                    headers={**headers, 'Content-Type': encoder.content_type},
+                    data=encoder
                 )
         else:
             # 文字生成视频模式
@@ -97,7 +107,7 @@ def step1_submit_video_request():
             print(f"   - 尺寸: {SIZE}")
             print(f"   - 时长: {SECONDS}秒")
 
-            response = requests.post(
+            response = get_session().post(
                 BASE_URL,
                 headers=headers,
                 files=files
@@ -122,6 +132,7 @@ def step1_submit_video_request():
         return None, None
 
 
+@traced("sora.poll")
 def step2_poll_video_status(video_id):
     """第二步：轮询查询视频生成状态"""
     print("\n" + "=" * 60)
@@ -146,7 +157,7 @@ def step2_poll_video_status(video_id):
 
         try:
             print(f"\n🔍 查询状态... (已等待 {int(elapsed_time)} 秒)")
-            response = requests.get(status_url, headers=headers)
+            response = get_session().get(status_url, headers=headers)
 
             if response.status_code == 200:
                 result = response.json()
@@ -180,6 +191,7 @@ def step2_poll_video_status(video_id):
             time.sleep(POLL_INTERVAL)
 
 
+@traced("sora.download")
 def step3_download_video(video_id, is_image_mode, output_path=None):
     """第三步：下载生成的视频"""
     print("\n" + "=" * 60)
@@ -199,7 +211,7 @@ def step3_download_video(video_id, is_image_mode, output_path=None):
 
     try:
         print(f"📥 开始下载视频...")
-        response = requests.get(content_url, headers=headers, stream=True)
+        response = get_session().get(content_url, headers=headers, stream=True)
 
         if response.status_code == 200:
             # 获取文件大小
@@ -231,6 +243,7 @@ def step3_download_video(video_id, is_image_mode, output_path=None):
         return False
 
 
+@traced("sora.pipeline")
 def main():
     """完整的异步流程"""
     print("\n🎬 开始 Sora-2 视频生成完整流程")
@@ -1,8 +1,14 @@
-import requests
 import time
 import os
+import sys
 from datetime import datetime
 
+# 引入仓库根目录下的公共模块
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from apiyi_utils.http import get_session
+from apiyi_utils.tracing import traced
+from apiyi_utils.multipart import MultipartEncoder, print_upload_progress
+
 # API 配置
 BASE_URL = "https://api.apiyi.com/v1/videos"
 API_KEY = "sk-"
@@ -19,6 +25,7 @@ POLL_INTERVAL = 30  # 每 30 秒查询一次状态
 MAX_WAIT_TIME = 600  # 最长等待 10 分钟
 
 
+@traced("sora.submit")
 def step1_submit_video_request():
     """第一步：提交视频生成请求"""
     print("=" * 60)
@@ -35,7 +42,6 @@ def step1_submit_video_request():
     headers = {
         'Accept': 'application/json',
         'Authorization': API_KEY,
-        'Host': 'api.apiyi.com',
         'Connection': 'keep-alive'
     }
 
@@ -45,26 +51,26 @@ def step1_submit_video_request():
         return None
 
     try:
-        with open(IMAGE_PATH, 'rb') as f:
-            files = {
-                'input_reference': (
-                    os.path.basename(IMAGE_PATH),
-                    f,
-                    'image/png'
-                )
-            }
-
-            print(f"📤 发送请求...")
-            print(f"   - 提示词: {PROMPT}")
-            print(f"   - 图片: {IMAGE_PATH}")
-            print(f"   - 尺寸: {SIZE}")
-            print(f"   - 时长: {SECONDS}秒")
-
-            response = requests.post(
+        files = {
+            'input_reference': (
+                os.path.basename(IMAGE_PATH),
+                IMAGE_PATH,
+                'image/png'
+            )
+        }
+
+        print(f"📤 发送请求...")
+        print(f"   - 提示词: {PROMPT}")
+        print(f"   - 图片: {IMAGE_PATH}")
+        print(f"   - 尺寸: {SIZE}")
+        print(f"   - 时长: {SECONDS}秒")
+
+        # 流式上传参考图：按块从内存映射文件读取，不把整张图片读入内存
+        with MultipartEncoder(fields=payload, files=files, progress=print_upload_progress) as encoder:
+            response = get_session().post(
                 BASE_URL,
-                headers=headers,
-                data=payload,
-                files=files
+                headers={**headers, 'Content-Type': encoder.content_type},
+                data=encoder
             )
 
         if response.status_code == 200:
@@ -86,6 +92,7 @@ def step1_submit_video_request():
         return None
 
 
+@traced("sora.poll")
 def step2_poll_video_status(video_id):
     """第二步：轮询查询视频生成状态"""
     print("\n" + "=" * 60)
@@ -110,7 +117,7 @@ def step2_poll_video_status(video_id):
 
         try:
             print(f"\n🔍 查询状态... (已等待 {int(elapsed_time)} 秒)")
-            response = requests.get(status_url, headers=headers)
+            response = get_session().get(status_url, headers=headers)
 
             if response.status_code == 200:
                 result = response.json()
@@ -144,6 +151,7 @@ def step2_poll_video_status(video_id):
             time.sleep(POLL_INTERVAL)
 
 
+@traced("sora.download")
 def step3_download_video(video_id, output_path='video.mp4'):
     """第三步：下载生成的视频"""
     print("\n" + "=" * 60)
@@ -158,7 +166,7 @@ def step3_download_video(video_id, output_path='video.mp4'):
 
     try:
         print(f"📥 开始下载视频...")
-        response = requests.get(content_url, headers=headers, stream=True)
+        response = get_session().get(content_url, headers=headers, stream=True)
 
         if response.status_code == 200:
             # 获取文件大小
@@ -190,6 +198,7 @@ def step3_download_video(video_id, output_path='video.mp4'):
         return False
 
 
+@traced("sora.pipeline")
 def main():
     """完整的异步流程"""
     print("\n🎬 开始 Sora-2 视频生成完整流程")
@@ -1,8 +1,13 @@
-import requests
 import time
 import os
+import sys
 from datetime import datetime
 
+# 引入仓库根目录下的公共模块
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from apiyi_utils.http import get_session
+from apiyi_utils.tracing import traced
+
 # API 配置
 BASE_URL = "https://api.apiyi.com/v1/videos"
 API_KEY = "sk-"
@@ -18,6 +23,7 @@ POLL_INTERVAL = 30  # 每 30 秒查询一次状态
 MAX_WAIT_TIME = 600  # 最长等待 10 分钟
 
 
+@traced("sora.submit")
 def step1_submit_video_request():
     """第一步：提交文字生成视频请求"""
     print("=" * 60)
@@ -35,7 +41,6 @@ def step1_submit_video_request():
     headers = {
         'Accept': 'application/json',
         'Authorization': API_KEY,
-        'Host': 'api.apiyi.com',
         'Connection': 'keep-alive'
     }
 
@@ -46,7 +51,7 @@ def step1_submit_video_request():
         print(f"   - 尺寸: {SIZE}")
         print(f"   - 时长: {SECONDS}秒")
 
-        response = requests.post(
+        response = get_session().post(
             BASE_URL,
             headers=headers,
             files=files
@@ -71,6 +76,7 @@ def step1_submit_video_request():
         return None
 
 
+@traced("sora.poll")
 def step2_poll_video_status(video_id):
     """第二步：轮询查询视频生成状态"""
     print("\n" + "=" * 60)
@@ -95,7 +101,7 @@ def step2_poll_video_status(video_id):
 
         try:
             print(f"\n🔍 查询状态... (已等待 {int(elapsed_time)} 秒)")
-            response = requests.get(status_url, headers=headers)
+            response = get_session().get(status_url, headers=headers)
 
             if response.status_code == 200:
                 result = response.json()
@@ -129,6 +135,7 @@ def step2_poll_video_status(video_id):
             time.sleep(POLL_INTERVAL)
 
 
+@traced("sora.download")
 def step3_download_video(video_id, output_path='video.mp4'):
     """第三步：下载生成的视频"""
     print("\n" + "=" * 60)
@@ -143,7 +150,7 @@ def step3_download_video(video_id, output_path='video.mp4'):
 
     try:
         print(f"📥 开始下载视频...")
-        response = requests.get(content_url, headers=headers, stream=True)
+        response = get_session().get(content_url, headers=headers, stream=True)
 
         if response.status_code == 200:
             # 获取文件大小
@@ -175,6 +182,7 @@ def step3_download_video(video_id, output_path='video.mp4'):
         return False
 
 
+@traced("sora.pipeline")
 def main():
     """完整的异步流程"""
     print("\n🎬 开始 Sora-2 文字生成视频完整流程")
@@ -4,12 +4,21 @@
 图生图 API 调用示例 - 专门用于图片到图片的转换
 """
 
-import requests
+import os
+import sys
 import json
 import re
 import time
 from typing import Dict, Any, List
 
+# 引入仓库根目录下的公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils import postprocess
+from apiyi_utils.http import get_session
+from apiyi_utils.jsoncodec import loads
+from apiyi_utils.tracing import traced
+
+@traced("gpt4o_image.generate_from_image")
 def generate_image_from_image(api_key: str, prompt: str, image_urls: List[str], model: str = "gpt-4o-image") -> Dict[str, Any]:
     """调用图生图 API 生成图片"""
     url = "https://vip.apiyi.com/v1/chat/completions"
@@ -26,9 +35,9 @@ def generate_image_from_image(api_key: str, prompt: str, image_urls: List[str],
     payload = {"model": model, "messages": [{"role": "user", "content": content}]}
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
+        response = get_session().post(url, headers=headers, json=payload)
         response.raise_for_status()
-        return response.json()
+        return loads(response.content)
     except Exception as e:
         print(f"请求失败: {e}")
         return {}
@@ -46,6 +55,7 @@ def extract_image_urls(content: str) -> List[str]:
     
     return urls
 
+@traced("gpt4o_image.download")
 def download_image(url: str, image_type: str = "image") -> bool:
     """下载图片到本地，自动时间戳命名"""
     try:
@@ -54,7 +64,7 @@ def download_image(url: str, image_type: str = "image") -> bool:
         filename = f"{image_type}_{timestamp}{ext}"
         
         print(f"正在下载: {filename}")
-        response = requests.get(url, stream=True)
+        response = get_session().get(url, stream=True)
         response.raise_for_status()
         
         with open(filename, 'wb') as f:
@@ -62,6 +72,7 @@ def download_image(url: str, image_type: str = "image") -> bool:
                 f.write(chunk)
         
         print(f"✅ 下载成功: {filename}")
+        postprocess.submit_image(filename)  # 后台生成缩略图和元数据
         return True
     except Exception as e:
         print(f"❌ 下载失败: {e}")
@@ -173,14 +184,17 @@ def main():
     print("🖼️ 图生图 API 专用演示")
     print("=" * 40)
     
-    while True:
-        demo_image_to_image()
+    try:
+        while True:
+            demo_image_to_image()
         
-        # 询问是否继续
-        continue_choice = input("\n是否继续使用? (y/n): ").lower().strip()
-        if continue_choice not in ['y', 'yes', '是', '1']:
-            print("👋 再见!")
-            break
+            # 询问是否继续
+            continue_choice = input("\n是否继续使用? (y/n): ").lower().strip()
+            if continue_choice not in ['y', 'yes', '是', '1']:
+                print("👋 再见!")
+                break
+    finally:
+        postprocess.shutdown()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
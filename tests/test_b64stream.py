@@ -0,0 +1,76 @@
+"""B64JsonStreamDecoder：分块输入、JSON 转义和中断清理"""
+
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils.b64stream import B64JsonStreamDecoder
+
+IMAGE = bytes(range(256)) * 40 + b"\xff\xfe"
+
+
+def feed_split(decoder, body: bytes, size: int):
+    for start in range(0, len(body), size):
+        decoder.feed(body[start:start + size])
+    decoder.close()
+
+
+def escape_b64(text: str) -> str:
+    """模拟不同服务端的转义写法：/ 写成 \\/，+ 写成 \\u002B，每 76 个字符插入 \\n"""
+    lines = [text[i:i + 76] for i in range(0, len(text), 76)]
+    return "\\n".join(lines).replace("/", "\\/").replace("+", "\\u002B")
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 64, 4096])
+def test_split_chunks_and_escapes(tmp_path, size):
+    encoded = base64.b64encode(IMAGE).decode("ascii")
+    assert "/" in encoded and "+" in encoded
+    body = ('{"created": 1, "data": [{"b64_json": "%s", "revised_prompt": "a \\"fox\\""}, '
+            '{"b64_json": "%s"}]}' % (escape_b64(encoded), encoded)).encode("utf-8")
+
+    decoder = B64JsonStreamDecoder(lambda index: str(tmp_path / f"out_{index}.png"))
+    feed_split(decoder, body, size)
+
+    assert decoder.paths == [str(tmp_path / "out_0.png"), str(tmp_path / "out_1.png")]
+    for path in decoder.paths:
+        with open(path, "rb") as f:
+            assert f.read() == IMAGE
+    skeleton = decoder.skeleton_json()
+    assert skeleton["created"] == 1
+    assert skeleton["data"][0]["revised_prompt"] == 'a "fox"'
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_truncated_body_removes_part_file(tmp_path):
+    encoded = base64.b64encode(IMAGE).decode("ascii")
+    body = json.dumps({"data": [{"b64_json": encoded}]}).encode("utf-8")
+    decoder = B64JsonStreamDecoder(lambda index: str(tmp_path / "out.png"))
+    decoder.feed(body[:len(body) // 2])
+    assert list(tmp_path.glob("*.part"))
+
+    with pytest.raises(ValueError):
+        decoder.close()
+    assert decoder.paths == []
+    assert not list(tmp_path.iterdir())
+
+
+def test_abort_after_interrupted_read(tmp_path):
+    encoded = base64.b64encode(IMAGE).decode("ascii")
+    decoder = B64JsonStreamDecoder(lambda index: str(tmp_path / "out.png"))
+    decoder.feed(('{"data": [{"b64_json": "' + encoded[:1000]).encode("ascii"))
+    decoder.abort()
+    decoder.abort()  # 可重复调用
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.parametrize("value", ["QUJD\\u00e9RA==", "QUJD\\\\RA==", "QUJD\\uZZZZ"])
+def test_invalid_escape_raises(tmp_path, value):
+    decoder = B64JsonStreamDecoder(lambda index: str(tmp_path / "out.png"))
+    with pytest.raises(ValueError):
+        decoder.feed(('{"b64_json": "%s"}' % value).encode("ascii"))
+    decoder.abort()
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,71 @@
+"""dedup：dHash 经 HashIndex 往返查找；postprocess 的 sidecar 哈希与去重哈希一致"""
+
+import json
+import os
+import random
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils.dedup import HashIndex, dhash, group_duplicates, hamming_distance, hash_images
+from apiyi_utils.postprocess import process_image
+
+
+def draw_scene(path, seed, size=(640, 480), fmt="PNG"):
+    """随机色块组成的图片：不同 seed 的图片 dHash 相差很大"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        draw.rectangle([x, y, x + size[0] // 3, y + size[1] // 3], fill=color)
+    image.save(path, fmt, quality=90)  # PNG 忽略 quality
+    return str(path)
+
+
+def test_dhash_round_trip_through_index(tmp_path):
+    original = draw_scene(tmp_path / "a.png", seed=1)
+    with Image.open(original) as image:
+        image.resize((320, 240), Image.BILINEAR).convert("RGB").save(tmp_path / "a_small.jpg", "JPEG", quality=80)
+    other = draw_scene(tmp_path / "b.png", seed=2)
+
+    index = HashIndex(threshold=6)
+    index.add(dhash(original), "a")
+    index.add(dhash(other), "b")
+
+    matches = index.query(dhash(str(tmp_path / "a_small.jpg")))
+    assert matches and matches[0][0] == "a"
+    assert index.query(dhash(original)) == [("a", 0)]
+    assert hamming_distance(dhash(original), dhash(other)) > 6
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(0)
+    base = [rng.getrandbits(64) for _ in range(50)]
+    values = base + [value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for value in base]
+    index = HashIndex(threshold=4)
+    for slot, value in enumerate(values):
+        index.add(value, slot)
+
+    for probe in values[:20]:
+        expected = sorted(slot for slot, value in enumerate(values) if hamming_distance(probe, value) <= 4)
+        assert sorted(slot for slot, _ in index.query(probe)) == expected
+
+
+def test_single_and_batch_hash_agree(tmp_path):
+    paths = [draw_scene(tmp_path / f"{i}.jpg", seed=i, fmt="JPEG") for i in range(3)]
+    assert hash_images(paths) == [dhash(path) for path in paths]
+    assert group_duplicates(paths + [paths[0]]) == [0, 1, 2, 0]
+
+
+def test_postprocess_sidecar_uses_dedup_hash(tmp_path):
+    path = draw_scene(tmp_path / "photo.jpg", seed=3, size=(1600, 1200), fmt="JPEG")
+    metadata = process_image(path, thumbnail_sizes=(64,))
+    assert metadata["dhash"] == f"{dhash(path):016x}"
+    with open(path + ".json", encoding="utf-8") as f:
+        assert json.load(f)["dhash"] == metadata["dhash"]
@@ -0,0 +1,125 @@
+"""http：Retry-After 解析、重试前倒回请求体、扩容不影响进行中的请求"""
+
+import email.utils
+import io
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils.http import ApiSession, HTTPXAdapter, retry_after
+
+
+class Handler(BaseHTTPRequestHandler):
+    """/flaky 第一次返回 503 + Retry-After: 0，之后返回 200；/slow 等待 0.5 秒；记录收到的请求体"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        state = self.server.state
+        with state["lock"]:
+            state["bodies"].append(body)
+            state["hits"] += 1
+            hits = state["hits"]
+        if self.path == "/slow":
+            time.sleep(0.5)
+        if self.path == "/flaky" and hits == 1:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.state = {"lock": threading.Lock(), "bodies": [], "hits": 0}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(httpd, path):
+    return f"http://127.0.0.1:{httpd.server_port}{path}"
+
+
+def make_session(**kwargs):
+    return ApiSession(rate_limit=False, route=False, backoff_base=0.01, **kwargs)
+
+
+def response_with(headers):
+    response = requests.Response()
+    response.headers.update(headers)
+    return response
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({}, None),
+    ({"Retry-After": "7"}, 7.0),
+    ({"Retry-After": "1.5"}, 1.5),
+    ({"Retry-After": "-3"}, 0.0),
+    ({"retry-after-ms": "250", "Retry-After": "9"}, 0.25),
+    ({"retry-after-ms": "abc", "Retry-After": "2"}, 2.0),
+    ({"Retry-After": "soon"}, None),
+])
+def test_retry_after_values(headers, expected):
+    assert retry_after(response_with(headers)) == expected
+
+
+def test_retry_after_http_date():
+    future = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 <= retry_after(response_with({"Retry-After": future})) <= 30
+    past = email.utils.formatdate(time.time() - 30, usegmt=True)
+    assert retry_after(response_with({"Retry-After": past})) == 0.0
+
+
+def test_body_rewound_before_retry(server):
+    payload = os.urandom(200_000)
+    session = make_session()
+    response = session.post(url(server, "/flaky"), data=io.BytesIO(payload), idempotent=True)
+
+    assert response.status_code == 200
+    assert session.retry_count == 1
+    assert server.state["bodies"] == [payload, payload]
+
+
+def test_unreplayable_body_is_not_retried(server):
+    session = make_session()
+    with pytest.raises(requests.exceptions.RetryError):
+        session.post(url(server, "/flaky"), data=iter([b"chunk"]), idempotent=True)
+    assert server.state["hits"] == 1
+
+
+@pytest.mark.parametrize("transport", ["urllib3", "httpx"])
+def test_resize_keeps_in_flight_requests_working(server, transport):
+    session = make_session(pool_size=2)
+    if transport == "httpx":
+        pytest.importorskip("httpx")
+        session.mount("http://", HTTPXAdapter(2, http2=False))  # 与 HTTP/2 模式相同的适配器，只是不协商 h2
+    results = []
+    thread = threading.Thread(target=lambda: results.append(session.post(url(server, "/slow"), data=b"x")))
+    thread.start()
+    time.sleep(0.1)  # 请求已发出，正在等待响应
+    old_adapter = session.get_adapter("http://")
+    session.resize(16)
+    thread.join()
+
+    assert results[0].status_code == 200 and results[0].content == b"ok"
+    assert session.get_adapter("http://") is not old_adapter
+    assert session.post(url(server, "/flaky"), data=b"y", idempotent=True).status_code == 200
+    session.resize(4)  # 只增不减
+    assert session.pool_size == 16
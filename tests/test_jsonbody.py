@@ -0,0 +1,63 @@
+"""JsonBody：分块编码的请求体与一次性 json.dumps 的结果一致，长度预先确定，可重放"""
+
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils.jsonbody import Base64File, JsonBody, base64_length
+
+
+def make_file(tmp_path, size):
+    path = tmp_path / f"image_{size}.bin"
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+def encoded(path, prefix=""):
+    with open(path, "rb") as f:
+        return prefix + base64.b64encode(f.read()).decode("ascii")
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 4, 100_000, 100_001])
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_body_matches_json_dumps(tmp_path, size, chunk_size):
+    path = make_file(tmp_path, size)
+    prefix = 'data:image/png;name="图片";base64,'
+    payload = {"model": "gemini-2.5-pro", "messages": [{"role": "user", "content": [
+        {"type": "text", "text": "描述这张图片"},
+        {"type": "image_url", "image_url": {"url": Base64File(path, prefix)}},
+        {"type": "image_url", "image_url": {"url": Base64File(path)}},
+    ]}]}
+    expected = json.loads(json.dumps(payload, default=lambda value: encoded(value.path, value.prefix)))
+
+    with JsonBody(payload, chunk_size=chunk_size) as body:
+        data = b"".join(body)
+        assert len(body) == len(data)
+        assert data.isascii()
+        assert json.loads(data) == expected
+        assert body.fields["model"] == "gemini-2.5-pro"
+
+
+def test_base64_file_length_and_chunks(tmp_path):
+    path = make_file(tmp_path, 12_345)
+    item = Base64File(path, "data:image/jpeg;base64,")
+    assert base64_length(12_345) == len(encoded(path))
+    assert len(item) == len("data:image/jpeg;base64,") + base64_length(12_345)
+    assert b"".join(item.chunks(chunk_size=1000)).decode("ascii") == encoded(path)
+
+
+def test_seek_replays_same_body(tmp_path):
+    path = make_file(tmp_path, 70_000)
+    with JsonBody({"image": Base64File(path)}) as body:
+        first = body.read(10_000) + b"".join(body)
+        body.seek(0)
+        assert b"".join(body) == first
+
+
+def test_missing_file_fails_early(tmp_path):
+    with pytest.raises(OSError):
+        Base64File(str(tmp_path / "missing.png"))
@@ -0,0 +1,78 @@
+"""jsoncodec：同一组响应在每个已安装后端上的解码结果和类型检查一致"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils import jsoncodec
+from apiyi_utils.jsoncodec import (ChatChoice, ChatCompletion, ChatMessage, ImageData, ImagesResponse,
+                                   available_backends, load_codec)
+
+BACKENDS = available_backends()
+
+VALID = [
+    (ImagesResponse,
+     b'{"created": 1760000000, "data": [{"b64_json": "QUJD", "revised_prompt": "fox"}, {"url": "https://x/a.png"}],'
+     b' "usage": {"total_tokens": 10}}',
+     ImagesResponse(1760000000, [ImageData(b64_json="QUJD", revised_prompt="fox"), ImageData(url="https://x/a.png")])),
+    (ImagesResponse, b'{"created": null, "data": []}', ImagesResponse(None, [])),
+    (ImagesResponse, b'{}', ImagesResponse()),
+    (ChatCompletion,
+     '{"id": "c1", "object": "chat.completion", "model": "gpt-4o", "choices": [{"index": 0, '
+     '"message": {"role": "assistant", "content": "你好", "refusal": null}, "finish_reason": "stop"}]}'.encode("utf-8"),
+     ChatCompletion("c1", "gpt-4o", [ChatChoice(0, ChatMessage("assistant", "你好"), "stop")])),
+    (ChatCompletion, b'{"choices": [{"message": {"role": null, "content": null}}]}',
+     ChatCompletion(choices=[ChatChoice(message=ChatMessage(None, None))])),
+]
+
+INVALID = [
+    (ChatCompletion, b'{"choices": [{"message": {"content": [{"type": "text", "text": "hi"}]}}]}'),
+    (ChatCompletion, b'{"choices": {"message": {}}}'),
+    (ChatCompletion, b'{"id": 42}'),
+    (ChatCompletion, b'{"id": null}'),
+    (ChatCompletion, b'{"choices": [{"index": true}]}'),
+    (ImagesResponse, b'{"created": "1760000000"}'),
+    (ImagesResponse, b'{"created": 1.5}'),
+    (ImagesResponse, b'{"data": [null]}'),
+    (ImagesResponse, b'[]'),
+    (ImagesResponse, b'{"data": ['),
+]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("cls, data, expected", VALID)
+def test_decode_valid(backend, cls, data, expected):
+    assert load_codec(backend).decode(data, cls) == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("cls, data", INVALID)
+def test_decode_invalid_raises_value_error(backend, cls, data):
+    with pytest.raises(ValueError):
+        load_codec(backend).decode(data, cls)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_loads_and_dumps_round_trip(backend):
+    codec = load_codec(backend)
+    payload = {"model": "m", "text": "中文 \"quoted\"", "n": [1, 2.5, None, True]}
+    assert codec.loads(codec.dumps(payload)) == payload
+    assert codec.loads(codec.dumps(payload).decode("utf-8")) == payload
+
+
+def select(monkeypatch, preferred):
+    monkeypatch.setenv("APIYI_JSON", preferred)
+    monkeypatch.setattr(jsoncodec, "_codecs", None)
+    return jsoncodec.get_codec().name, jsoncodec.get_codec(typed=True).name
+
+
+@pytest.mark.skipif(BACKENDS[:2] != ["orjson", "msgspec"], reason="需要同时安装 orjson 和 msgspec")
+def test_auto_prefers_msgspec_for_typed_decode(monkeypatch):
+    assert select(monkeypatch, "auto") == ("orjson", "msgspec")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_apiyi_json_forces_one_backend(monkeypatch, backend):
+    assert select(monkeypatch, backend) == (backend, backend)
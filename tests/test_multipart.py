@@ -0,0 +1,58 @@
+"""MultipartEncoder：与 urllib3 的编码结果一致，分块读取、Content-Length 和 seek(0) 重放"""
+
+import os
+import sys
+
+import pytest
+from urllib3.filepost import encode_multipart_formdata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils.multipart import MultipartEncoder
+
+
+def read_all(body, size):
+    chunks = []
+    while True:
+        chunk = body.read(size)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+@pytest.fixture
+def files(tmp_path):
+    image = tmp_path / "image.png"
+    image.write_bytes(os.urandom(150_001))
+    empty = tmp_path / "empty.png"
+    empty.write_bytes(b"")
+    return {"image": ("image.png", str(image), "image/png"), "mask": ("空.png", str(empty), "image/png")}
+
+
+def expected_body(fields, files, boundary):
+    parts = list(fields.items())
+    for name, (filename, path, content_type) in files.items():
+        with open(path, "rb") as f:
+            parts.append((name, (filename, f.read(), content_type)))
+    return encode_multipart_formdata(parts, boundary=boundary)[0]
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096, 65536, -1])
+def test_matches_urllib3_encoding(files, size):
+    fields = {"model": "gpt-image-1", "prompt": "换成 \"水彩\" 风格"}
+    with MultipartEncoder(fields, files, boundary="test-boundary") as encoder:
+        body = read_all(encoder, size)
+        assert body == expected_body(fields, files, "test-boundary")
+        assert len(encoder) == len(body)
+        assert encoder.content_type == "multipart/form-data; boundary=test-boundary"
+        assert encoder.fields == fields
+
+
+def test_seek_replays_body_and_reports_progress(files):
+    progress = []
+    with MultipartEncoder({"model": "m"}, files, progress=lambda sent, total: progress.append((sent, total))) as encoder:
+        first = b"".join(encoder)
+        assert progress[-1] == (len(encoder), len(encoder))
+        assert encoder.seek(0) == 0 and encoder.tell() == 0
+        assert b"".join(encoder) == first
+        with pytest.raises(ValueError):
+            encoder.seek(10)
@@ -0,0 +1,50 @@
+"""postprocess：默认关闭，环境变量或 enable() 开启；shutdown() 等待已提交的任务"""
+
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils import postprocess
+
+
+@pytest.fixture(autouse=True)
+def reset_switch(monkeypatch):
+    monkeypatch.delenv("APIYI_POSTPROCESS", raising=False)
+    monkeypatch.setattr(postprocess, "_enabled", None)
+
+
+def test_disabled_by_default(tmp_path):
+    path = tmp_path / "image.png"
+    Image.new("RGB", (32, 32)).save(path)
+    assert not postprocess.is_enabled()
+    assert postprocess.submit_image(str(path)) is None
+    assert not os.path.exists(postprocess.sidecar_path(str(path)))
+
+
+@pytest.mark.parametrize("value, expected", [("1", True), ("on", True), ("0", False), ("", False)])
+def test_env_switch(monkeypatch, value, expected):
+    monkeypatch.setenv("APIYI_POSTPROCESS", value)
+    assert postprocess.is_enabled() is expected
+
+
+def test_enable_overrides_env(monkeypatch):
+    monkeypatch.setenv("APIYI_POSTPROCESS", "1")
+    postprocess.enable(False)
+    assert not postprocess.is_enabled()
+    postprocess.enable()
+    assert postprocess.is_enabled()
+
+
+def test_shutdown_waits_for_submitted_images(tmp_path):
+    path = tmp_path / "image.png"
+    Image.new("RGB", (300, 200), (10, 120, 200)).save(path)
+    processor = postprocess.ImagePostProcessor(max_workers=1, thumbnail_sizes=(64,), verbose=False)
+    try:
+        processor.submit(str(path))
+    finally:
+        processor.shutdown()
+    assert processor.pending == 0
+    assert os.path.exists(postprocess.sidecar_path(str(path)))
@@ -0,0 +1,64 @@
+"""preflight：截断的 PNG 只让该任务失败；遮罩尺寸不一致时本地修正"""
+
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils.preflight import PreflightError, check_pair, preflight_pair, preflight_pairs, read_image_header
+
+
+def save_png(path, size=(64, 48), mode="RGBA"):
+    Image.new(mode, size, (200, 10, 10, 255) if mode == "RGBA" else 255).save(path, "PNG")
+    return str(path)
+
+
+@pytest.mark.parametrize("keep", [8, 12, 16, 20, 33])
+def test_truncated_png_raises_preflight_error(tmp_path, keep):
+    """截断在签名之后的任意位置（IHDR 头、IHDR 字段、IDAT 之前）都报告为文件头不完整"""
+    path = save_png(tmp_path / "image.png")
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:keep])
+
+    with pytest.raises(PreflightError, match="文件头不完整"):
+        read_image_header(path)
+
+
+def test_truncated_pair_does_not_abort_batch(tmp_path):
+    good = save_png(tmp_path / "good.png")
+    bad = save_png(tmp_path / "bad.png")
+    with open(bad, "r+b") as f:
+        f.truncate(20)
+
+    pairs = [{"image": bad, "mask": None}, {"image": good, "mask": None}]
+    results = list(preflight_pairs(pairs, str(tmp_path / "out"), max_workers=1))
+
+    assert "文件头不完整" in results[0]["error"]
+    assert "error" not in results[1]
+    assert results[1]["image"] == good
+
+
+def test_png_header_matches_pillow(tmp_path):
+    path = save_png(tmp_path / "rgb.png", size=(31, 17), mode="RGB")
+    info = read_image_header(path)
+    assert (info["format"], info["width"], info["height"], info["mode"]) == ("PNG", 31, 17, "RGB")
+    assert info["has_alpha"] is False
+
+
+def test_mismatched_mask_is_resized(tmp_path):
+    image = save_png(tmp_path / "image.png", size=(64, 48))
+    mask = save_png(tmp_path / "mask.png", size=(32, 24), mode="L")
+
+    problems = check_pair(image, mask)["problems"]
+    assert any("遮罩尺寸 32x24" in problem for problem in problems)
+
+    result = preflight_pair(image, mask, str(tmp_path / "out"), verbose=False)
+    assert result["image"] == image
+    with Image.open(result["mask"]) as converted:
+        assert converted.size == (64, 48)
+        assert converted.mode == "RGBA"
+    assert check_pair(result["image"], result["mask"])["problems"] == []
@@ -0,0 +1,89 @@
+"""ratelimit：令牌桶的补充与预约计算、429 暂停、多个限流器实例（模拟多进程）共享状态"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils import ratelimit
+from apiyi_utils.ratelimit import RateLimiter, parse_model_rates, parse_rate
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "time", fake)
+    return fake
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("120/min", 2.0), ("2/s", 2.0), ("3600/h", 1.0), ("60", 1.0), (" 0.5 / sec ", 0.5),
+])
+def test_parse_rate(spec, expected):
+    assert parse_rate(spec) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("spec", ["fast", "10/day", "/min"])
+def test_parse_rate_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_rate(spec)
+
+
+def test_parse_model_rates():
+    assert parse_model_rates("gpt-image-1=20/min, *=1/s,") == {"gpt-image-1": pytest.approx(1 / 3), "*": 1.0}
+
+
+def test_refill_and_reservation_math(tmp_path, clock):
+    limiter = RateLimiter(key_rate=2.0, directory=str(tmp_path))  # 容量 = 2 × 1 秒 = 2 个令牌
+    waits = [limiter.reserve("sk-a") for _ in range(4)]
+    assert waits == [0.0, 0.0, pytest.approx(0.5), pytest.approx(1.0)]  # 欠 1 个、2 个令牌
+
+    clock.now += 1.0  # 补充 2 个令牌：-2 → 0
+    assert limiter.reserve("sk-a") == pytest.approx(0.5)
+
+    clock.now += 100.0  # 补充封顶在容量 2
+    assert [limiter.reserve("sk-a") for _ in range(3)] == [0.0, 0.0, pytest.approx(0.5)]
+
+
+def test_model_bucket_is_separate_from_key_bucket(tmp_path, clock):
+    limiter = RateLimiter(model_rates={"gpt-image-1": 1.0}, directory=str(tmp_path))
+    assert limiter.reserve("sk-a", "gpt-image-1") == 0.0
+    assert limiter.reserve("sk-a", "gpt-image-1") == pytest.approx(1.0)
+    assert limiter.reserve("sk-a", "other-model") == 0.0  # 未列出且没有 "*"：不限
+    assert limiter.reserve("sk-b", "gpt-image-1") == 0.0  # 不同 Key 各自一个桶
+
+
+def test_instances_share_state_through_files(tmp_path, clock):
+    first = RateLimiter(key_rate=1.0, directory=str(tmp_path))
+    second = RateLimiter(key_rate=1.0, directory=str(tmp_path))
+    try:
+        assert first.reserve("sk-a") == 0.0
+        assert second.reserve("sk-a") == pytest.approx(1.0)
+        assert first.reserve("sk-a") == pytest.approx(2.0)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_penalize_blocks_all_instances(tmp_path, clock):
+    first = RateLimiter(directory=str(tmp_path))
+    second = RateLimiter(directory=str(tmp_path))
+    try:
+        assert second.reserve("sk-a") == 0.0
+        first.penalize("sk-a", delay=10.0)
+        wait = second.reserve("sk-a")
+        assert 10.0 <= wait <= 11.0  # 暂停时间 + 最多 1 秒抖动
+        clock.now += 11.0
+        assert second.reserve("sk-a") == 0.0
+    finally:
+        first.close()
+        second.close()
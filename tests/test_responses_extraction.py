@@ -0,0 +1,92 @@
+"""responses_extraction：输入行解析失败只影响该行；打包模式只在输出有问题时拆分，API 错误整包直接失败"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+from typing import Optional
+
+import httpx
+import openai
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from responses_extraction import ExtractionEngine, iter_records
+
+
+class Event(BaseModel):
+    name: str
+
+
+class FakeResponses:
+    """responses.parse 的替身：每次调用交给 handler(请求的 schema) 决定返回值或异常"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = 0
+
+    async def parse(self, model, input, text_format, timeout):
+        self.calls += 1
+        return SimpleNamespace(output_parsed=self.handler(text_format), usage=None)
+
+
+def make_engine(handler):
+    client = SimpleNamespace(responses=FakeResponses(handler), api_key="sk-test")
+    return ExtractionEngine(client, Event, max_retries=0)
+
+
+def status_error(cls, status: int):
+    request = httpx.Request("POST", "https://api.example.com/v1/responses")
+    return cls("error", response=httpx.Response(status, request=request), body=None)
+
+
+def run_pack(engine, count: int = 4):
+    records = [{"id": i, "text": f"record {i}"} for i in range(count)]
+    return asyncio.run(engine.parse_pack(records))
+
+
+def test_bad_request_fails_whole_pack_without_splitting():
+    def handler(text_format) -> Optional[BaseModel]:
+        raise status_error(openai.BadRequestError, 400)
+
+    engine = make_engine(handler)
+    outcomes = run_pack(engine)
+
+    assert engine.client.responses.calls == 1
+    assert engine.stats["splits"] == 0
+    assert [record["id"] for record, _, _ in outcomes] == [0, 1, 2, 3]
+    assert all(result is None and error.error_type == "BadRequestError" for _, result, error in outcomes)
+
+
+def test_empty_output_splits_down_to_single_records():
+    def handler(text_format) -> Optional[BaseModel]:
+        if text_format is Event:
+            return Event(name="ok")
+        return None  # 打包请求没有可解析的输出
+
+    engine = make_engine(handler)
+    outcomes = run_pack(engine)
+
+    assert engine.stats["splits"] == 3
+    assert sorted(record["id"] for record, result, error in outcomes if error is None) == [0, 1, 2, 3]
+
+
+def test_malformed_json_line_becomes_failed_record(tmp_path):
+    path = tmp_path / "input.jsonl"
+    path.write_text('{"id": "a", "text": "first"}\n'
+                    '{"id": "b", "text": "cut off\n'
+                    '"Meet me at 5pm" she said\n'
+                    '"quoted"\n', encoding="utf-8")
+
+    records = list(iter_records(str(path)))
+    assert records[0] == {"id": "a", "text": "first"}
+    assert records[1]["id"] == 2 and "第 2 行" in records[1]["error"]
+    assert records[2] == {"id": 3, "text": '"Meet me at 5pm" she said'}
+    assert records[3] == {"id": 4, "text": "quoted"}
+
+    engine = make_engine(lambda text_format: Event(name="ok"))
+    succeeded, failed = [], []
+    asyncio.run(engine.run(iter_records(str(path)), lambda record, result: succeeded.append(record["id"]),
+                           lambda record, error: failed.append((record["id"], error.error_type))))
+    assert sorted(succeeded, key=str) == [3, 4, "a"]
+    assert failed == [(2, "InvalidInput")]
@@ -0,0 +1,44 @@
+"""EndpointRouter：首次探测完成前到达的并发请求也按探测结果选路"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from apiyi_utils.routing import EndpointRouter
+
+SLOW = "https://slow.example.com/v1"
+FAST = "https://fast.example.com/v1"
+
+
+class FakeProbeRouter(EndpointRouter):
+    """探测不发网络请求：首次探测耗时 0.2 秒，结果为 FAST 明显更快"""
+
+    def __init__(self):
+        super().__init__([SLOW, FAST], explore=0.0, probe_interval=3600)
+        self.probes = 0
+
+    def probe(self):
+        self.probes += 1
+        time.sleep(0.2)
+        self._record(SLOW, "probe", 0.5, True)
+        self._record(FAST, "probe", 0.05, True)
+
+
+def test_concurrent_first_route_waits_for_probe():
+    router = FakeProbeRouter()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(router.route(SLOW + "/chat/completions")))
+               for _ in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)  # 后面的线程在首次探测进行中到达
+        for thread in threads:
+            thread.join()
+    finally:
+        router.stop()
+
+    assert router.probes == 1
+    assert results == [FAST + "/chat/completions"] * 8
@@ -5,9 +5,18 @@ APIYI Veo3 视频生成 API 快速示例
 最简单的使用方式，5分钟上手
 """
 
-import requests
 import re
 
+from apiyi_utils.http import get_session
+from apiyi_utils.tracing import traced
+
+# 替换为你的API易密钥，获取地址 https://www.apiyi.com/token
+API_KEY = "sk-"
+
+# 视频生成提示词
+DEFAULT_PROMPT = "Inside a whimsical honeycomb-shaped room, a bee sits at a small table, deeply engrossed in a video game. The room and furniture are fashioned entirely out of beeswax, giving everything a warm, golden glow. The bee wears a tiny gaming headset, with honey jars and candles adding to the cozy, hive-like atmosphere. A pixelated game is displayed on a wax screen, while waxy gaming controls rest near the bee's tiny feet. The setting is playful and surreal, blending the textures of a natural hive with the vibrant personality of a high-tech gaming setup."
+
+@traced("veo3.generate_video")
 def generate_video(api_key, prompt):
     """
     生成视频的最简单方法
@@ -45,7 +54,7 @@ def generate_video(api_key, prompt):
     
     # 发送请求
     try:
-        response = requests.post(url, headers=headers, json=data, timeout=300)
+        response = get_session().post(url, headers=headers, json=data)  # 超时见 apiyi_utils.http.DEFAULT_TIMEOUTS
         response.raise_for_status()
         
         # 获取响应内容
@@ -70,18 +79,12 @@ def generate_video(api_key, prompt):
         }
 
 # 快速使用示例
-if __name__ == "__main__":
-    # 替换为你的API易密钥，获取地址 https://www.apiyi.com/token
-    API_KEY = "sk-"
-    
-    # 视频生成提示词
-    prompt = "Inside a whimsical honeycomb-shaped room, a bee sits at a small table, deeply engrossed in a video game. The room and furniture are fashioned entirely out of beeswax, giving everything a warm, golden glow. The bee wears a tiny gaming headset, with honey jars and candles adding to the cozy, hive-like atmosphere. A pixelated game is displayed on a wax screen, while waxy gaming controls rest near the bee's tiny feet. The setting is playful and surreal, blending the textures of a natural hive with the vibrant personality of a high-tech gaming setup."
-    
+def main(api_key=API_KEY, prompt=DEFAULT_PROMPT):
     print("🎬 开始生成视频...")
     print(f"📝 提示词: {prompt}")
     
     # 生成视频
-    result = generate_video(API_KEY, prompt)
+    result = generate_video(api_key, prompt)
     
     if result["success"]:
         print("\n✅ 视频生成成功!")
@@ -96,4 +99,8 @@ if __name__ == "__main__":
         print(result["raw_response"])
         
     else:
-        print(f"\n❌ 生成失败: {result['error']}") 
+        print(f"\n❌ 生成失败: {result['error']}")
+
+
+if __name__ == "__main__":
+    main()